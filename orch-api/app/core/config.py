@@ -6,13 +6,80 @@ class Settings(BaseSettings):
     app_env: str = "dev"
     api_prefix: str = "/v1"
     secret_key: str = "change-this-secret"
+    secret_keys: str = ""
+    secret_active_key_id: str = ""
+    secret_legacy_key: str = ""
+    secret_rotation_batch_size: int = 200
+    credential_secret_cache_ttl_seconds: int = 300
+    credential_secret_cache_max_entries: int = 256
     access_token_expire_minutes: int = 30
     refresh_token_expire_minutes: int = 10080
     database_url: str = "sqlite:///./orch.db"
+    database_pool_size: int = 20
+    database_max_overflow: int = 30
+    api_threadpool_size: int = 100
+    # Unset: migrate on startup only when APP_ENV=dev; elsewhere run `manage.py migrate`.
+    auto_migrate: bool | None = None
     redis_url: str = "redis://localhost:6379/0"
     admin_email: str = "admin@omniforge.com.br"
     admin_password: str = "Admin123!"
     cors_origins: str = "*"
+    auth_cache_ttl_seconds: int = 30
+    auth_trust_token_claims: bool = False
+    password_hash_rounds: int = 29000
+    password_hash_workers: int = 2
+    password_hash_max_queue: int = 64
+    login_failure_window_seconds: int = 900
+    login_max_failures_per_account: int = 10
+    login_max_failures_per_ip: int = 100
+    audit_outbox_flush_rows: int = 500
+    audit_outbox_flush_interval_ms: int = 1000
+    audit_outbox_max_pending: int = 50000
+    http_cache_ttl_seconds: int = 300
+    http_cache_max_entries: int = 1000
+    hetzner_status_cache_ttl_seconds: int = 60
+    hetzner_max_inflight_per_credential: int = 4
+    hetzner_request_timeout_seconds: int = 20
+    hetzner_client_idle_seconds: int = 600
+    hetzner_client_max_entries: int = 256
+    hetzner_action_poll_seconds: int = 5
+    hetzner_action_batch_size: int = 50
+    hetzner_action_timeout_minutes: int = 360
+    hetzner_inflight_ttl_seconds: int = 900
+    hetzner_stale_run_minutes: int = 30
+    scheduler_enabled: bool = True
+    scheduler_interval_seconds: int = 30
+    scheduler_batch_size: int = 100
+    retention_job_logs_days: int = 30
+    retention_audit_days: int = 365
+    retention_hetzner_logs_days: int = 180
+    retention_batch_size: int = 5000
+    retention_interval_minutes: int = 60
+    artifact_store: str = "local"
+    artifact_local_path: str = "./artifacts"
+    artifact_s3_bucket: str = "orch-artifacts"
+    artifact_s3_endpoint_url: str = ""
+    artifact_s3_region: str = ""
+    artifact_s3_access_key: str = ""
+    artifact_s3_secret_key: str = ""
+    artifact_inline_max_bytes: int = 65536
+    artifact_zstd_level: int = 3
+    job_log_flush_lines: int = 100
+    job_log_flush_interval_ms: int = 250
+    log_search_recent_rows: int = 100000
+    queue_visibility_timeout_seconds: int = 60
+    bulk_execute_max_jobs: int = 1000
+    queue_reclaim_interval_seconds: int = 15
+    queue_tenant_weights: str = ""
+    worker_concurrency: int = 4
+    worker_category_limits: str = ""
+    worker_process_categories: str = ""
+    worker_process_pool_size: int = 2
+    worker_drain_seconds: int = 25
+    worker_metrics_port: int = 9101
+    tracing_exporter: str = ""
+    tracing_file_path: str = "traces.jsonl"
+    tracing_sample_ratio: float = 1.0
 
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8", extra="ignore")
 
@@ -22,6 +89,32 @@ class Settings(BaseSettings):
             return ["*"]
         return [i.strip() for i in self.cors_origins.split(",") if i.strip()]
 
+    @property
+    def queue_tenant_weights_map(self) -> dict[str, int]:
+        weights: dict[str, int] = {}
+        for item in self.queue_tenant_weights.split(","):
+            name, _, value = item.rpartition("=")
+            if name.strip() and value.strip().isdigit():
+                weights[name.strip()] = max(int(value), 1)
+        return weights
+
+    @property
+    def worker_category_limits_map(self) -> dict[str, int]:
+        limits: dict[str, int] = {}
+        for item in self.worker_category_limits.split(","):
+            name, _, value = item.partition("=")
+            if name.strip() and value.strip().isdigit():
+                limits[name.strip().lower()] = max(int(value), 1)
+        return limits
+
+    @property
+    def auto_migrate_enabled(self) -> bool:
+        return self.app_env == "dev" if self.auto_migrate is None else self.auto_migrate
+
+    @property
+    def worker_process_categories_set(self) -> set[str]:
+        return {i.strip().lower() for i in self.worker_process_categories.split(",") if i.strip()}
+
 
 settings = Settings()
 
@@ -6,23 +6,80 @@ from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 
 from app.core.config import settings
 
+# Ciphertexts are "<key id>$<base64(nonce + ciphertext)>"; urlsafe base64 never contains "$",
+# so values written before key ids existed are recognised by its absence.
+KEY_ID_SEPARATOR = "$"
+DEFAULT_KEY_ID = "k0"
 
-def _key_bytes() -> bytes:
-    return hashlib.sha256(settings.secret_key.encode("utf-8")).digest()
+
+def _derive_key(material: str) -> AESGCM:
+    return AESGCM(hashlib.sha256(material.encode("utf-8")).digest())
+
+
+class Keyring:
+    """AES-GCM keys by id, built once per process; encrypts with the active key only."""
+
+    def __init__(self, keys: dict[str, str], active_key_id: str, legacy_material: str):
+        if active_key_id not in keys:
+            raise ValueError(f"Active secret key id {active_key_id!r} is not in the keyring")
+        self.active_key_id = active_key_id
+        self._keys = {key_id: _derive_key(material) for key_id, material in keys.items()}
+        self._legacy = _derive_key(legacy_material)
+
+    @property
+    def key_ids(self) -> list[str]:
+        return list(self._keys)
+
+    def encrypt(self, plain_text: str) -> str:
+        nonce = os.urandom(12)
+        # The key id is authenticated, so a ciphertext cannot be replayed under another id.
+        cipher = self._keys[self.active_key_id].encrypt(
+            nonce, plain_text.encode("utf-8"), self.active_key_id.encode("utf-8")
+        )
+        return f"{self.active_key_id}{KEY_ID_SEPARATOR}" + base64.urlsafe_b64encode(nonce + cipher).decode("utf-8")
+
+    def decrypt(self, cipher_text: str) -> str:
+        key_id, payload = split_key_id(cipher_text)
+        if key_id is None:
+            aesgcm, associated_data = self._legacy, None
+        else:
+            aesgcm = self._keys.get(key_id)
+            if aesgcm is None:
+                raise ValueError(f"Unknown secret key id {key_id!r}")
+            associated_data = key_id.encode("utf-8")
+        raw = base64.urlsafe_b64decode(payload.encode("utf-8"))
+        return aesgcm.decrypt(raw[:12], raw[12:], associated_data).decode("utf-8")
+
+    def needs_rotation(self, cipher_text: str) -> bool:
+        return split_key_id(cipher_text)[0] != self.active_key_id
+
+
+def split_key_id(cipher_text: str) -> tuple[str | None, str]:
+    key_id, separator, payload = cipher_text.partition(KEY_ID_SEPARATOR)
+    if not separator:
+        return None, cipher_text
+    return key_id, payload
+
+
+def load_keyring() -> Keyring:
+    # SECRET_KEYS="2026a=<material>,k0=<old SECRET_KEY>"; without it SECRET_KEY is the only key.
+    keys: dict[str, str] = {}
+    for item in settings.secret_keys.split(","):
+        key_id, _, material = item.partition("=")
+        if key_id.strip() and material.strip():
+            keys[key_id.strip()] = material.strip()
+    if not keys:
+        keys[DEFAULT_KEY_ID] = settings.secret_key
+    active_key_id = settings.secret_active_key_id or next(iter(keys))
+    return Keyring(keys, active_key_id, settings.secret_legacy_key or settings.secret_key)
+
+
+keyring = load_keyring()
 
 
 def encrypt_secret(plain_text: str) -> str:
-    key = _key_bytes()
-    nonce = os.urandom(12)
-    cipher = AESGCM(key).encrypt(nonce, plain_text.encode("utf-8"), None)
-    payload = nonce + cipher
-    return base64.urlsafe_b64encode(payload).decode("utf-8")
+    return keyring.encrypt(plain_text)
 
 
 def decrypt_secret(cipher_text: str) -> str:
-    key = _key_bytes()
-    payload = base64.urlsafe_b64decode(cipher_text.encode("utf-8"))
-    nonce = payload[:12]
-    cipher = payload[12:]
-    plain = AESGCM(key).decrypt(nonce, cipher, None)
-    return plain.decode("utf-8")
+    return keyring.decrypt(cipher_text)
@@ -7,13 +7,25 @@ from passlib.context import CryptContext
 from app.core.config import settings
 
 ALGORITHM = "HS256"
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+# Pinning min and max to the configured cost makes verify_and_update flag any stored hash
+# computed with different rounds, so raising (or lowering) the cost rehashes on next login.
+pwd_context = CryptContext(
+    schemes=["pbkdf2_sha256"],
+    deprecated="auto",
+    pbkdf2_sha256__default_rounds=settings.password_hash_rounds,
+    pbkdf2_sha256__min_rounds=settings.password_hash_rounds,
+    pbkdf2_sha256__max_rounds=settings.password_hash_rounds,
+)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
@@ -25,12 +37,18 @@ def _create_token(data: dict[str, Any], expires_minutes: int, token_type: str) -
     return jwt.encode(to_encode, settings.secret_key, algorithm=ALGORITHM)
 
 
-def create_access_token(subject: str, roles: list[str]) -> str:
-    return _create_token(
-        {"sub": subject, "roles": roles},
-        settings.access_token_expire_minutes,
-        "access",
-    )
+def create_access_token(
+    subject: str,
+    roles: list[str],
+    areas: list[str] | None = None,
+    email: str | None = None,
+    revision: int | None = None,
+) -> str:
+    data: dict[str, Any] = {"sub": subject, "roles": roles}
+    # Claims trusted by read-only endpoints; only present when the revision is known.
+    if areas is not None and email is not None and revision is not None:
+        data.update({"areas": areas, "email": email, "rev": revision})
+    return _create_token(data, settings.access_token_expire_minutes, "access")
 
 
 def create_refresh_token(subject: str, roles: list[str]) -> str:
@@ -1,5 +1,7 @@
 from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
 
 from app.core.config import settings
 
@@ -10,7 +12,20 @@ def _sqlite_args() -> dict:
     return {}
 
 
-engine = create_engine(settings.database_url, connect_args=_sqlite_args())
+def _pool_args() -> dict:
+    # Sized for the request threadpool (API_THREADPOOL_SIZE): a thread waiting on the pool holds its slot.
+    if settings.database_url.startswith("sqlite"):
+        return {}
+    return {"pool_size": settings.database_pool_size, "max_overflow": settings.database_max_overflow}
+
+
+engine = create_engine(settings.database_url, connect_args=_sqlite_args(), **_pool_args())
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+
+def dialect_insert(db: Session, model):
+    # INSERT ... ON CONFLICT lives on the dialect-specific insert constructs.
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql_insert(model)
+    return sqlite_insert(model)
@@ -1,13 +1,15 @@
 from dataclasses import dataclass
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.orm import Session, joinedload
 
 from app.core.config import settings
 from app.core.security import decode_token
 from app.db import SessionLocal
 from app.models import User
+from app.services.auth_cache import auth_context_cache, current_auth_revision
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.api_prefix}/auth/login")
 
@@ -20,14 +22,55 @@ def get_db():
         db.close()
 
 
-@dataclass
+@dataclass(frozen=True)
+class AuthUser:
+    id: int
+    email: str
+    status: str
+
+
+@dataclass(frozen=True)
 class AuthContext:
-    user: User
+    user: AuthUser
     roles: list[str]
     areas: list[str]
 
 
+def load_auth_context(db: Session, user_id: int) -> AuthContext | None:
+    user = (
+        db.execute(
+            select(User).options(joinedload(User.roles), joinedload(User.areas)).where(User.id == user_id)
+        )
+        .unique()
+        .scalar_one_or_none()
+    )
+    if not user:
+        return None
+    return AuthContext(
+        user=AuthUser(id=user.id, email=user.email, status=user.status),
+        roles=[role.name for role in user.roles],
+        areas=[area.name for area in user.areas],
+    )
+
+
+def _auth_context_from_claims(payload: dict) -> AuthContext | None:
+    # Read-only requests may skip the database when the token's claims are still
+    # current: any role/area/status change bumps the user's revision in Redis.
+    revision = payload.get("rev")
+    if revision is None or not isinstance(payload.get("areas"), list) or not payload.get("email"):
+        return None
+    user_id = int(payload["sub"])
+    if current_auth_revision(user_id) != revision:
+        return None
+    return AuthContext(
+        user=AuthUser(id=user_id, email=payload["email"], status="active"),
+        roles=list(payload.get("roles") or []),
+        areas=list(payload["areas"]),
+    )
+
+
 def get_current_auth_context(
+    request: Request,
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db),
 ) -> AuthContext:
@@ -45,13 +88,22 @@ def get_current_auth_context(
     if not subject:
         raise credentials_exc
 
-    user = db.get(User, int(subject))
-    if not user or user.status != "active":
-        raise credentials_exc
+    if settings.auth_trust_token_claims and request.method == "GET":
+        ctx = _auth_context_from_claims(payload)
+        if ctx is not None:
+            return ctx
+
+    user_id = int(subject)
+    ctx = auth_context_cache.get(user_id)
+    if ctx is None:
+        ctx = load_auth_context(db, user_id)
+        if ctx is None:
+            raise credentials_exc
+        auth_context_cache.set(user_id, ctx)
 
-    roles = [role.name for role in user.roles]
-    areas = [area.name for area in user.areas]
-    return AuthContext(user=user, roles=roles, areas=areas)
+    if ctx.user.status != "active":
+        raise credentials_exc
+    return ctx
 
 
 def require_roles(*allowed_roles: str):
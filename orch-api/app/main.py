@@ -1,10 +1,18 @@
-from fastapi import FastAPI
+import anyio.to_thread
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from redis.exceptions import RedisError
 
 from app.core.config import settings
-from app.db import Base, SessionLocal, engine
-from app.routers import auth, companies, hetzner, jobs, runbooks, users
-from app.services.seeder import seed_defaults
+from app.db import SessionLocal, engine
+from app.migrations import LATEST_VERSION, SCHEMA_VERSION_KEY, SEED_VERSION_KEY, migrate, read_state
+from app.routers import admin, auth, companies, hetzner, jobs, queue, runbooks, users
+from app.services.audit import audit_outbox
+from app.services import metrics, tracing
+from app.services.auth_cache import start_auth_cache_listener
+from app.services.password_hasher import password_hasher
+from app.services.queue import queue_client
+from app.services.seeder import SEED_VERSION, seed_defaults
 
 app = FastAPI(title=settings.app_name)
 
@@ -15,13 +23,45 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(tracing.TracingMiddleware)
+metrics.instrument_engine(engine, "sync")
+tracing.instrument_engine(engine)
 
 
-@app.on_event("startup")
-def startup() -> None:
-    Base.metadata.create_all(bind=engine)
+def prepare_database() -> bool:
+    # A single read when the database is current; migrations normally run via `manage.py migrate`.
+    with engine.connect() as conn:
+        state = read_state(conn)
+    schema_version = state.get(SCHEMA_VERSION_KEY, 0)
+    seed_version = state.get(SEED_VERSION_KEY, 0)
+    if schema_version >= LATEST_VERSION and seed_version >= SEED_VERSION:
+        return False
+    if not settings.auto_migrate_enabled:
+        raise RuntimeError(
+            f"Database schema {schema_version}/{LATEST_VERSION}, seed {seed_version}/{SEED_VERSION}: "
+            "run `python manage.py migrate`"
+        )
+    migrate(engine)
     with SessionLocal() as db:
         seed_defaults(db)
+    return True
+
+
+@app.on_event("startup")
+def startup() -> None:
+    # Routes are sync and run in this threadpool (40 threads by default), sized with the DB pool.
+    anyio.to_thread.current_default_thread_limiter().total_tokens = max(settings.api_threadpool_size, 1)
+    prepare_database()
+    password_hasher.start()
+    start_auth_cache_listener()
+
+
+@app.on_event("shutdown")
+def shutdown() -> None:
+    audit_outbox.close()
+    password_hasher.close()
+    tracing.shutdown()
 
 
 @app.get("/health")
@@ -29,9 +69,27 @@ def health() -> dict:
     return {"status": "ok", "env": settings.app_env}
 
 
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics() -> Response:
+    # Queue gauges are read at scrape time; a Redis outage leaves the last values in place.
+    try:
+        stats = queue_client.stats()
+    except RedisError:
+        stats = None
+    if stats is not None:
+        for lane in stats["lanes"]:
+            metrics.queue_depth.labels(lane["lane"]).set(lane["depth"])
+        metrics.queue_in_flight.set(stats["in_flight"])
+        metrics.queue_expired_leases.set(stats["expired_leases"])
+    body, content_type = metrics.render_latest()
+    return Response(content=body, media_type=content_type)
+
+
 app.include_router(auth.router, prefix=settings.api_prefix)
 app.include_router(runbooks.router, prefix=settings.api_prefix)
 app.include_router(jobs.router, prefix=settings.api_prefix)
+app.include_router(queue.router, prefix=settings.api_prefix)
 app.include_router(users.router, prefix=settings.api_prefix)
 app.include_router(companies.router, prefix=settings.api_prefix)
 app.include_router(hetzner.router, prefix=settings.api_prefix)
+app.include_router(admin.router, prefix=settings.api_prefix)
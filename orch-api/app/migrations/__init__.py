@@ -0,0 +1,76 @@
+from contextlib import contextmanager
+from types import ModuleType
+
+from sqlalchemy import func, select
+from sqlalchemy.engine import Connection, Engine
+
+from app.migrations import (
+    v0001_initial_schema,
+    v0002_catch_up_legacy_schema,
+    v0003_job_artifacts,
+    v0004_job_log_search,
+    v0005_job_groups,
+    v0006_job_attempts,
+    v0007_policy_jobs,
+)
+from app.models import AppState
+
+# Applied in order, each in its own transaction. v0001 builds new databases from the
+# current models, so every later migration must check before it alters anything.
+MIGRATIONS: list[ModuleType] = [
+    v0001_initial_schema,
+    v0002_catch_up_legacy_schema,
+    v0003_job_artifacts,
+    v0004_job_log_search,
+    v0005_job_groups,
+    v0006_job_attempts,
+    v0007_policy_jobs,
+]
+LATEST_VERSION = MIGRATIONS[-1].VERSION
+
+SCHEMA_VERSION_KEY = "schema_version"
+SEED_VERSION_KEY = "seed_version"
+MIGRATION_LOCK_ID = 0x6F726368  # "orch"
+
+
+def read_state(conn: Connection) -> dict[str, int]:
+    if not conn.dialect.has_table(conn, AppState.__tablename__):
+        return {}
+    return {key: int(value) for key, value in conn.execute(select(AppState.key, AppState.value))}
+
+
+def write_state(conn: Connection, key: str, value: int) -> None:
+    updated = conn.execute(AppState.__table__.update().where(AppState.key == key).values(value=str(value)))
+    if not updated.rowcount:
+        conn.execute(AppState.__table__.insert().values(key=key, value=str(value)))
+
+
+@contextmanager
+def advisory_lock(conn: Connection, lock_id: int = MIGRATION_LOCK_ID):
+    # Replicas starting together queue here; SQLite already serializes writers on the file.
+    if conn.dialect.name != "postgresql":
+        yield
+        return
+    conn.execute(select(func.pg_advisory_lock(lock_id)))
+    conn.commit()
+    try:
+        yield
+    finally:
+        conn.execute(select(func.pg_advisory_unlock(lock_id)))
+        conn.commit()
+
+
+def migrate(engine: Engine) -> list[int]:
+    applied: list[int] = []
+    with engine.connect() as conn, advisory_lock(conn):
+        with conn.begin():
+            AppState.__table__.create(conn, checkfirst=True)
+        for migration in MIGRATIONS:
+            # Re-read under the lock: another process may have applied it while we waited.
+            with conn.begin():
+                if read_state(conn).get(SCHEMA_VERSION_KEY, 0) >= migration.VERSION:
+                    continue
+                migration.upgrade(conn)
+                write_state(conn, SCHEMA_VERSION_KEY, migration.VERSION)
+            applied.append(migration.VERSION)
+    return applied
@@ -0,0 +1,11 @@
+from sqlalchemy.engine import Connection
+
+from app.db import Base
+
+VERSION = 1
+NAME = "initial schema"
+
+
+def upgrade(conn: Connection) -> None:
+    # Creates whatever is missing; databases created before migrations existed keep their tables.
+    Base.metadata.create_all(bind=conn, checkfirst=True)
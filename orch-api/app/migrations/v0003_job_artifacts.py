@@ -0,0 +1,10 @@
+from sqlalchemy.engine import Connection
+
+from app.models import JobArtifact
+
+VERSION = 3
+NAME = "job artifacts stored outside the jobs row"
+
+
+def upgrade(conn: Connection) -> None:
+    JobArtifact.__table__.create(bind=conn, checkfirst=True)
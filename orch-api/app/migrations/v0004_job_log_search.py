@@ -0,0 +1,11 @@
+from sqlalchemy.engine import Connection
+
+from app.services.log_search import ensure_search_index
+
+VERSION = 4
+NAME = "full-text search over job log messages"
+
+
+def upgrade(conn: Connection) -> None:
+    # Postgres rewrites job_logs to add the stored tsvector column: run it in a maintenance window.
+    ensure_search_index(conn)
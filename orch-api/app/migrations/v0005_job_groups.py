@@ -0,0 +1,17 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+from app.models import JobGroup
+
+VERSION = 5
+NAME = "job groups for bulk runbook execution"
+
+
+def upgrade(conn: Connection) -> None:
+    JobGroup.__table__.create(bind=conn, checkfirst=True)
+    inspector = inspect(conn)
+    if "group_id" not in {column["name"] for column in inspector.get_columns("jobs")}:
+        # Nullable with no default: a metadata-only change on both dialects, even on a large table.
+        conn.execute(text("ALTER TABLE jobs ADD COLUMN group_id INTEGER REFERENCES job_groups (id)"))
+    if "ix_jobs_group_id" not in {index["name"] for index in inspect(conn).get_indexes("jobs")}:
+        conn.execute(text("CREATE INDEX ix_jobs_group_id ON jobs (group_id)"))
@@ -0,0 +1,11 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+VERSION = 6
+NAME = "queue delivery that owns each running job"
+
+
+def upgrade(conn: Connection) -> None:
+    if "attempt_id" not in {column["name"] for column in inspect(conn).get_columns("jobs")}:
+        # Nullable with no default: jobs claimed before this keep NULL and are fenced on that.
+        conn.execute(text("ALTER TABLE jobs ADD COLUMN attempt_id VARCHAR(32)"))
@@ -0,0 +1,11 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+VERSION = 7
+NAME = "job of the current run on each hetzner service policy"
+
+
+def upgrade(conn: Connection) -> None:
+    columns = {column["name"] for column in inspect(conn).get_columns("hetzner_service_policies")}
+    if "last_job_id" not in columns:
+        conn.execute(text("ALTER TABLE hetzner_service_policies ADD COLUMN last_job_id INTEGER REFERENCES jobs (id)"))
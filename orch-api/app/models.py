@@ -1,7 +1,19 @@
 from datetime import datetime, timezone
 
-from sqlalchemy import JSON, Boolean, Column, DateTime, ForeignKey, Integer, String, Text, UniqueConstraint
-from sqlalchemy.orm import relationship
+from sqlalchemy import (
+    JSON,
+    BigInteger,
+    Boolean,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    UniqueConstraint,
+)
+from sqlalchemy.orm import deferred, relationship
 
 from app.db import Base
 
@@ -10,6 +22,14 @@ def utcnow() -> datetime:
     return datetime.now(timezone.utc)
 
 
+class AppState(Base):
+    __tablename__ = "app_state"
+
+    key = Column(String(50), primary_key=True)
+    value = Column(String(50), nullable=False)
+    updated_at = Column(DateTime(timezone=True), default=utcnow, onupdate=utcnow, nullable=False)
+
+
 class UserRole(Base):
     __tablename__ = "user_roles"
 
@@ -64,24 +84,48 @@ class Runbook(Base):
     created_at = Column(DateTime(timezone=True), default=utcnow, nullable=False)
 
 
+class JobGroup(Base):
+    """Jobs created together by one bulk execution; progress is aggregated from its jobs."""
+
+    __tablename__ = "job_groups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    runbook_name = Column(String(255), nullable=False)
+    lane = Column(String(20), nullable=False, default="normal")
+    total = Column(Integer, nullable=False)
+    created_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime(timezone=True), default=utcnow, nullable=False)
+
+
 class Job(Base):
     __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_created_at_id", "created_at", "id"),
+        Index("ix_jobs_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_jobs_runbook_created_at_id", "runbook_name", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     runbook_name = Column(String(255), nullable=False, index=True)
     status = Column(String(20), nullable=False, default="PENDING", index=True)
-    input_json = Column(JSON, nullable=False, default=dict)
-    output_json = Column(JSON, nullable=True)
-    created_by = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # Payloads stay out of list scans; load them with undefer() where they are needed.
+    input_json = deferred(Column(JSON, nullable=False, default=dict))
+    output_json = deferred(Column(JSON, nullable=True))
+    created_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    group_id = Column(Integer, ForeignKey("job_groups.id"), nullable=True, index=True)
+    # Queue delivery that claimed the job; only that delivery may record its result.
+    attempt_id = Column(String(32), nullable=True)
     started_at = Column(DateTime(timezone=True), nullable=True)
     finished_at = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), default=utcnow, nullable=False)
 
     logs = relationship("JobLog", back_populates="job", cascade="all, delete-orphan")
+    artifacts = relationship("JobArtifact", back_populates="job", cascade="all, delete-orphan")
 
 
 class JobLog(Base):
     __tablename__ = "job_logs"
+    __table_args__ = (Index("ix_job_logs_job_id_id", "job_id", "id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     job_id = Column(Integer, ForeignKey("jobs.id"), nullable=False, index=True)
@@ -92,6 +136,24 @@ class JobLog(Base):
     job = relationship("Job", back_populates="logs")
 
 
+class JobArtifact(Base):
+    __tablename__ = "job_artifacts"
+    __table_args__ = (UniqueConstraint("job_id", "name", name="uq_job_artifacts_job_name"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("jobs.id", ondelete="CASCADE"), nullable=False, index=True)
+    name = Column(String(255), nullable=False)
+    content_type = Column(String(100), nullable=False, default="application/octet-stream")
+    storage_key = Column(String(512), nullable=False)
+    compression = Column(String(20), nullable=True)
+    size_bytes = Column(BigInteger, nullable=False)
+    stored_bytes = Column(BigInteger, nullable=False)
+    sha256 = Column(String(64), nullable=False)
+    created_at = Column(DateTime(timezone=True), default=utcnow, nullable=False)
+
+    job = relationship("Job", back_populates="artifacts")
+
+
 class AuditLog(Base):
     __tablename__ = "audit_log"
 
@@ -162,7 +224,10 @@ class HetznerServer(Base):
 
 class HetznerServicePolicy(Base):
     __tablename__ = "hetzner_service_policies"
-    __table_args__ = (UniqueConstraint("server_id", "service_type", name="uq_hetzner_policy_server_service"),)
+    __table_args__ = (
+        UniqueConstraint("server_id", "service_type", name="uq_hetzner_policy_server_service"),
+        Index("ix_hetzner_policies_enabled_next_run", "enabled", "next_run_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     server_id = Column(Integer, ForeignKey("hetzner_servers.id"), nullable=False, index=True)
@@ -177,6 +242,8 @@ class HetznerServicePolicy(Base):
     next_run_at = Column(DateTime(timezone=True), nullable=True)
     last_status = Column(String(20), nullable=True)  # success | failed
     last_error = Column(Text, nullable=True)
+    # Job of the current queued/running run; the stale-run sweep only fails runs whose job ended.
+    last_job_id = Column(Integer, ForeignKey("jobs.id"), nullable=True)
     created_at = Column(DateTime(timezone=True), default=utcnow, nullable=False)
     updated_at = Column(DateTime(timezone=True), default=utcnow, onupdate=utcnow, nullable=False)
 
@@ -185,6 +252,7 @@ class HetznerServicePolicy(Base):
 
 class HetznerServiceLog(Base):
     __tablename__ = "hetzner_service_logs"
+    __table_args__ = (Index("ix_hetzner_service_logs_status_action", "status", "external_action_id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     server_id = Column(Integer, ForeignKey("hetzner_servers.id"), nullable=False, index=True)
@@ -192,6 +260,7 @@ class HetznerServiceLog(Base):
     action = Column(String(40), nullable=False, default="run")
     status = Column(String(20), nullable=False, default="ok")
     message = Column(Text, nullable=False)
+    external_action_id = Column(String(64), nullable=True)
     created_by = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
     created_at = Column(DateTime(timezone=True), default=utcnow, nullable=False, index=True)
 
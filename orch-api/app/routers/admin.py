@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+from app.deps import AuthContext, get_db, require_roles
+from app.schemas import StorageReportOut
+from app.services.auth_cache import auth_context_cache
+from app.services.credentials import credential_secrets
+from app.services.hetzner import hetzner_clients
+from app.services.http_cache import response_cache
+from app.services.password_hasher import password_hasher
+from app.services.retention import storage_report
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.get("/caches")
+def cache_stats(
+    _: AuthContext = Depends(require_roles("admin")),
+) -> dict:
+    return {
+        "auth_context": auth_context_cache.stats(),
+        "credential_secrets": credential_secrets.stats(),
+        "hetzner_clients": hetzner_clients.stats(),
+        "http_responses": response_cache.stats(),
+    }
+
+
+@router.get("/password-hasher")
+def password_hasher_stats(
+    _: AuthContext = Depends(require_roles("admin")),
+) -> dict:
+    return password_hasher.stats()
+
+
+@router.get("/storage", response_model=StorageReportOut)
+def storage(
+    db: Session = Depends(get_db),
+    _: AuthContext = Depends(require_roles("admin")),
+) -> StorageReportOut:
+    return StorageReportOut(tables=storage_report(db))
@@ -1,31 +1,76 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy import select
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 
 from app.core.security import (
     create_access_token,
     create_refresh_token,
     decode_token,
-    verify_password,
 )
 from app.deps import AuthContext, get_current_auth_context, get_db
 from app.models import User
 from app.schemas import LoginRequest, MeResponse, RefreshRequest, TokenPair
 from app.services.audit import write_audit
+from app.services.auth_cache import auth_revision
+from app.services.login_throttle import clear_login_failures, release_login_attempt, reserve_login_attempt
+from app.services.password_hasher import HasherBusy, password_hasher
 
 router = APIRouter(tags=["auth"])
 
 
+def _issue_access_token(user: User, roles: list[str], revision: int | None) -> str:
+    # `revision` must be read before the user's roles and areas are loaded: a change committed in
+    # between then bumps past it, instead of being baked into a token that carries the new revision.
+    return create_access_token(
+        subject=str(user.id),
+        roles=roles,
+        areas=[area.name for area in user.areas],
+        email=user.email,
+        revision=revision,
+    )
+
+
+def _load_user(db: Session, *criteria) -> User | None:
+    stmt = select(User).options(selectinload(User.roles), selectinload(User.areas)).where(*criteria)
+    return db.execute(stmt).scalar_one_or_none()
+
+
 @router.post("/auth/login", response_model=TokenPair)
-def login(payload: LoginRequest, db: Session = Depends(get_db)):
+def login(payload: LoginRequest, request: Request, db: Session = Depends(get_db)):
+    client_ip = request.client.host if request.client else None
+    retry_after = reserve_login_attempt(payload.email, client_ip)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many failed login attempts",
+            headers={"Retry-After": str(retry_after)},
+        )
+
     user = db.execute(select(User).where(User.email == payload.email)).scalar_one_or_none()
-    if not user or not verify_password(payload.password, user.password_hash):
+    try:
+        valid, new_hash = password_hasher.verify(payload.password, user.password_hash if user else None)
+    except HasherBusy:
+        release_login_attempt(payload.email, client_ip)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Login temporarily unavailable",
+            headers={"Retry-After": "1"},
+        )
+    if not valid:
+        # The reserved attempt stays counted as the failure.
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    clear_login_failures(payload.email, client_ip)
+    if new_hash:
+        # Stored with an older cost; upgrade while the plain password is at hand.
+        user.password_hash = new_hash
+        db.commit()
     if user.status != "active":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User is disabled")
 
+    revision = auth_revision(user.id)
+    user = _load_user(db, User.id == user.id)
     roles = [r.name for r in user.roles]
-    access_token = create_access_token(subject=str(user.id), roles=roles)
+    access_token = _issue_access_token(user, roles, revision)
     refresh_token = create_refresh_token(subject=str(user.id), roles=roles)
     write_audit(
         db,
@@ -34,6 +79,7 @@ def login(payload: LoginRequest, db: Session = Depends(get_db)):
         target_type="user",
         target_id=str(user.id),
         metadata_json={"email": user.email},
+        buffered=True,
     )
     return TokenPair(access_token=access_token, refresh_token=refresh_token)
 
@@ -45,12 +91,14 @@ def refresh_token(payload: RefreshRequest, db: Session = Depends(get_db)):
     except ValueError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
 
-    user = db.get(User, int(token_data["sub"]))
+    user_id = int(token_data["sub"])
+    revision = auth_revision(user_id)
+    user = _load_user(db, User.id == user_id)
     if not user or user.status != "active":
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
 
     roles = [r.name for r in user.roles]
-    access_token = create_access_token(subject=str(user.id), roles=roles)
+    access_token = _issue_access_token(user, roles, revision)
     refresh_token = create_refresh_token(subject=str(user.id), roles=roles)
     return TokenPair(access_token=access_token, refresh_token=refresh_token)
 
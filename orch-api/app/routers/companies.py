@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import TypeAdapter
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
@@ -14,8 +15,12 @@ from app.schemas import (
     CompanyUpdateRequest,
 )
 from app.services.audit import write_audit
+from app.services.credentials import forget_credential_secret
+from app.services.hetzner import hetzner_clients
+from app.services.http_cache import cached_list_response
 
 router = APIRouter(tags=["companies"])
+COMPANY_LIST = TypeAdapter(list[CompanyOut])
 
 
 def _serialize_credential(row: ApiCredential) -> ApiCredentialOut:
@@ -35,11 +40,14 @@ def _serialize_credential(row: ApiCredential) -> ApiCredentialOut:
 
 @router.get("/companies", response_model=list[CompanyOut])
 def list_companies(
+    request: Request,
     db: Session = Depends(get_db),
     _: AuthContext = Depends(require_roles("admin")),
 ):
-    rows = db.execute(select(Company).order_by(Company.name.asc())).scalars().all()
-    return rows
+    def load():
+        return db.execute(select(Company).order_by(Company.name.asc())).scalars().all()
+
+    return cached_list_response(request, ("companies",), "", COMPANY_LIST, load)
 
 
 @router.post("/companies", response_model=CompanyOut)
@@ -58,8 +66,7 @@ def create_company(
 
     row = Company(name=name, status=payload.status)
     db.add(row)
-    db.commit()
-    db.refresh(row)
+    db.flush()
     write_audit(
         db,
         actor_user_id=ctx.user.id,
@@ -68,6 +75,8 @@ def create_company(
         target_id=str(row.id),
         metadata_json={"name": row.name},
     )
+    db.commit()
+    db.refresh(row)
     return row
 
 
@@ -96,8 +105,6 @@ def update_company(
     if payload.status is not None:
         row.status = payload.status
 
-    db.commit()
-    db.refresh(row)
     write_audit(
         db,
         actor_user_id=ctx.user.id,
@@ -106,6 +113,8 @@ def update_company(
         target_id=str(row.id),
         metadata_json={"name": row.name},
     )
+    db.commit()
+    db.refresh(row)
     return row
 
 
@@ -155,8 +164,7 @@ def create_company_credential(
         secret_encrypted=encrypt_secret(payload.secret_value.strip()),
     )
     db.add(row)
-    db.commit()
-    db.refresh(row)
+    db.flush()
     write_audit(
         db,
         actor_user_id=ctx.user.id,
@@ -165,6 +173,8 @@ def create_company_credential(
         target_id=str(row.id),
         metadata_json={"company_id": company_id, "provider": row.provider, "label": row.label},
     )
+    db.commit()
+    db.refresh(row)
     return _serialize_credential(row)
 
 
@@ -195,8 +205,6 @@ def update_credential(
             raise HTTPException(status_code=400, detail="Secret value cannot be empty")
         row.secret_encrypted = encrypt_secret(secret)
 
-    db.commit()
-    db.refresh(row)
     write_audit(
         db,
         actor_user_id=ctx.user.id,
@@ -205,6 +213,10 @@ def update_credential(
         target_id=str(row.id),
         metadata_json={"provider": row.provider, "label": row.label},
     )
+    db.commit()
+    db.refresh(row)
+    hetzner_clients.invalidate(row.id)
+    forget_credential_secret(row.id)
     return _serialize_credential(row)
 
 
@@ -232,7 +244,6 @@ def delete_credential(
     provider = row.provider
     label = row.label
     db.delete(row)
-    db.commit()
     write_audit(
         db,
         actor_user_id=ctx.user.id,
@@ -241,4 +252,7 @@ def delete_credential(
         target_id=str(credential_id),
         metadata_json={"provider": provider, "label": label},
     )
+    db.commit()
+    hetzner_clients.invalidate(credential_id)
+    forget_credential_secret(credential_id)
     return {"ok": True}
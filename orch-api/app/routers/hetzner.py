@@ -1,16 +1,15 @@
-import json
+from dataclasses import asdict
 from datetime import datetime, timedelta, timezone
-from urllib.error import HTTPError, URLError
-from urllib.request import Request, urlopen
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from pydantic import TypeAdapter
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from app.core.secrets import decrypt_secret
 from app.deps import AuthContext, get_db, require_roles
 from app.models import ApiCredential, Company, HetznerServer, HetznerServiceLog, HetznerServicePolicy
 from app.schemas import (
+    ExecuteRunbookResponse,
     HetznerImportRequest,
     HetznerServerCreateRequest,
     HetznerServerOut,
@@ -20,12 +19,18 @@ from app.schemas import (
     HetznerServicePolicyOut,
     HetznerServicePolicyUpsertRequest,
     HetznerServiceRunRequest,
+    HetznerStatusSummaryOut,
 )
 from app.services.audit import write_audit
+from app.services.hetzner_import import HETZNER_IMPORT_RUNBOOK, ensure_default_policies
+from app.services.hetzner_scheduler import POLICY_RUN_RUNBOOK
+from app.services.hetzner_status import ALERT_STATUSES, load_status_board, status_summary
+from app.services.http_cache import cached_list_response
+from app.services.jobs import create_job, enqueue_created_job, submit_job
 
 router = APIRouter(tags=["hetzner"])
-HETZNER_API_BASE = "https://api.hetzner.cloud/v1"
 SERVICE_TYPES = {"backup", "snapshot"}
+SERVER_LIST = TypeAdapter(list[HetznerServerOut])
 
 
 def _utcnow() -> datetime:
@@ -85,6 +90,7 @@ def _serialize_log(row: HetznerServiceLog) -> HetznerServiceLogOut:
         action=row.action,
         status=row.status,
         message=row.message,
+        external_action_id=row.external_action_id,
         created_by=row.created_by,
         created_at=row.created_at,
     )
@@ -97,91 +103,25 @@ def _ensure_service_type(service_type: str) -> str:
     return normalized
 
 
-def _policy_status(policy: HetznerServicePolicy | None) -> tuple[str, str]:
-    if not policy:
-        return "sem_politica", "Servico sem politica configurada"
-    if not policy.enabled:
-        return "pausado", "Politica desativada"
-    if policy.last_status == "failed":
-        return "falha", policy.last_error or "Ultima execucao falhou"
-    if policy.last_run_at is None:
-        return "atraso", "Nunca executado"
-    if policy.schedule_mode == "interval" and policy.interval_minutes:
-        deadline = policy.last_run_at + timedelta(minutes=max(policy.interval_minutes, 1))
-        if _utcnow() > deadline:
-            return "atraso", "Execucao atrasada"
-    return "ok", "Execucao em dia"
-
-
-def _fetch_hetzner_servers(token: str) -> list[dict]:
-    request = Request(
-        f"{HETZNER_API_BASE}/servers",
-        headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
-        method="GET",
-    )
-    try:
-        with urlopen(request, timeout=20) as response:
-            payload = json.loads(response.read().decode("utf-8"))
-    except HTTPError as exc:
-        body = exc.read().decode("utf-8", errors="ignore")
-        raise HTTPException(status_code=400, detail=f"Hetzner API error: {exc.code} {body[:300]}")
-    except URLError as exc:
-        raise HTTPException(status_code=400, detail=f"Hetzner API unreachable: {exc.reason}")
-    return payload.get("servers", [])
-
-
-def _hetzner_action(token: str, server_external_id: str, action_path: str, payload: dict | None = None) -> dict:
-    body = json.dumps(payload or {}).encode("utf-8")
-    request = Request(
-        f"{HETZNER_API_BASE}/servers/{server_external_id}/actions/{action_path}",
-        headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
-        method="POST",
-        data=body,
-    )
-    try:
-        with urlopen(request, timeout=20) as response:
-            return json.loads(response.read().decode("utf-8"))
-    except HTTPError as exc:
-        body = exc.read().decode("utf-8", errors="ignore")
-        raise HTTPException(status_code=400, detail=f"Hetzner action error: {exc.code} {body[:300]}")
-    except URLError as exc:
-        raise HTTPException(status_code=400, detail=f"Hetzner action unreachable: {exc.reason}")
-
-
 def _ensure_default_policies(db: Session, server_id: int) -> None:
-    for service in ("backup", "snapshot"):
-        exists = db.execute(
-            select(HetznerServicePolicy).where(
-                HetznerServicePolicy.server_id == server_id,
-                HetznerServicePolicy.service_type == service,
-            )
-        ).scalar_one_or_none()
-        if not exists:
-            db.add(
-                HetznerServicePolicy(
-                    server_id=server_id,
-                    service_type=service,
-                    enabled=False,
-                    require_confirmation=True,
-                    schedule_mode="manual",
-                )
-            )
+    ensure_default_policies(db, [server_id])
     db.commit()
 
 
 @router.get("/companies/{company_id}/hetzner/servers", response_model=list[HetznerServerOut])
 def list_hetzner_servers(
     company_id: int,
+    request: Request,
     db: Session = Depends(get_db),
     _: AuthContext = Depends(require_roles("admin")),
 ):
-    _get_company_or_404(db, company_id)
-    rows = (
-        db.execute(select(HetznerServer).where(HetznerServer.company_id == company_id).order_by(HetznerServer.name.asc()))
-        .scalars()
-        .all()
-    )
-    return [_serialize_server(row) for row in rows]
+    def load():
+        _get_company_or_404(db, company_id)
+        stmt = select(HetznerServer).where(HetznerServer.company_id == company_id).order_by(HetznerServer.name.asc())
+        return [_serialize_server(row) for row in db.execute(stmt).scalars().all()]
+
+    # The company is part of the URL; its revision covers it being renamed or removed.
+    return cached_list_response(request, ("hetzner_servers", "companies"), "", SERVER_LIST, load)
 
 
 @router.post("/companies/{company_id}/hetzner/servers", response_model=HetznerServerOut)
@@ -213,9 +153,8 @@ def create_hetzner_server(
         status="active",
     )
     db.add(row)
-    db.commit()
-    db.refresh(row)
-    _ensure_default_policies(db, row.id)
+    db.flush()
+    ensure_default_policies(db, [row.id])
     write_audit(
         db,
         actor_user_id=ctx.user.id,
@@ -224,10 +163,12 @@ def create_hetzner_server(
         target_id=str(row.id),
         metadata_json={"company_id": company_id, "external_id": row.external_id, "name": row.name},
     )
+    db.commit()
+    db.refresh(row)
     return _serialize_server(row)
 
 
-@router.post("/companies/{company_id}/hetzner/import", response_model=list[HetznerServerOut])
+@router.post("/companies/{company_id}/hetzner/import", response_model=ExecuteRunbookResponse)
 def import_hetzner_servers(
     company_id: int,
     payload: HetznerImportRequest,
@@ -241,56 +182,17 @@ def import_hetzner_servers(
     if credential.provider != "hetzner":
         raise HTTPException(status_code=400, detail="Credential provider must be hetzner")
 
-    token = decrypt_secret(credential.secret_encrypted)
-    servers = _fetch_hetzner_servers(token)
-
-    upserted: list[HetznerServer] = []
-    for srv in servers:
-        external_id = str(srv.get("id"))
-        if not external_id:
-            continue
-        row = db.execute(
-            select(HetznerServer).where(
-                HetznerServer.company_id == company_id,
-                HetznerServer.external_id == external_id,
-            )
-        ).scalar_one_or_none()
-        ipv4 = ((srv.get("public_net") or {}).get("ipv4") or {}).get("ip")
-        datacenter = ((srv.get("datacenter") or {}).get("name")) or None
-        if row:
-            row.name = srv.get("name") or row.name
-            row.datacenter = datacenter
-            row.ipv4 = ipv4
-            row.labels_json = srv.get("labels") or {}
-            row.credential_id = credential.id
-        else:
-            row = HetznerServer(
-                company_id=company_id,
-                credential_id=credential.id,
-                external_id=external_id,
-                name=srv.get("name") or f"server-{external_id}",
-                datacenter=datacenter,
-                ipv4=ipv4,
-                labels_json=srv.get("labels") or {},
-                status="active",
-            )
-            db.add(row)
-        upserted.append(row)
-
-    db.commit()
-    for row in upserted:
-        db.refresh(row)
-        _ensure_default_policies(db, row.id)
-
-    write_audit(
+    job = submit_job(
         db,
-        actor_user_id=ctx.user.id,
-        action="hetzner.server.import",
-        target_type="company",
-        target_id=str(company_id),
-        metadata_json={"credential_id": credential.id, "imported_count": len(upserted)},
+        HETZNER_IMPORT_RUNBOOK,
+        {"company_id": company_id, "credential_id": credential.id},
+        created_by=ctx.user.id,
+        requested_by=f"user {ctx.user.email}",
+        tenant=f"company:{company_id}",
     )
-    return [_serialize_server(row) for row in upserted]
+    if job.status == "ERROR":
+        raise HTTPException(status_code=503, detail="Queue unavailable")
+    return ExecuteRunbookResponse(job_id=job.id, status=job.status)
 
 
 @router.patch("/hetzner/servers/{server_id}", response_model=HetznerServerOut)
@@ -330,8 +232,6 @@ def update_hetzner_server(
     if payload.allow_snapshot is not None:
         row.allow_snapshot = payload.allow_snapshot
 
-    db.commit()
-    db.refresh(row)
     write_audit(
         db,
         actor_user_id=ctx.user.id,
@@ -340,6 +240,8 @@ def update_hetzner_server(
         target_id=str(row.id),
         metadata_json={"name": row.name, "allow_backup": row.allow_backup, "allow_snapshot": row.allow_snapshot},
     )
+    db.commit()
+    db.refresh(row)
     return _serialize_server(row)
 
 
@@ -413,8 +315,7 @@ def upsert_server_policy(
         )
     )
 
-    db.commit()
-    db.refresh(row)
+    db.flush()
     write_audit(
         db,
         actor_user_id=ctx.user.id,
@@ -423,6 +324,8 @@ def upsert_server_policy(
         target_id=str(row.id),
         metadata_json={"server_id": server_id, "service_type": row.service_type},
     )
+    db.commit()
+    db.refresh(row)
     return _serialize_policy(row)
 
 
@@ -462,47 +365,43 @@ def run_service_now(
     if not credential or credential.provider != "hetzner":
         raise HTTPException(status_code=400, detail="Invalid Hetzner credential")
 
-    token = decrypt_secret(credential.secret_encrypted)
-    action_label = ""
-    if normalized_service == "snapshot":
-        _hetzner_action(
-            token,
-            server.external_id,
-            "create_image",
-            {"type": "snapshot", "description": f"omniforge-{server.name}-{int(_utcnow().timestamp())}"},
-        )
-        action_label = "Snapshot created via Hetzner create_image"
-    else:
-        _hetzner_action(token, server.external_id, "enable_backup", {})
-        action_label = "Automatic backup enabled via Hetzner enable_backup"
-
-    policy.last_run_at = _utcnow()
-    policy.last_status = "success"
-    policy.last_error = None
-    if policy.schedule_mode == "interval" and policy.interval_minutes:
-        policy.next_run_at = policy.last_run_at + timedelta(minutes=max(policy.interval_minutes, 1))
+    if policy.last_status in {"queued", "running"}:
+        raise HTTPException(status_code=409, detail="Service run already in progress")
 
-    db.add(
-        HetznerServiceLog(
-            server_id=server_id,
-            service_type=normalized_service,
-            action="run_now",
-            status="ok",
-            message=action_label,
-            created_by=ctx.user.id,
-        )
+    # Job, "queued" status and audit row commit together before the message is enqueued,
+    # so the worker's later update can never be overwritten.
+    # Manual runs skip the per-credential cap applied to scheduled ones.
+    previous_status = policy.last_status
+    policy.last_status = "queued"
+    job = create_job(
+        db,
+        POLICY_RUN_RUNBOOK,
+        {
+            "policy_id": policy.id,
+            "credential_id": credential.id,
+            "company_id": server.company_id,
+            "trigger": "manual",
+        },
+        created_by=ctx.user.id,
+        requested_by=f"user {ctx.user.email}",
     )
-
-    db.commit()
-    db.refresh(policy)
+    policy.last_job_id = job.id
     write_audit(
         db,
         actor_user_id=ctx.user.id,
         action="hetzner.service.run",
         target_type="hetzner_policy",
         target_id=str(policy.id),
-        metadata_json={"server_id": server.id, "service_type": normalized_service},
+        metadata_json={"server_id": server.id, "service_type": normalized_service, "job_id": job.id},
     )
+    db.commit()
+    enqueue_created_job(db, job, tenant=f"company:{server.company_id}")
+    if job.status == "ERROR":
+        policy.last_status = previous_status
+        db.commit()
+        raise HTTPException(status_code=503, detail="Queue unavailable")
+
+    db.refresh(policy)
     return _serialize_policy(policy)
 
 
@@ -535,34 +434,19 @@ def list_hetzner_status(
     _: AuthContext = Depends(require_roles("admin")),
 ):
     _get_company_or_404(db, company_id)
-    servers = (
-        db.execute(select(HetznerServer).where(HetznerServer.company_id == company_id).order_by(HetznerServer.name.asc()))
-        .scalars()
-        .all()
-    )
+    board = load_status_board(db, company_id)
+    return [HetznerServerStatusOut(**asdict(item)) for item in board]
 
-    results: list[HetznerServerStatusOut] = []
-    for server in servers:
-        for service in ("backup", "snapshot"):
-            policy = db.execute(
-                select(HetznerServicePolicy).where(
-                    HetznerServicePolicy.server_id == server.id,
-                    HetznerServicePolicy.service_type == service,
-                )
-            ).scalar_one_or_none()
-            status, details = _policy_status(policy)
-            results.append(
-                HetznerServerStatusOut(
-                    server_id=server.id,
-                    server_name=server.name,
-                    service_type=service,
-                    status=status,
-                    details=details,
-                    next_run_at=policy.next_run_at if policy else None,
-                    last_run_at=policy.last_run_at if policy else None,
-                )
-            )
-    return results
+
+@router.get("/companies/{company_id}/hetzner/status/summary", response_model=HetznerStatusSummaryOut)
+def get_hetzner_status_summary(
+    company_id: int,
+    db: Session = Depends(get_db),
+    _: AuthContext = Depends(require_roles("admin")),
+):
+    _get_company_or_404(db, company_id)
+    summary, cached = status_summary(db, company_id)
+    return HetznerStatusSummaryOut(**summary, cached=cached)
 
 
 @router.get("/companies/{company_id}/hetzner/alerts", response_model=list[HetznerServerStatusOut])
@@ -571,5 +455,6 @@ def list_hetzner_alerts(
     db: Session = Depends(get_db),
     _: AuthContext = Depends(require_roles("admin")),
 ):
-    statuses = list_hetzner_status(company_id=company_id, db=db)
-    return [item for item in statuses if item.status in {"atraso", "falha", "sem_politica"}]
+    _get_company_or_404(db, company_id)
+    board = load_status_board(db, company_id)
+    return [HetznerServerStatusOut(**asdict(item)) for item in board if item.status in ALERT_STATUSES]
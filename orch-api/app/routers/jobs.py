@@ -1,51 +1,172 @@
 import asyncio
 import json
+import time
+from datetime import datetime
 from typing import AsyncGenerator
+from urllib.parse import quote
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse
-from sqlalchemy import func, select
-from sqlalchemy.orm import Session
+from redis.exceptions import RedisError
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.orm import Session, undefer
 
 from app.db import SessionLocal
 from app.deps import AuthContext, get_db, require_roles
-from app.models import Job, JobLog
-from app.schemas import JobLogOut, JobOut, JobsListResponse
-from app.services.jobs import TERMINAL_STATUSES
+from app.models import Job, JobArtifact, JobGroup, JobLog
+from app.schemas import (
+    JobArtifactOut,
+    JobGroupOut,
+    JobLogOut,
+    JobLogSearchPage,
+    JobLogsPage,
+    JobOut,
+    JobsListResponse,
+)
+from app.services.artifacts import ArtifactNotFound, open_artifact
+from app.services.jobs import TERMINAL_STATUSES, serialize_job_log
+from app.services.log_search import search_job_logs
+from app.services.pagination import InvalidCursor, count_rows, decode_cursor, encode_cursor
+from app.services.queue import job_events_channel, queue_client
 
 router = APIRouter(prefix="/jobs", tags=["jobs"])
+STREAM_KEEPALIVE_SECONDS = 15
+STREAM_MAX_IDLE_SECONDS = 120
 
 
 @router.get("", response_model=JobsListResponse)
 def list_jobs(
     status: str | None = None,
     runbook: str | None = None,
-    page: int = Query(1, ge=1),
+    group_id: int | None = None,
+    cursor: str | None = None,
+    page: int | None = Query(None, ge=1),
     page_size: int = Query(20, ge=1, le=200),
+    total: str = Query("none", pattern="^(none|exact|estimate)$"),
     db: Session = Depends(get_db),
     _: AuthContext = Depends(require_roles("admin", "operator", "viewer")),
 ):
+    if page is not None and cursor:
+        raise HTTPException(status_code=400, detail="Use either page or cursor")
     stmt = select(Job)
-    count_stmt = select(func.count(Job.id))
-
     if status:
         stmt = stmt.where(Job.status == status)
-        count_stmt = count_stmt.where(Job.status == status)
     if runbook:
         stmt = stmt.where(Job.runbook_name == runbook)
-        count_stmt = count_stmt.where(Job.runbook_name == runbook)
-
-    total = db.execute(count_stmt).scalar() or 0
-    items = (
-        db.execute(
-            stmt.order_by(Job.created_at.desc())
-            .offset((page - 1) * page_size)
-            .limit(page_size)
-        )
-        .scalars()
-        .all()
+    if group_id is not None:
+        stmt = stmt.where(Job.group_id == group_id)
+
+    total_count: int | None = None
+    total_is_estimate = False
+    if page is not None:
+        # Legacy offset paging: same page/total shape as before cursors, at the cost of a count and OFFSET.
+        total = "exact"
+    if total != "none":
+        total_count, total_is_estimate = count_rows(db, stmt, estimate=total == "estimate")
+
+    if cursor:
+        try:
+            created_at, last_id = decode_cursor(cursor, 2)
+            created_at = datetime.fromisoformat(created_at)
+            last_id = int(last_id)
+        except (InvalidCursor, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        stmt = stmt.where(tuple_(Job.created_at, Job.id) < tuple_(created_at, last_id))
+
+    stmt = stmt.order_by(Job.created_at.desc(), Job.id.desc())
+    if page is not None:
+        stmt = stmt.offset((page - 1) * page_size)
+    rows = db.execute(stmt.limit(page_size + 1)).scalars().all()
+    items = rows[:page_size]
+    next_cursor = encode_cursor(items[-1].created_at, items[-1].id) if len(rows) > page_size else None
+    return JobsListResponse(
+        items=items,
+        page=page,
+        page_size=page_size,
+        next_cursor=next_cursor,
+        total=total_count,
+        total_is_estimate=total_is_estimate,
+    )
+
+
+@router.get("/logs/search", response_model=JobLogSearchPage)
+def search_logs(
+    q: str = Query(..., min_length=1, max_length=200),
+    runbook: str | None = None,
+    status: str | None = None,
+    level: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    cursor: str | None = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+    _: AuthContext = Depends(require_roles("admin", "operator", "viewer")),
+):
+    before_id = None
+    if cursor:
+        try:
+            (before_id,) = decode_cursor(cursor, 1)
+            before_id = int(before_id)
+        except (InvalidCursor, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    items, next_before_id = search_job_logs(
+        db,
+        q,
+        limit,
+        before_id=before_id,
+        runbook=runbook,
+        status=status,
+        level=level,
+        since=since,
+        until=until,
+    )
+    return JobLogSearchPage(
+        items=items,
+        next_cursor=encode_cursor(next_before_id) if next_before_id is not None else None,
+    )
+
+
+@router.get("/groups/{group_id}", response_model=JobGroupOut)
+def get_job_group(
+    group_id: int,
+    db: Session = Depends(get_db),
+    _: AuthContext = Depends(require_roles("admin", "operator", "viewer")),
+):
+    group = db.get(JobGroup, group_id)
+    if not group:
+        raise HTTPException(status_code=404, detail="Job group not found")
+    # One aggregate over the group_id index; the jobs themselves page through GET /jobs?group_id=.
+    rows = db.execute(
+        select(Job.status, func.count(), func.min(Job.started_at), func.max(Job.finished_at))
+        .where(Job.group_id == group_id)
+        .group_by(Job.status)
+    )
+    counts: dict[str, int] = {}
+    started: list[datetime] = []
+    finished_at: list[datetime] = []
+    for status, count, first_start, last_finish in rows:
+        counts[status] = count
+        if first_start is not None:
+            started.append(first_start)
+        if last_finish is not None:
+            finished_at.append(last_finish)
+    finished = sum(count for status, count in counts.items() if status in TERMINAL_STATUSES)
+    done = finished >= group.total
+    return JobGroupOut(
+        id=group.id,
+        runbook_name=group.runbook_name,
+        lane=group.lane,
+        total=group.total,
+        created_by=group.created_by,
+        created_at=group.created_at,
+        counts=counts,
+        finished=finished,
+        done=done,
+        started_at=min(started) if started else None,
+        finished_at=max(finished_at) if done and finished_at else None,
     )
-    return JobsListResponse(items=items, total=total, page=page, page_size=page_size)
 
 
 @router.get("/{job_id}", response_model=JobOut)
@@ -54,83 +175,207 @@ def get_job(
     db: Session = Depends(get_db),
     _: AuthContext = Depends(require_roles("admin", "operator", "viewer")),
 ):
-    job = db.get(Job, job_id)
+    job = db.get(Job, job_id, options=[undefer(Job.input_json), undefer(Job.output_json)])
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     return job
 
 
-@router.get("/{job_id}/logs", response_model=list[JobLogOut])
+@router.get("/{job_id}/artifacts", response_model=list[JobArtifactOut])
+def list_job_artifacts(
+    job_id: int,
+    db: Session = Depends(get_db),
+    _: AuthContext = Depends(require_roles("admin", "operator", "viewer")),
+):
+    stmt = select(JobArtifact).where(JobArtifact.job_id == job_id).order_by(JobArtifact.name.asc())
+    return db.execute(stmt).scalars().all()
+
+
+def _content_disposition(filename: str) -> str:
+    # RFC 6266: an ASCII-only quoted fallback plus the exact name percent-encoded in filename*.
+    fallback = "".join(c if 32 <= ord(c) < 127 and c not in '"\\' else "_" for c in filename)
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+
+@router.get("/{job_id}/artifacts/{name}")
+def download_job_artifact(
+    job_id: int,
+    name: str,
+    accept_encoding: str | None = Header(default=None),
+    db: Session = Depends(get_db),
+    _: AuthContext = Depends(require_roles("admin", "operator", "viewer")),
+):
+    artifact = db.execute(
+        select(JobArtifact).where(JobArtifact.job_id == job_id, JobArtifact.name == name)
+    ).scalar_one_or_none()
+    if not artifact:
+        raise HTTPException(status_code=404, detail="Artifact not found")
+
+    # Clients that accept zstd get the stored bytes as-is; everyone else gets them decompressed on the fly.
+    passthrough = artifact.compression == "zstd" and "zstd" in (accept_encoding or "").lower()
+    try:
+        chunks = open_artifact(artifact, not passthrough)
+    except ArtifactNotFound:
+        raise HTTPException(status_code=404, detail="Artifact content missing")
+    headers = {
+        "Content-Disposition": _content_disposition(artifact.name),
+        "Content-Length": str(artifact.stored_bytes if passthrough else artifact.size_bytes),
+        "X-Content-SHA256": artifact.sha256,
+    }
+    if passthrough:
+        headers["Content-Encoding"] = "zstd"
+    return StreamingResponse(chunks, media_type=artifact.content_type, headers=headers)
+
+
+@router.get("/{job_id}/logs", response_model=list[JobLogOut] | JobLogsPage)
 def get_job_logs(
     job_id: int,
+    after_id: int | None = Query(default=None, ge=0),
+    before_id: int | None = Query(default=None, ge=1),
     limit: int = Query(200, ge=1, le=2000),
     db: Session = Depends(get_db),
     _: AuthContext = Depends(require_roles("admin", "operator", "viewer")),
 ):
-    logs = (
-        db.execute(
-            select(JobLog)
-            .where(JobLog.job_id == job_id)
-            .order_by(JobLog.id.desc())
-            .limit(limit)
+    if after_id is not None and before_id is not None:
+        raise HTTPException(status_code=400, detail="Use either after_id or before_id")
+
+    stmt = select(JobLog).where(JobLog.job_id == job_id)
+    if after_id is None and before_id is None:
+        # No cursor: the original response, a bare list of the newest `limit` lines in order.
+        rows = db.execute(stmt.order_by(JobLog.id.desc()).limit(limit)).scalars().all()
+        return list(reversed(rows))
+    if before_id is not None:
+        # Paging backwards (e.g. from the newest line): next_cursor is the next before_id.
+        rows = (
+            db.execute(stmt.where(JobLog.id < before_id).order_by(JobLog.id.desc()).limit(limit + 1))
+            .scalars()
+            .all()
         )
+        items = list(reversed(rows[:limit]))
+        next_cursor = items[0].id if len(rows) > limit else None
+        return JobLogsPage(items=items, next_cursor=next_cursor)
+
+    rows = (
+        db.execute(stmt.where(JobLog.id > (after_id or 0)).order_by(JobLog.id.asc()).limit(limit + 1))
         .scalars()
         .all()
     )
-    logs.reverse()
-    return logs
+    items = rows[:limit]
+    next_cursor = items[-1].id if len(rows) > limit else None
+    return JobLogsPage(items=items, next_cursor=next_cursor)
 
 
-async def _stream_job_logs(job_id: int) -> AsyncGenerator[str, None]:
-    last_id = 0
-    idle_cycles = 0
-    max_idle_cycles = 120  # ~2 minutes at 1s sleep.
+def _load_job_logs_since(job_id: int, last_id: int) -> tuple[list[dict], str | None]:
+    # Own short-lived session: the request's session is closed while the stream is still open.
+    with SessionLocal() as db:
+        rows = (
+            db.execute(
+                select(JobLog)
+                .where(JobLog.job_id == job_id, JobLog.id > last_id)
+                .order_by(JobLog.id.asc())
+            )
+            .scalars()
+            .all()
+        )
+        job_status = db.execute(select(Job.status).where(Job.id == job_id)).scalar_one_or_none()
+        return [serialize_job_log(row) for row in rows], job_status
+
 
+def _sse_log(payload: dict) -> str:
+    return f"id: {payload['id']}\ndata: {json.dumps(payload)}\n\n"
+
+
+def _sse_end(data: dict) -> str:
+    return f"event: end\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+async def _poll_job_logs(job_id: int, last_id: int) -> AsyncGenerator[str, None]:
+    # Fallback used only when Redis pub/sub is unavailable.
+    idle_cycles = 0
     while True:
-        with SessionLocal() as db:
-            rows = (
-                db.execute(
-                    select(JobLog)
-                    .where(JobLog.job_id == job_id, JobLog.id > last_id)
-                    .order_by(JobLog.id.asc())
-                )
-                .scalars()
-                .all()
-            )
+        rows, job_status = await run_in_threadpool(_load_job_logs_since, job_id, last_id)
+        if rows:
+            for payload in rows:
+                yield _sse_log(payload)
+                last_id = payload["id"]
+            idle_cycles = 0
+        else:
+            idle_cycles += 1
+            yield ": keep-alive\n\n"
+
+        if job_status is None:
+            yield _sse_end({"reason": "job_not_found"})
+            return
+        if job_status in TERMINAL_STATUSES and idle_cycles > 2:
+            yield _sse_end({"status": job_status})
+            return
+        if idle_cycles >= STREAM_MAX_IDLE_SECONDS:
+            yield _sse_end({"reason": "timeout"})
+            return
+        await asyncio.sleep(1)
 
-            if rows:
-                for row in rows:
-                    payload = {
-                        "id": row.id,
-                        "job_id": row.job_id,
-                        "ts": row.ts.isoformat(),
-                        "level": row.level,
-                        "message": row.message,
-                    }
-                    yield f"data: {json.dumps(payload)}\n\n"
-                    last_id = row.id
-                idle_cycles = 0
-            else:
-                idle_cycles += 1
+
+async def _stream_job_logs(job_id: int, last_id: int) -> AsyncGenerator[str, None]:
+    pubsub = queue_client.job_events_pubsub()
+    try:
+        # Subscribe before the backfill so nothing published in between is lost.
+        await pubsub.subscribe(job_events_channel(job_id))
+    except RedisError:
+        await pubsub.aclose()
+        async for chunk in _poll_job_logs(job_id, last_id):
+            yield chunk
+        return
+
+    try:
+        rows, job_status = await run_in_threadpool(_load_job_logs_since, job_id, last_id)
+        for payload in rows:
+            yield _sse_log(payload)
+            last_id = payload["id"]
+        if job_status is None:
+            yield _sse_end({"reason": "job_not_found"})
+            return
+        if job_status in TERMINAL_STATUSES:
+            yield _sse_end({"status": job_status})
+            return
+
+        idle_since = time.monotonic()
+        while True:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=STREAM_KEEPALIVE_SECONDS)
+            if message is None:
+                if time.monotonic() - idle_since >= STREAM_MAX_IDLE_SECONDS:
+                    yield _sse_end({"reason": "timeout"})
+                    return
                 yield ": keep-alive\n\n"
+                continue
 
-            job = db.get(Job, job_id)
-            if not job:
-                yield 'event: end\ndata: {"reason":"job_not_found"}\n\n'
-                break
-            if job.status in TERMINAL_STATUSES and idle_cycles > 2:
-                yield f'event: end\ndata: {{"status":"{job.status}"}}\n\n'
-                break
-
-        if idle_cycles >= max_idle_cycles:
-            yield 'event: end\ndata: {"reason":"timeout"}\n\n'
-            break
-        await asyncio.sleep(1)
+            event = json.loads(message["data"])
+            if event.get("kind") == "status":
+                if event.get("status") in TERMINAL_STATUSES:
+                    yield _sse_end({"status": event["status"]})
+                    return
+                continue
+
+            payload = event.get("log") or {}
+            if payload.get("id", 0) <= last_id:
+                continue
+            yield _sse_log(payload)
+            last_id = payload["id"]
+            idle_since = time.monotonic()
+    except RedisError:
+        yield _sse_end({"reason": "stream_unavailable"})
+    finally:
+        try:
+            await pubsub.unsubscribe()
+            await pubsub.aclose()
+        except RedisError:
+            pass
 
 
 @router.get("/{job_id}/logs/stream")
 def stream_job_logs(
     job_id: int,
+    last_event_id: int | None = Query(default=None, ge=0),
+    last_event_id_header: str | None = Header(default=None, alias="Last-Event-ID"),
     db: Session = Depends(get_db),
     _: AuthContext = Depends(require_roles("admin", "operator", "viewer")),
 ):
@@ -138,9 +383,12 @@ def stream_job_logs(
     if not exists:
         raise HTTPException(status_code=404, detail="Job not found")
 
+    resume_from = last_event_id or 0
+    if last_event_id_header and last_event_id_header.strip().isdigit():
+        resume_from = max(resume_from, int(last_event_id_header.strip()))
+
     return StreamingResponse(
-        _stream_job_logs(job_id),
+        _stream_job_logs(job_id, resume_from),
         media_type="text/event-stream",
         headers={"Cache-Control": "no-cache", "Connection": "keep-alive"},
     )
-
@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Depends, HTTPException
+from redis.exceptions import RedisError
+
+from app.deps import AuthContext, require_roles
+from app.schemas import QueueStatsOut
+from app.services.queue import queue_client
+
+router = APIRouter(prefix="/queue", tags=["queue"])
+
+
+@router.get("/stats", response_model=QueueStatsOut)
+def queue_stats(
+    _: AuthContext = Depends(require_roles("admin", "operator")),
+):
+    try:
+        return queue_client.stats()
+    except RedisError:
+        raise HTTPException(status_code=503, detail="Queue unavailable")
@@ -1,30 +1,67 @@
-from fastapi import APIRouter, Depends, HTTPException
-from redis.exceptions import RedisError
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import TypeAdapter
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
 from app.deps import AuthContext, get_db, require_roles
-from app.models import Job, Runbook
-from app.schemas import ExecuteRunbookRequest, ExecuteRunbookResponse, RunbookOut
+from app.models import Runbook
+from app.schemas import (
+    ExecuteRunbookBulkRequest,
+    ExecuteRunbookBulkResponse,
+    ExecuteRunbookRequest,
+    ExecuteRunbookResponse,
+    RunbookOut,
+)
 from app.services.audit import write_audit
-from app.services.jobs import append_job_log
-from app.services.queue import queue_client
+from app.services.http_cache import cached_list_response
+from app.services.tracing import start_span
+from app.services.jobs import (
+    create_job,
+    create_job_group,
+    enqueue_created_job,
+    enqueue_job_group,
+)
 
 router = APIRouter(prefix="/runbooks", tags=["runbooks"])
+RUNBOOK_LIST = TypeAdapter(list[RunbookOut])
+
+
+def _queue_tenant(runbook: Runbook, inputs: dict) -> str:
+    # Fair scheduling is per company when the job targets one, otherwise per area.
+    company_id = inputs.get("company_id")
+    if isinstance(company_id, int) or (isinstance(company_id, str) and company_id.isdigit()):
+        return f"company:{company_id}"
+    return f"area:{runbook.category}"
 
 
 @router.get("", response_model=list[RunbookOut])
 def list_runbooks(
+    request: Request,
     db: Session = Depends(get_db),
     ctx: AuthContext = Depends(require_roles("admin", "operator", "viewer")),
 ):
     stmt = select(Runbook).order_by(Runbook.name.asc())
+    scope = "admin"
     if "admin" not in ctx.roles:
         if not ctx.areas:
             return []
         stmt = stmt.where(Runbook.category.in_(ctx.areas))
-    rows = db.execute(stmt).scalars().all()
-    return rows
+        scope = "areas:" + ",".join(sorted(ctx.areas))
+
+    def load():
+        return db.execute(stmt).scalars().all()
+
+    return cached_list_response(request, ("runbooks",), scope, RUNBOOK_LIST, load)
+
+
+def _executable_runbook(db: Session, name: str, ctx: AuthContext) -> Runbook:
+    runbook = db.execute(select(Runbook).where(Runbook.name == name)).scalar_one_or_none()
+    if not runbook or not runbook.enabled:
+        raise HTTPException(status_code=404, detail="Runbook not found")
+    if "admin" not in ctx.roles and runbook.category not in set(ctx.areas):
+        raise HTTPException(status_code=403, detail="Area forbidden")
+    return runbook
 
 
 @router.post("/{name}/execute", response_model=ExecuteRunbookResponse)
@@ -34,39 +71,66 @@ def execute_runbook(
     db: Session = Depends(get_db),
     ctx: AuthContext = Depends(require_roles("admin", "operator")),
 ):
-    runbook = db.execute(select(Runbook).where(Runbook.name == name)).scalar_one_or_none()
-    if not runbook or not runbook.enabled:
-        raise HTTPException(status_code=404, detail="Runbook not found")
-    if "admin" not in ctx.roles and runbook.category not in set(ctx.areas):
-        raise HTTPException(status_code=403, detail="Area forbidden")
+    runbook = _executable_runbook(db, name, ctx)
 
-    job = Job(
-        runbook_name=runbook.name,
-        status="PENDING",
-        input_json=payload.inputs,
-        created_by=ctx.user.id,
-    )
-    db.add(job)
-    db.commit()
-    db.refresh(job)
-    append_job_log(db, job.id, f"Job created by user {ctx.user.email}")
-
-    try:
-        queue_client.enqueue_job(job.id)
-        append_job_log(db, job.id, "Job queued on Redis")
-    except RedisError:
-        job.status = "ERROR"
-        job.output_json = {"error": "queue_unavailable"}
+    # The worker continues this span's trace from the traceparent stored in the queue payload.
+    with start_span("runbook.execute", runbook=runbook.name, lane=payload.priority) as span:
+        job = create_job(
+            db,
+            runbook.name,
+            payload.inputs,
+            created_by=ctx.user.id,
+            requested_by=f"user {ctx.user.email}",
+        )
+        if span is not None:
+            span.attributes["job_id"] = job.id
+        write_audit(
+            db,
+            actor_user_id=ctx.user.id,
+            action="runbook.execute",
+            target_type="job",
+            target_id=str(job.id),
+            metadata_json={"runbook": runbook.name},
+        )
         db.commit()
-        append_job_log(db, job.id, "Redis queue unavailable", "ERROR")
+        enqueue_created_job(db, job, lane=payload.priority, tenant=_queue_tenant(runbook, payload.inputs))
+    if job.status == "ERROR":
         raise HTTPException(status_code=503, detail="Queue unavailable")
-
-    write_audit(
-        db,
-        actor_user_id=ctx.user.id,
-        action="runbook.execute",
-        target_type="job",
-        target_id=str(job.id),
-        metadata_json={"runbook": runbook.name},
-    )
     return ExecuteRunbookResponse(job_id=job.id, status=job.status)
+
+
+@router.post("/{name}/execute-bulk", response_model=ExecuteRunbookBulkResponse)
+def execute_runbook_bulk(
+    name: str,
+    payload: ExecuteRunbookBulkRequest,
+    db: Session = Depends(get_db),
+    ctx: AuthContext = Depends(require_roles("admin", "operator")),
+):
+    if len(payload.inputs) > settings.bulk_execute_max_jobs:
+        raise HTTPException(status_code=400, detail=f"At most {settings.bulk_execute_max_jobs} input sets per request")
+    runbook = _executable_runbook(db, name, ctx)
+
+    # Two commits for the whole group (jobs, then queued logs) and one Redis round trip.
+    with start_span("runbook.execute_bulk", runbook=runbook.name, lane=payload.priority, jobs=len(payload.inputs)):
+        group, job_ids = create_job_group(
+            db,
+            runbook.name,
+            payload.inputs,
+            created_by=ctx.user.id,
+            requested_by=f"user {ctx.user.email}",
+            lane=payload.priority,
+        )
+        write_audit(
+            db,
+            actor_user_id=ctx.user.id,
+            action="runbook.execute_bulk",
+            target_type="job_group",
+            target_id=str(group.id),
+            metadata_json={"runbook": runbook.name, "jobs": len(job_ids)},
+        )
+        db.commit()
+        tenants = [_queue_tenant(runbook, inputs) for inputs in payload.inputs]
+        queued = enqueue_job_group(db, group, list(zip(job_ids, tenants)))
+    if not queued:
+        raise HTTPException(status_code=503, detail="Queue unavailable")
+    return ExecuteRunbookBulkResponse(group_id=group.id, job_ids=job_ids, status="PENDING")
@@ -1,8 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from pydantic import TypeAdapter
 from sqlalchemy import select
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 
-from app.core.security import get_password_hash
 from app.deps import AuthContext, get_db, require_roles
 from app.models import AccessArea, Role, User
 from app.schemas import (
@@ -13,8 +13,12 @@ from app.schemas import (
     UserUpdateRequest,
 )
 from app.services.audit import write_audit
+from app.services.auth_cache import invalidate_user
+from app.services.http_cache import cached_list_response
+from app.services.password_hasher import HasherBusy, password_hasher
 
 router = APIRouter(tags=["users"])
+AREA_LIST = TypeAdapter(list[AreaOut])
 
 
 def _normalize_names(values: list[str]) -> list[str]:
@@ -51,6 +55,24 @@ def _load_areas(db: Session, area_names: list[str]) -> list[AccessArea]:
     return rows
 
 
+def _get_user(db: Session, user_id: int) -> User | None:
+    # Roles and areas are loaded up front instead of with two lazy loads during serialization.
+    stmt = (
+        select(User)
+        .options(selectinload(User.roles), selectinload(User.areas))
+        .where(User.id == user_id)
+        .execution_options(populate_existing=True)
+    )
+    return db.execute(stmt).scalar_one_or_none()
+
+
+def _hash_password(password: str) -> str:
+    try:
+        return password_hasher.hash(password)
+    except HasherBusy:
+        raise HTTPException(status_code=503, detail="Password hashing busy, retry shortly", headers={"Retry-After": "1"})
+
+
 def _serialize_user(user: User) -> UserOut:
     return UserOut(
         id=user.id,
@@ -64,11 +86,14 @@ def _serialize_user(user: User) -> UserOut:
 
 @router.get("/areas", response_model=list[AreaOut])
 def list_areas(
+    request: Request,
     db: Session = Depends(get_db),
     _: AuthContext = Depends(require_roles("admin", "operator", "viewer")),
 ):
-    rows = db.execute(select(AccessArea).order_by(AccessArea.name.asc())).scalars().all()
-    return rows
+    def load():
+        return db.execute(select(AccessArea).order_by(AccessArea.name.asc())).scalars().all()
+
+    return cached_list_response(request, ("access_areas",), "", AREA_LIST, load)
 
 
 @router.post("/areas", response_model=AreaOut)
@@ -87,8 +112,7 @@ def create_area(
 
     row = AccessArea(name=name)
     db.add(row)
-    db.commit()
-    db.refresh(row)
+    db.flush()
     write_audit(
         db,
         actor_user_id=ctx.user.id,
@@ -97,6 +121,8 @@ def create_area(
         target_id=str(row.id),
         metadata_json={"name": row.name},
     )
+    db.commit()
+    db.refresh(row)
     return row
 
 
@@ -105,7 +131,8 @@ def list_users(
     db: Session = Depends(get_db),
     _: AuthContext = Depends(require_roles("admin")),
 ):
-    rows = db.execute(select(User).order_by(User.email.asc())).scalars().all()
+    stmt = select(User).options(selectinload(User.roles), selectinload(User.areas)).order_by(User.email.asc())
+    rows = db.execute(stmt).scalars().all()
     return [_serialize_user(row) for row in rows]
 
 
@@ -130,14 +157,13 @@ def create_user(
 
     user = User(
         email=email,
-        password_hash=get_password_hash(payload.password),
+        password_hash=_hash_password(payload.password),
         status=payload.status,
     )
     user.roles = roles
     user.areas = areas
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    db.flush()
     write_audit(
         db,
         actor_user_id=ctx.user.id,
@@ -146,7 +172,8 @@ def create_user(
         target_id=str(user.id),
         metadata_json={"email": user.email},
     )
-    return _serialize_user(user)
+    db.commit()
+    return _serialize_user(_get_user(db, user.id))
 
 
 @router.patch("/users/{user_id}", response_model=UserOut)
@@ -156,14 +183,14 @@ def update_user(
     db: Session = Depends(get_db),
     ctx: AuthContext = Depends(require_roles("admin")),
 ):
-    user = db.get(User, user_id)
+    user = _get_user(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
     if payload.status is not None:
         user.status = payload.status
     if payload.password is not None:
-        user.password_hash = get_password_hash(payload.password)
+        user.password_hash = _hash_password(payload.password)
     if payload.roles is not None:
         roles = _load_roles(db, payload.roles)
         if not roles:
@@ -172,8 +199,6 @@ def update_user(
     if payload.areas is not None:
         user.areas = _load_areas(db, payload.areas)
 
-    db.commit()
-    db.refresh(user)
     write_audit(
         db,
         actor_user_id=ctx.user.id,
@@ -182,4 +207,6 @@ def update_user(
         target_id=str(user.id),
         metadata_json={"email": user.email},
     )
-    return _serialize_user(user)
+    db.commit()
+    invalidate_user(user.id)
+    return _serialize_user(_get_user(db, user.id))
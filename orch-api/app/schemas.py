@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Any
+from typing import Any, Literal
 
 from pydantic import BaseModel, Field
 
@@ -190,6 +190,7 @@ class HetznerServiceLogOut(BaseModel):
     action: str
     status: str
     message: str
+    external_action_id: str | None = None
     created_by: int | None
     created_at: datetime
 
@@ -204,6 +205,15 @@ class HetznerServerStatusOut(BaseModel):
     last_run_at: datetime | None
 
 
+class HetznerStatusSummaryOut(BaseModel):
+    company_id: int
+    total: int
+    alerts: int
+    counts: dict[str, int]
+    generated_at: datetime
+    cached: bool = False
+
+
 class RunbookOut(BaseModel):
     name: str
     version: str
@@ -219,6 +229,7 @@ class RunbookOut(BaseModel):
 
 class ExecuteRunbookRequest(BaseModel):
     inputs: dict[str, Any] = Field(default_factory=dict)
+    priority: Literal["high", "normal", "low"] = "normal"
 
 
 class ExecuteRunbookResponse(BaseModel):
@@ -226,13 +237,24 @@ class ExecuteRunbookResponse(BaseModel):
     status: str
 
 
+class ExecuteRunbookBulkRequest(BaseModel):
+    inputs: list[dict[str, Any]] = Field(min_length=1)
+    priority: Literal["high", "normal", "low"] = "normal"
+
+
+class ExecuteRunbookBulkResponse(BaseModel):
+    group_id: int
+    job_ids: list[int]
+    status: str
+
+
 class JobOut(BaseModel):
     id: int
     runbook_name: str
     status: str
     input_json: dict[str, Any]
     output_json: dict[str, Any] | None
-    created_by: int
+    created_by: int | None
     started_at: datetime | None
     finished_at: datetime | None
     created_at: datetime
@@ -240,11 +262,50 @@ class JobOut(BaseModel):
     model_config = {"from_attributes": True}
 
 
-class JobsListResponse(BaseModel):
-    items: list[JobOut]
+class JobSummaryOut(BaseModel):
+    id: int
+    runbook_name: str
+    status: str
+    created_by: int | None
+    started_at: datetime | None
+    finished_at: datetime | None
+    created_at: datetime
+
+    model_config = {"from_attributes": True}
+
+
+class JobArtifactOut(BaseModel):
+    name: str
+    content_type: str
+    size_bytes: int
+    stored_bytes: int
+    sha256: str
+    created_at: datetime
+
+    model_config = {"from_attributes": True}
+
+
+class JobGroupOut(BaseModel):
+    id: int
+    runbook_name: str
+    lane: str
     total: int
-    page: int
+    created_by: int | None
+    created_at: datetime
+    counts: dict[str, int]
+    finished: int
+    done: bool
+    started_at: datetime | None
+    finished_at: datetime | None
+
+
+class JobsListResponse(BaseModel):
+    items: list[JobSummaryOut]
+    page: int | None = None
     page_size: int
+    next_cursor: str | None = None
+    total: int | None = None
+    total_is_estimate: bool = False
 
 
 class JobLogOut(BaseModel):
@@ -255,3 +316,52 @@ class JobLogOut(BaseModel):
     message: str
 
     model_config = {"from_attributes": True}
+
+
+class JobLogSearchHit(BaseModel):
+    id: int
+    job_id: int
+    ts: datetime
+    level: str
+    message: str
+    snippet: str
+    runbook_name: str
+    job_status: str
+
+
+class JobLogSearchPage(BaseModel):
+    items: list[JobLogSearchHit]
+    next_cursor: str | None = None
+
+
+class JobLogsPage(BaseModel):
+    items: list[JobLogOut]
+    next_cursor: int | None = None
+
+
+class QueueLaneOut(BaseModel):
+    lane: str
+    depth: int
+    tenants: dict[str, int]
+
+
+class QueueStatsOut(BaseModel):
+    lanes: list[QueueLaneOut]
+    in_flight: int
+    expired_leases: int
+    legacy_depth: int
+
+
+class StorageTableOut(BaseModel):
+    table: str
+    rows: int
+    rows_is_estimate: bool
+    size_bytes: int | None
+    partitioned: bool
+    partitions: int
+    retention_days: int | None
+    oldest: datetime | None
+
+
+class StorageReportOut(BaseModel):
+    tables: list[StorageTableOut]
@@ -0,0 +1,190 @@
+import hashlib
+import json
+import os
+import tempfile
+import uuid
+from typing import Any, Iterator
+
+import zstandard
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import Job, JobArtifact
+
+CHUNK_SIZE = 64 * 1024
+OUTPUT_ARTIFACT = "output.json"
+_WRITTEN_KEYS = "artifact_keys_written"
+_REPLACED_KEYS = "artifact_keys_replaced"
+
+
+class ArtifactNotFound(Exception):
+    pass
+
+
+class LocalArtifactStore:
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+
+    def _path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid artifact key: {key}")
+        return path
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Readers never see a partial file: write aside, then rename into place.
+        fd, staging = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                handle.write(data)
+            os.replace(staging, path)
+        except BaseException:
+            os.unlink(staging)
+            raise
+
+    def open(self, key: str) -> Iterator[bytes]:
+        try:
+            handle = open(self._path(key), "rb")
+        except FileNotFoundError as exc:
+            raise ArtifactNotFound(key) from exc
+        return _iter_file(handle)
+
+    def delete(self, key: str) -> None:
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3ArtifactStore:
+    """Any S3-compatible endpoint (MinIO locally); credentials fall back to the boto3 defaults."""
+
+    def __init__(self, bucket: str, endpoint_url: str | None, region: str | None, access_key: str, secret_key: str):
+        import boto3  # slow to import; only processes configured for S3 pay for it
+
+        self.bucket = bucket
+        self._client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url or None,
+            region_name=region or None,
+            aws_access_key_id=access_key or None,
+            aws_secret_access_key=secret_key or None,
+        )
+
+    def put(self, key: str, data: bytes) -> None:
+        self._client.put_object(Bucket=self.bucket, Key=key, Body=data)
+
+    def open(self, key: str) -> Iterator[bytes]:
+        try:
+            response = self._client.get_object(Bucket=self.bucket, Key=key)
+        except self._client.exceptions.NoSuchKey as exc:
+            raise ArtifactNotFound(key) from exc
+        return response["Body"].iter_chunks(CHUNK_SIZE)
+
+    def delete(self, key: str) -> None:
+        self._client.delete_object(Bucket=self.bucket, Key=key)
+
+
+def _iter_file(handle) -> Iterator[bytes]:
+    with handle:
+        while chunk := handle.read(CHUNK_SIZE):
+            yield chunk
+
+
+def _build_store():
+    if settings.artifact_store == "s3":
+        return S3ArtifactStore(
+            settings.artifact_s3_bucket,
+            settings.artifact_s3_endpoint_url,
+            settings.artifact_s3_region,
+            settings.artifact_s3_access_key,
+            settings.artifact_s3_secret_key,
+        )
+    return LocalArtifactStore(settings.artifact_local_path)
+
+
+_store = None
+
+
+def artifact_store():
+    # Built on first use: the API and worker only need S3 credentials once an artifact is touched.
+    global _store
+    if _store is None:
+        _store = _build_store()
+    return _store
+
+
+def save_artifact(
+    db: Session, job_id: int, name: str, data: bytes, content_type: str = "application/octet-stream"
+) -> JobArtifact:
+    # Compressed once here; downloads stream the stored frame back out. The blob is written
+    # before the row commits under a key of its own: a rollback deletes it again and a commit
+    # deletes the blob of the row it replaced, so neither outcome leaves an orphan behind.
+    compressed = zstandard.ZstdCompressor(level=settings.artifact_zstd_level).compress(data)
+    key = f"jobs/{job_id}/{name}.{uuid.uuid4().hex[:12]}.zst"
+    artifact_store().put(key, compressed)
+    db.info.setdefault(_WRITTEN_KEYS, []).append(key)
+    row = db.execute(
+        select(JobArtifact).where(JobArtifact.job_id == job_id, JobArtifact.name == name)
+    ).scalar_one_or_none()
+    if row is None:
+        row = JobArtifact(job_id=job_id, name=name)
+        db.add(row)
+    elif row.storage_key:
+        db.info.setdefault(_REPLACED_KEYS, []).append(row.storage_key)
+    row.content_type = content_type
+    row.storage_key = key
+    row.compression = "zstd"
+    row.size_bytes = len(data)
+    row.stored_bytes = len(compressed)
+    row.sha256 = hashlib.sha256(data).hexdigest()
+    return row
+
+
+def store_job_output(db: Session, job: Job, output: Any) -> Any:
+    # Small outputs stay inline; larger ones become the output.json artifact and the row keeps a stub.
+    if output is None or settings.artifact_inline_max_bytes <= 0:
+        return output
+    encoded = json.dumps(output, separators=(",", ":"), default=str).encode("utf-8")
+    if len(encoded) <= settings.artifact_inline_max_bytes:
+        return output
+    save_artifact(db, job.id, OUTPUT_ARTIFACT, encoded, "application/json")
+    return {"artifact": OUTPUT_ARTIFACT, "size_bytes": len(encoded)}
+
+
+def open_artifact(artifact: JobArtifact, decompress: bool = True) -> Iterator[bytes]:
+    chunks = artifact_store().open(artifact.storage_key)
+    if artifact.compression != "zstd" or not decompress:
+        return chunks
+    return _decompress(chunks)
+
+
+def _decompress(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    decompressor = zstandard.ZstdDecompressor().decompressobj()
+    for chunk in chunks:
+        output = decompressor.decompress(chunk)
+        if output:
+            yield output
+
+
+def _delete_blobs(keys: list[str]) -> None:
+    for key in keys:
+        try:
+            artifact_store().delete(key)
+        except Exception as exc:  # pragma: no cover
+            print(f"Artifact cleanup failed for {key}: {exc}")
+
+
+@event.listens_for(Session, "after_commit")
+def _drop_replaced_blobs(session: Session) -> None:
+    session.info.pop(_WRITTEN_KEYS, None)
+    _delete_blobs(session.info.pop(_REPLACED_KEYS, []))
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_uncommitted_blobs(session: Session) -> None:
+    session.info.pop(_REPLACED_KEYS, None)
+    _delete_blobs(session.info.pop(_WRITTEN_KEYS, []))
@@ -1,5 +1,12 @@
+import threading
+from datetime import datetime, timezone
+from typing import Callable
+
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
+from app.db import SessionLocal
 from app.models import AuditLog
 
 
@@ -10,14 +17,108 @@ def write_audit(
     target_type: str,
     target_id: str | None = None,
     metadata_json: dict | None = None,
+    buffered: bool = False,
 ) -> None:
-    row = AuditLog(
-        actor_user_id=actor_user_id,
-        action=action,
-        target_type=target_type,
-        target_id=target_id,
-        metadata_json=metadata_json or {},
-    )
-    db.add(row)
-    db.commit()
+    # Joins the caller's transaction: the row is committed (or rolled back) with the change it
+    # records. buffered=True hands high-volume events with no change of their own to the outbox.
+    event = {
+        "actor_user_id": actor_user_id,
+        "action": action,
+        "target_type": target_type,
+        "target_id": target_id,
+        "metadata_json": metadata_json or {},
+    }
+    if buffered:
+        audit_outbox.add(event)
+        return
+    db.add(AuditLog(**event))
+
+
+class AuditOutbox:
+    """In-process audit buffer bulk-inserted by a background flush on size or delay."""
+
+    def __init__(
+        self,
+        max_rows: int,
+        max_delay_seconds: float,
+        max_pending: int,
+        session_factory: Callable[[], Session] = SessionLocal,
+    ):
+        self._max_rows = max_rows
+        self._max_delay = max_delay_seconds
+        self._max_pending = max_pending
+        self._session_factory = session_factory
+        self._pending: list[dict] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+        self._timer_immediate = False
+        self.flushed = 0
+        self.dropped = 0
+
+    def add(self, event: dict) -> None:
+        event = {**event, "ts": datetime.now(timezone.utc)}
+        with self._lock:
+            self._pending.append(event)
+            if len(self._pending) >= self._max_rows:
+                self._schedule_locked(0)
+            elif self._timer is None:
+                self._schedule_locked(self._max_delay)
+
+    def _schedule_locked(self, delay: float) -> None:
+        # Flushes always run on a timer thread: add() is called from the event loop, so a full
+        # buffer only brings the flush forward instead of inserting inline.
+        if self._timer is not None:
+            if delay or self._timer_immediate:
+                return
+            self._timer.cancel()
+        self._timer = threading.Timer(delay, self.flush)
+        self._timer.daemon = True
+        self._timer_immediate = delay == 0
+        self._timer.start()
+
+    def flush(self) -> int:
+        # Serialized so batches land in order; callers of add() only pay for the append.
+        with self._flush_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                rows, self._pending = self._pending, []
+            if not rows:
+                return 0
+            try:
+                with self._session_factory() as db:
+                    db.execute(insert(AuditLog), rows)
+                    db.commit()
+            except Exception as exc:  # pragma: no cover
+                self._requeue(rows)
+                print(f"Audit outbox flush failed ({len(rows)} event(s) kept): {exc}")
+                return 0
+            self.flushed += len(rows)
+            return len(rows)
+
+    def close(self) -> None:
+        self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"pending": len(self._pending), "flushed": self.flushed, "dropped": self.dropped}
+
+    def _requeue(self, rows: list[dict]) -> None:
+        # Keep failed batches for the next flush, bounded so a database outage cannot exhaust memory.
+        with self._lock:
+            self._pending = rows + self._pending
+            overflow = len(self._pending) - self._max_pending
+            if overflow > 0:
+                del self._pending[:overflow]
+                self.dropped += overflow
+            if self._timer is None:
+                self._schedule_locked(self._max_delay)
+
 
+audit_outbox = AuditOutbox(
+    max_rows=settings.audit_outbox_flush_rows,
+    max_delay_seconds=settings.audit_outbox_flush_interval_ms / 1000,
+    max_pending=settings.audit_outbox_max_pending,
+)
@@ -0,0 +1,51 @@
+import time
+
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.services.cache import TTLCache, publish_invalidation, redis_client, start_invalidation_listener
+
+AUTH_INVALIDATION_CHANNEL = "orch:auth:invalidate"
+AUTH_REVISION_PREFIX = "orch:auth:rev:"
+
+auth_context_cache = TTLCache(settings.auth_cache_ttl_seconds)
+
+
+def auth_revision(user_id: int) -> int | None:
+    # Counters start at a time-based value, so one lost to a Redis flush never
+    # comes back to a number an outstanding token was issued with.
+    key = f"{AUTH_REVISION_PREFIX}{user_id}"
+    try:
+        redis_client.set(key, time.time_ns(), nx=True)
+        value = redis_client.get(key)
+    except RedisError:
+        return None
+    return int(value) if value is not None else None
+
+
+def current_auth_revision(user_id: int) -> int | None:
+    try:
+        value = redis_client.get(f"{AUTH_REVISION_PREFIX}{user_id}")
+    except RedisError:
+        return None
+    return int(value) if value is not None else None
+
+
+def invalidate_user(user_id: int) -> None:
+    auth_context_cache.delete(user_id)
+    try:
+        redis_client.incr(f"{AUTH_REVISION_PREFIX}{user_id}")
+    except RedisError:
+        pass
+    publish_invalidation(AUTH_INVALIDATION_CHANNEL, str(user_id))
+
+
+def _handle_invalidation(message: str) -> None:
+    if message == "*":
+        auth_context_cache.clear()
+    elif message.isdigit():
+        auth_context_cache.delete(int(message))
+
+
+def start_auth_cache_listener() -> None:
+    start_invalidation_listener(AUTH_INVALIDATION_CHANNEL, _handle_invalidation)
@@ -0,0 +1,87 @@
+import threading
+import time
+from typing import Any, Callable, Hashable
+
+from redis import Redis
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+
+redis_client = Redis.from_url(settings.redis_url, decode_responses=True)
+
+
+class TTLCache:
+    def __init__(self, ttl_seconds: float, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: dict[Hashable, tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            if len(self._entries) >= self.max_entries and key not in self._entries:
+                self._evict_locked()
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "ttl_seconds": self.ttl_seconds}
+
+    def _evict_locked(self) -> None:
+        now = time.monotonic()
+        expired = [key for key, (expires_at, _) in self._entries.items() if expires_at < now]
+        for key in expired:
+            del self._entries[key]
+        if len(self._entries) >= self.max_entries:
+            # Still full: drop the entry closest to expiry.
+            oldest = min(self._entries, key=lambda key: self._entries[key][0])
+            del self._entries[oldest]
+
+
+def publish_invalidation(channel: str, message: str) -> None:
+    try:
+        redis_client.publish(channel, message)
+    except RedisError:
+        pass
+
+
+def start_invalidation_listener(channel: str, handler: Callable[[str], None]) -> threading.Thread:
+    # Evictions from other replicas; on reconnect everything is dropped since messages may have been missed.
+    def listen() -> None:
+        while True:
+            try:
+                pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(channel)
+                handler("*")
+                for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        handler(message["data"])
+            except RedisError:
+                time.sleep(2)
+
+    thread = threading.Thread(target=listen, name=f"invalidate:{channel}", daemon=True)
+    thread.start()
+    return thread
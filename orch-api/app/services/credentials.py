@@ -0,0 +1,58 @@
+from cryptography.exceptions import InvalidTag
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.secrets import decrypt_secret, keyring
+from app.models import ApiCredential
+from app.services.cache import TTLCache
+
+# Plain secrets of hot credentials, stored with the ciphertext they came from: a row changed by
+# another replica no longer matches and is decrypted again.
+credential_secrets = TTLCache(settings.credential_secret_cache_ttl_seconds, settings.credential_secret_cache_max_entries)
+
+
+def credential_secret(credential: ApiCredential) -> str:
+    cached = credential_secrets.get(credential.id)
+    if cached is not None and cached[0] == credential.secret_encrypted:
+        return cached[1]
+    plain = decrypt_secret(credential.secret_encrypted)
+    credential_secrets.set(credential.id, (credential.secret_encrypted, plain))
+    return plain
+
+
+def forget_credential_secret(credential_id: int) -> None:
+    credential_secrets.delete(credential_id)
+
+
+def reencrypt_credentials(db: Session, batch_size: int) -> dict:
+    # Keyset batches with one commit each. The UPDATE only applies if the ciphertext is still
+    # the one that was read, so a secret changed through the API meanwhile is never overwritten.
+    results = {"active_key_id": keyring.active_key_id, "rotated": 0, "current": 0, "changed": 0, "failed": []}
+    last_id = 0
+    while True:
+        rows = db.execute(
+            select(ApiCredential.id, ApiCredential.secret_encrypted)
+            .where(ApiCredential.id > last_id)
+            .order_by(ApiCredential.id.asc())
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return results
+        last_id = rows[-1].id
+        for credential_id, cipher_text in rows:
+            if not keyring.needs_rotation(cipher_text):
+                results["current"] += 1
+                continue
+            try:
+                rotated = keyring.encrypt(keyring.decrypt(cipher_text))
+            except (InvalidTag, ValueError):
+                results["failed"].append(credential_id)
+                continue
+            updated = db.execute(
+                update(ApiCredential)
+                .where(ApiCredential.id == credential_id, ApiCredential.secret_encrypted == cipher_text)
+                .values(secret_encrypted=rotated)
+            )
+            results["rotated" if updated.rowcount else "changed"] += 1
+        db.commit()
@@ -0,0 +1,206 @@
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterator
+
+import requests
+from requests.adapters import HTTPAdapter
+from hcloud import APIException, Client
+from hcloud.servers import Server
+
+from app.core.config import settings
+from app.models import ApiCredential
+from app.services.credentials import credential_secret
+from app.services.tracing import begin_span, end_span
+
+SERVERS_PER_PAGE = 50
+
+
+class HetznerAPIError(Exception):
+    pass
+
+
+@contextmanager
+def _hetzner_errors(label: str = "API"):
+    try:
+        yield
+    except APIException as exc:
+        raise HetznerAPIError(f"Hetzner {label} error: {exc.code} {str(exc.message)[:300]}") from exc
+    except requests.RequestException as exc:
+        raise HetznerAPIError(f"Hetzner {label} unreachable: {exc}") from exc
+
+
+class _TracedAdapter(HTTPAdapter):
+    # One span per outbound request, retries included; the token never reaches span attributes.
+    def send(self, request, *args, **kwargs):
+        span = begin_span("http.hetzner", method=request.method, url=request.path_url.split("?")[0])
+        try:
+            response = super().send(request, *args, **kwargs)
+        except Exception as exc:
+            end_span(span, exc)
+            raise
+        if span is not None:
+            span.attributes["http.status_code"] = response.status_code
+        end_span(span, f"HTTP {response.status_code}" if response.status_code >= 500 else None)
+        return response
+
+
+@dataclass
+class _ClientEntry:
+    client: Client
+    fingerprint: str
+    last_used: float = field(default_factory=time.monotonic)
+    # Leases still using the client; a retired entry is closed when the last one ends.
+    users: int = 0
+    retired: bool = False
+
+
+def _fingerprint(credential: ApiCredential) -> str:
+    return hashlib.sha256(credential.secret_encrypted.encode("utf-8")).hexdigest()
+
+
+def _transport_sessions(client: Client) -> list:
+    # hcloud exposes no session hook: its per-endpoint requests.Session objects are private
+    # (ClientBase._session in the hcloud pinned in requirements.txt). A release that moves them
+    # only loses span tracing and the eager connection close, never the API calls themselves.
+    sessions = []
+    for name in ("_client", "_client_hetzner"):
+        session = getattr(getattr(client, name, None), "_session", None)
+        if isinstance(session, requests.Session):
+            sessions.append(session)
+    return sessions
+
+
+class HetznerClientRegistry:
+    """hcloud clients keyed by credential id, each keeping its own keep-alive session."""
+
+    def __init__(self, idle_seconds: int, max_entries: int):
+        self.idle_seconds = idle_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: dict[int, _ClientEntry] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def lease(self, credential: ApiCredential) -> Iterator[Client]:
+        # The client stays open until the block ends, even if a rotation, an invalidation or
+        # eviction replaces it meanwhile: those only retire it, the last lease closes it.
+        entry = self._acquire(credential)
+        try:
+            yield entry.client
+        finally:
+            self._release(entry)
+
+    def _acquire(self, credential: ApiCredential) -> _ClientEntry:
+        # A changed ciphertext means the secret was rotated, possibly by another replica.
+        fingerprint = _fingerprint(credential)
+        with self._lock:
+            self._evict_idle_locked()
+            entry = self._entries.get(credential.id)
+            if entry is not None and entry.fingerprint == fingerprint:
+                entry.users += 1
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        client = Client(
+            token=credential_secret(credential),
+            application_name="orch-api",
+            timeout=settings.hetzner_request_timeout_seconds,
+        )
+        for session in _transport_sessions(client):
+            session.mount("https://", _TracedAdapter())
+        entry = _ClientEntry(client=client, fingerprint=fingerprint, users=1)
+        with self._lock:
+            if len(self._entries) >= self.max_entries and credential.id not in self._entries:
+                oldest = min(self._entries, key=lambda key: self._entries[key].last_used)
+                self._retire(self._entries.pop(oldest))
+            previous = self._entries.get(credential.id)
+            if previous is not None:
+                self._retire(previous)
+            self._entries[credential.id] = entry
+        return entry
+
+    def _release(self, entry: _ClientEntry) -> None:
+        with self._lock:
+            entry.users -= 1
+            entry.last_used = time.monotonic()
+            close = entry.retired and entry.users == 0
+        if close:
+            self._close(entry)
+
+    def invalidate(self, credential_id: int) -> None:
+        with self._lock:
+            entry = self._entries.pop(credential_id, None)
+            if entry is not None:
+                self._retire(entry)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "in_use": sum(1 for entry in self._entries.values() if entry.users),
+                "idle_seconds": self.idle_seconds,
+            }
+
+    def _evict_idle_locked(self) -> None:
+        # Only clients no lease is using count as idle.
+        deadline = time.monotonic() - self.idle_seconds
+        idle = [key for key, entry in self._entries.items() if not entry.users and entry.last_used < deadline]
+        for credential_id in idle:
+            self._retire(self._entries.pop(credential_id))
+
+    def _retire(self, entry: _ClientEntry) -> None:
+        # Called with the lock held, once the entry is out of the map.
+        entry.retired = True
+        if entry.users == 0:
+            self._close(entry)
+
+    @staticmethod
+    def _close(entry: _ClientEntry) -> None:
+        # hcloud has no public close(); release the pooled connections of both endpoints.
+        for session in _transport_sessions(entry.client):
+            session.close()
+
+
+hetzner_clients = HetznerClientRegistry(settings.hetzner_client_idle_seconds, settings.hetzner_client_max_entries)
+
+
+def iter_server_pages(client: Client, per_page: int = SERVERS_PER_PAGE) -> Iterator[list[dict]]:
+    page: int | None = 1
+    while page:
+        with _hetzner_errors():
+            payload = client.request("GET", "/servers", params={"page": page, "per_page": per_page})
+        yield payload.get("servers", [])
+        pagination = (payload.get("meta") or {}).get("pagination") or {}
+        page = pagination.get("next_page")
+
+
+def start_service_action(client: Client, server_external_id: str, server_name: str, service_type: str) -> tuple[dict, str]:
+    # Returns the started Hetzner action ({id, command, status}) and a human readable label.
+    if not str(server_external_id).isdigit():
+        raise HetznerAPIError(f"Invalid Hetzner server id: {server_external_id}")
+    server = Server(id=int(server_external_id))
+    with _hetzner_errors("action"):
+        if service_type == "snapshot":
+            action = client.servers.create_image(
+                server,
+                description=f"omniforge-{server_name}-{int(time.time())}",
+                type="snapshot",
+            ).action
+            label = "Snapshot created via Hetzner create_image"
+        else:
+            action = client.servers.enable_backup(server)
+            label = "Automatic backup enabled via Hetzner enable_backup"
+    return {"id": action.id, "command": action.command, "status": action.status}, label
+
+
+def fetch_actions(client: Client, action_ids: list[str]) -> list[dict]:
+    with _hetzner_errors():
+        payload = client.request("GET", "/actions", params={"id": action_ids, "per_page": len(action_ids)})
+    return payload.get("actions", [])
@@ -0,0 +1,109 @@
+from datetime import datetime, timezone
+
+from sqlalchemy.orm import Session
+
+from app.db import dialect_insert
+from app.models import ApiCredential, HetznerServer, HetznerServicePolicy, Job
+from app.services.audit import write_audit
+from app.services.hetzner import hetzner_clients, iter_server_pages
+from app.services.hetzner_status import SERVICE_TYPES, invalidate_status_summary
+from app.services.http_cache import bump_table_revisions
+from app.services.jobs import JobLogWriter, register_job_handler
+from app.services.tracing import start_span
+
+HETZNER_IMPORT_RUNBOOK = "hetzner_import"
+
+
+def _server_row(company_id: int, credential_id: int, srv: dict, now: datetime) -> dict | None:
+    if srv.get("id") is None:
+        return None
+    external_id = str(srv["id"])
+    return {
+        "company_id": company_id,
+        "credential_id": credential_id,
+        "external_id": external_id,
+        "name": srv.get("name") or f"server-{external_id}",
+        "datacenter": ((srv.get("datacenter") or {}).get("name")) or None,
+        "ipv4": ((srv.get("public_net") or {}).get("ipv4") or {}).get("ip"),
+        "labels_json": srv.get("labels") or {},
+        "status": "active",
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def upsert_servers(db: Session, company_id: int, credential_id: int, servers: list[dict]) -> list[int]:
+    now = datetime.now(timezone.utc)
+    rows = [row for row in (_server_row(company_id, credential_id, srv, now) for srv in servers) if row]
+    if not rows:
+        return []
+    stmt = dialect_insert(db, HetznerServer).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["company_id", "external_id"],
+        set_={
+            "credential_id": stmt.excluded.credential_id,
+            "name": stmt.excluded.name,
+            "datacenter": stmt.excluded.datacenter,
+            "ipv4": stmt.excluded.ipv4,
+            "labels_json": stmt.excluded.labels_json,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    return list(db.execute(stmt.returning(HetznerServer.id)).scalars())
+
+
+def ensure_default_policies(db: Session, server_ids: list[int]) -> None:
+    if not server_ids:
+        return
+    now = datetime.now(timezone.utc)
+    stmt = dialect_insert(db, HetznerServicePolicy).values(
+        [
+            {
+                "server_id": server_id,
+                "service_type": service,
+                "enabled": False,
+                "require_confirmation": True,
+                "schedule_mode": "manual",
+                "created_at": now,
+                "updated_at": now,
+            }
+            for server_id in server_ids
+            for service in SERVICE_TYPES
+        ]
+    )
+    db.execute(stmt.on_conflict_do_nothing(index_elements=["server_id", "service_type"]))
+
+
+@register_job_handler(HETZNER_IMPORT_RUNBOOK, category="hetzner")
+def run_hetzner_import(db: Session, job: Job, log: JobLogWriter) -> dict:
+    company_id = int(job.input_json["company_id"])
+    credential = db.get(ApiCredential, int(job.input_json["credential_id"]))
+    if not credential or credential.company_id != company_id or credential.provider != "hetzner":
+        raise ValueError("Hetzner credential not found for company")
+
+    imported = 0
+    pages = 0
+    # One transaction per page: a failure halfway keeps the pages already imported.
+    with hetzner_clients.lease(credential) as client:
+        for servers in iter_server_pages(client):
+            log.raise_if_canceled()
+            pages += 1
+            with start_span("hetzner.import.page", page=pages, servers=len(servers)):
+                server_ids = upsert_servers(db, company_id, credential.id, servers)
+                ensure_default_policies(db, server_ids)
+                db.commit()
+            bump_table_revisions("hetzner_servers")  # core upserts skip the session hooks
+            imported += len(server_ids)
+            log.write(f"Page {pages}: {len(server_ids)} server(s) upserted ({imported} total)")
+    invalidate_status_summary(company_id)
+
+    write_audit(
+        db,
+        actor_user_id=job.created_by,
+        action="hetzner.server.import",
+        target_type="company",
+        target_id=str(company_id),
+        metadata_json={"credential_id": credential.id, "imported_count": imported, "job_id": job.id},
+    )
+    db.commit()
+    return {"company_id": company_id, "credential_id": credential.id, "imported_count": imported, "pages": pages}
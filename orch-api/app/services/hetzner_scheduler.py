@@ -0,0 +1,390 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+from redis.exceptions import RedisError
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import ApiCredential, HetznerServer, HetznerServiceLog, HetznerServicePolicy, Job
+from app.services.cache import redis_client
+from app.services.hetzner import HetznerAPIError, fetch_actions, hetzner_clients, start_service_action
+from app.services.hetzner_status import as_utc
+from app.services.jobs import TERMINAL_STATUSES, JobLogWriter, register_job_handler, submit_job
+
+POLICY_RUN_RUNBOOK = "hetzner_policy_run"
+INFLIGHT_PREFIX = "orch:hetzner:inflight:"
+POLL_LOCK_KEY = "orch:hetzner:poll:lock"
+
+# Per-credential semaphore: a ZSET of holders scored by expiry, so slots held by a
+# crashed worker free themselves.
+#   KEYS: inflight zset   ARGV: now, expires at, limit, holder
+ACQUIRE_SLOT_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+if not redis.call('ZSCORE', KEYS[1], ARGV[4]) and redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[3]) then
+  return 0
+end
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[4])
+redis.call('EXPIREAT', KEYS[1], math.ceil(tonumber(ARGV[2])))
+return 1
+"""
+
+_acquire_slot = redis_client.register_script(ACQUIRE_SLOT_SCRIPT)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _inflight_key(credential_id: int) -> str:
+    return f"{INFLIGHT_PREFIX}{credential_id}"
+
+
+def acquire_credential_slot(credential_id: int, policy_id: int) -> bool:
+    now = time.time()
+    return bool(
+        _acquire_slot(
+            keys=[_inflight_key(credential_id)],
+            args=[now, now + settings.hetzner_inflight_ttl_seconds, settings.hetzner_max_inflight_per_credential, policy_id],
+        )
+    )
+
+
+def renew_credential_slots(credential_id: int, policy_ids: list[int]) -> None:
+    # Holders of actions still running push their expiry out on every poll, so a long snapshot
+    # keeps its slot while a crashed worker's slot still frees itself after the TTL.
+    # XX only renews existing holders: a slot that already expired is not re-added past the limit.
+    if not policy_ids:
+        return
+    expires_at = time.time() + settings.hetzner_inflight_ttl_seconds
+    key = _inflight_key(credential_id)
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.zadd(key, {policy_id: expires_at for policy_id in policy_ids}, xx=True)
+        pipe.expireat(key, int(expires_at) + 1)
+        pipe.execute()
+    except RedisError:
+        pass
+
+
+def release_credential_slot(credential_id: int, policy_id: int) -> None:
+    try:
+        redis_client.zrem(_inflight_key(credential_id), policy_id)
+    except RedisError:
+        pass
+
+
+def _interval(policy: HetznerServicePolicy) -> timedelta:
+    return timedelta(minutes=max(policy.interval_minutes or 1, 1))
+
+
+def _not_runnable_reason(policy: HetznerServicePolicy, server: HetznerServer) -> str | None:
+    if policy.service_type == "backup" and not server.allow_backup:
+        return "Backup execution not allowed for this server"
+    if policy.service_type == "snapshot" and not server.allow_snapshot:
+        return "Snapshot execution not allowed for this server"
+    if not server.credential_id:
+        return "Server has no Hetzner credential associated"
+    return None
+
+
+def _record_run(
+    db: Session,
+    policy: HetznerServicePolicy,
+    status: str,
+    message: str,
+    action: str = "scheduled_run",
+    commit: bool = True,
+) -> None:
+    # Policy and log row are written in one commit; commit=False leaves it to the caller's batch.
+    now = _utcnow()
+    policy.last_run_at = now
+    policy.last_status = status
+    policy.last_error = None if status == "success" else message
+    if policy.schedule_mode == "interval" and policy.interval_minutes:
+        policy.next_run_at = now + _interval(policy)
+    db.add(
+        HetznerServiceLog(
+            server_id=policy.server_id,
+            service_type=policy.service_type,
+            action=action,
+            status="ok" if status == "success" else "error",
+            message=message,
+        )
+    )
+    if commit:
+        db.commit()
+
+
+def dispatch_due_policies(db: Session, limit: int | None = None) -> int:
+    now = _utcnow()
+    rows = db.execute(
+        select(HetznerServicePolicy, HetznerServer)
+        .join(HetznerServer, HetznerServer.id == HetznerServicePolicy.server_id)
+        .where(
+            HetznerServicePolicy.enabled.is_(True),
+            HetznerServicePolicy.next_run_at <= now,
+            HetznerServicePolicy.schedule_mode == "interval",
+        )
+        .order_by(HetznerServicePolicy.next_run_at.asc())
+        .limit(limit or settings.scheduler_batch_size)
+        .with_for_update(of=HetznerServicePolicy, skip_locked=True)
+    ).all()
+
+    # Claim while the rows are locked: next_run_at moves one interval ahead with a
+    # compare-and-set, so a replica that read the same row (SQLite has no row locks)
+    # cannot claim it too. Rows whose credential is saturated stay due for the next tick.
+    # One commit for the whole batch: committing earlier would release the remaining locks.
+    # Claimed runs keep plain values: the commit expires the loaded rows.
+    claimed: list[tuple[int, int, int, datetime]] = []
+    for policy, server in rows:
+        reason = _not_runnable_reason(policy, server)
+        if reason:
+            _record_run(db, policy, "failed", reason, commit=False)
+            continue
+        if not acquire_credential_slot(server.credential_id, policy.id):
+            continue
+        due_at = policy.next_run_at
+        result = db.execute(
+            update(HetznerServicePolicy)
+            .where(HetznerServicePolicy.id == policy.id, HetznerServicePolicy.next_run_at == due_at)
+            .values(next_run_at=now + _interval(policy))
+        )
+        if result.rowcount != 1:
+            release_credential_slot(server.credential_id, policy.id)
+            continue
+        claimed.append((policy.id, server.credential_id, server.company_id, due_at))
+    db.commit()
+
+    dispatched = 0
+    for policy_id, credential_id, company_id, due_at in claimed:
+        job = submit_job(
+            db,
+            POLICY_RUN_RUNBOOK,
+            {
+                "policy_id": policy_id,
+                "credential_id": credential_id,
+                "company_id": company_id,
+                "trigger": "schedule",
+            },
+            created_by=None,
+            requested_by="scheduler",
+            tenant=f"company:{company_id}",
+        )
+        if job.status == "ERROR":
+            # Not queued: make it due again and give the slot back.
+            db.execute(update(HetznerServicePolicy).where(HetznerServicePolicy.id == policy_id).values(next_run_at=due_at))
+            db.commit()
+            release_credential_slot(credential_id, policy_id)
+            continue
+        dispatched += 1
+    return dispatched
+
+
+def _record_started(
+    db: Session,
+    policy: HetznerServicePolicy,
+    action: dict,
+    label: str,
+    trigger: str,
+    job: Job,
+) -> HetznerServiceLog:
+    # The outcome is only known once the Hetzner action ends; poll_running_actions finishes both rows.
+    policy.last_status = "running"
+    policy.last_error = None
+    policy.last_job_id = job.id
+    row = HetznerServiceLog(
+        server_id=policy.server_id,
+        service_type=policy.service_type,
+        action="run_now" if trigger == "manual" else "scheduled_run",
+        status="running",
+        message=f"{label} (action {action['id']})",
+        external_action_id=str(action["id"]),
+        created_by=job.created_by,
+    )
+    db.add(row)
+    db.commit()
+    return row
+
+
+@register_job_handler(POLICY_RUN_RUNBOOK, category="hetzner")
+def run_policy(db: Session, job: Job, log: JobLogWriter) -> dict:
+    policy_id = int(job.input_json["policy_id"])
+    credential_id = job.input_json.get("credential_id")
+    trigger = job.input_json.get("trigger", "schedule")
+    started = False
+    try:
+        policy = db.get(HetznerServicePolicy, policy_id)
+        if not policy:
+            raise ValueError("Service policy not found")
+        if not policy.enabled:
+            log.write("Policy was paused after being scheduled; skipping", "WARNING")
+            return {"policy_id": policy_id, "skipped": "paused"}
+
+        server = policy.server
+        reason = _not_runnable_reason(policy, server)
+        credential = db.get(ApiCredential, server.credential_id) if server.credential_id else None
+        if not reason and (not credential or credential.provider != "hetzner"):
+            reason = "Invalid Hetzner credential"
+        if reason:
+            _record_run(db, policy, "failed", reason)
+            raise ValueError(reason)
+
+        log.write(f"Running {policy.service_type} for server {server.name}")
+        try:
+            with hetzner_clients.lease(credential) as client:
+                action, label = start_service_action(client, server.external_id, server.name, policy.service_type)
+        except HetznerAPIError as exc:
+            _record_run(db, policy, "failed", str(exc))
+            raise
+        _record_started(db, policy, action, label, trigger, job)
+        started = True
+        log.write(f"{label}; tracking Hetzner action {action['id']}")
+        return {
+            "policy_id": policy_id,
+            "server_id": server.id,
+            "service_type": policy.service_type,
+            "action_id": action["id"],
+        }
+    finally:
+        # A started action keeps its credential slot until poll_running_actions sees it end.
+        if not started and credential_id is not None:
+            release_credential_slot(int(credential_id), policy_id)
+
+
+def _finish_action(
+    db: Session,
+    row: HetznerServiceLog,
+    policy: HetznerServicePolicy | None,
+    succeeded: bool,
+    message: str,
+) -> bool:
+    # Compare-and-set on the log row: with several pollers only one finishes an action.
+    result = db.execute(
+        update(HetznerServiceLog)
+        .where(HetznerServiceLog.id == row.id, HetznerServiceLog.status == "running")
+        .values(status="ok" if succeeded else "error", message=message)
+    )
+    if result.rowcount != 1:
+        return False
+    if policy is not None:
+        now = _utcnow()
+        policy.last_run_at = now
+        policy.last_status = "success" if succeeded else "failed"
+        policy.last_error = None if succeeded else message
+        if policy.schedule_mode == "interval" and policy.interval_minutes:
+            policy.next_run_at = now + _interval(policy)
+    return True
+
+
+def expire_stale_runs(db: Session) -> int:
+    # A run left "queued" or "running" without a tracked action (its job died before starting
+    # the Hetzner action) would block run-now with 409 forever. Only runs whose job has ended
+    # (or is gone) are failed: a job still waiting behind a long queue is not stale.
+    cutoff = _utcnow() - timedelta(minutes=settings.hetzner_stale_run_minutes)
+    tracked = (
+        select(HetznerServiceLog.id)
+        .where(
+            HetznerServiceLog.server_id == HetznerServicePolicy.server_id,
+            HetznerServiceLog.service_type == HetznerServicePolicy.service_type,
+            HetznerServiceLog.status == "running",
+        )
+        .exists()
+    )
+    policies = db.execute(
+        select(HetznerServicePolicy)
+        .outerjoin(Job, Job.id == HetznerServicePolicy.last_job_id)
+        .where(
+            HetznerServicePolicy.last_status.in_(("queued", "running")),
+            HetznerServicePolicy.updated_at < cutoff,
+            ~tracked,
+            Job.id.is_(None) | Job.status.in_(TERMINAL_STATUSES),
+        )
+    ).scalars().all()
+    for policy in policies:
+        message = f"Run did not report back within {settings.hetzner_stale_run_minutes} minutes"
+        policy.last_status = "failed"
+        policy.last_error = message
+        db.add(
+            HetznerServiceLog(
+                server_id=policy.server_id,
+                service_type=policy.service_type,
+                action="stale_run",
+                status="error",
+                message=message,
+            )
+        )
+    db.commit()
+    return len(policies)
+
+
+def poll_running_actions_once(db: Session) -> int | None:
+    # Every worker runs the loop; one poll per interval keeps GET /actions within the token's
+    # rate limit whatever the number of replicas.
+    try:
+        if not redis_client.set(POLL_LOCK_KEY, "1", nx=True, ex=max(settings.hetzner_action_poll_seconds, 1)):
+            return None
+    except RedisError:
+        return None
+    finished = poll_running_actions(db)
+    expire_stale_runs(db)
+    return finished
+
+
+def poll_running_actions(db: Session) -> int:
+    rows = db.execute(
+        select(HetznerServiceLog, HetznerServer, HetznerServicePolicy)
+        .join(HetznerServer, HetznerServer.id == HetznerServiceLog.server_id)
+        .outerjoin(
+            HetznerServicePolicy,
+            (HetznerServicePolicy.server_id == HetznerServiceLog.server_id)
+            & (HetznerServicePolicy.service_type == HetznerServiceLog.service_type),
+        )
+        .where(HetznerServiceLog.status == "running", HetznerServiceLog.external_action_id.is_not(None))
+        .order_by(HetznerServiceLog.id.asc())
+    ).all()
+
+    by_credential: dict[int | None, list[tuple[HetznerServiceLog, HetznerServer, HetznerServicePolicy | None]]] = {}
+    for row, server, policy in rows:
+        by_credential.setdefault(server.credential_id, []).append((row, server, policy))
+
+    timeout = timedelta(minutes=settings.hetzner_action_timeout_minutes)
+    now = _utcnow()
+    finished = 0
+    for credential_id, tracked in by_credential.items():
+        running: list[int] = []
+        credential = db.get(ApiCredential, credential_id) if credential_id else None
+        actions: dict[str, dict] = {}
+        if credential is not None:
+            batch_size = settings.hetzner_action_batch_size
+            with hetzner_clients.lease(credential) as client:
+                # One GET /actions?id=..&id=.. per batch instead of one request per action.
+                for start in range(0, len(tracked), batch_size):
+                    ids = [row.external_action_id for row, _, _ in tracked[start : start + batch_size]]
+                    try:
+                        payload = fetch_actions(client, ids)
+                    except HetznerAPIError as exc:
+                        print(f"Hetzner action polling failed for credential {credential_id}: {exc}")
+                        continue
+                    actions.update({str(item["id"]): item for item in payload})
+
+        for row, server, policy in tracked:
+            action = actions.get(row.external_action_id)
+            done = False
+            if action and action.get("status") == "success":
+                done = _finish_action(db, row, policy, True, row.message.replace("(action", "(finished, action", 1))
+            elif action and action.get("status") == "error":
+                error = (action.get("error") or {}).get("message") or "Hetzner action failed"
+                done = _finish_action(db, row, policy, False, f"{row.message}: {error}")
+            elif now - as_utc(row.created_at) > timeout:
+                done = _finish_action(db, row, policy, False, f"{row.message}: no result after {timeout}")
+            if done:
+                finished += 1
+                if credential_id is not None and policy is not None:
+                    release_credential_slot(credential_id, policy.id)
+            elif policy is not None:
+                running.append(policy.id)
+        db.commit()
+        if credential_id is not None:
+            renew_credential_slots(credential_id, running)
+    return finished
@@ -0,0 +1,161 @@
+import json
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from redis.exceptions import RedisError
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import HetznerServer, HetznerServiceLog, HetznerServicePolicy
+from app.services.cache import redis_client
+
+SERVICE_TYPES = ("backup", "snapshot")
+ALERT_STATUSES = {"atraso", "falha", "sem_politica"}
+STATUS_SUMMARY_PREFIX = "orch:hetzner:status-summary:"
+_PENDING_COMPANIES_KEY = "hetzner_status_companies"
+
+
+@dataclass(frozen=True)
+class ServiceStatus:
+    server_id: int
+    server_name: str
+    service_type: str
+    status: str
+    details: str
+    next_run_at: datetime | None
+    last_run_at: datetime | None
+
+
+def as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes even for timezone-aware columns.
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def policy_status(policy: HetznerServicePolicy | None, now: datetime) -> tuple[str, str]:
+    if not policy:
+        return "sem_politica", "Servico sem politica configurada"
+    if not policy.enabled:
+        return "pausado", "Politica desativada"
+    if policy.last_status in {"queued", "running"}:
+        return "em_execucao", "Execucao em andamento"
+    if policy.last_status == "failed":
+        return "falha", policy.last_error or "Ultima execucao falhou"
+    if policy.last_run_at is None:
+        return "atraso", "Nunca executado"
+    if policy.schedule_mode == "interval" and policy.interval_minutes:
+        deadline = as_utc(policy.last_run_at) + timedelta(minutes=max(policy.interval_minutes, 1))
+        if now > deadline:
+            return "atraso", "Execucao atrasada"
+    return "ok", "Execucao em dia"
+
+
+def load_status_board(db: Session, company_id: int) -> list[ServiceStatus]:
+    rows = db.execute(
+        select(HetznerServer.id, HetznerServer.name, HetznerServicePolicy)
+        .outerjoin(
+            HetznerServicePolicy,
+            (HetznerServicePolicy.server_id == HetznerServer.id)
+            & HetznerServicePolicy.service_type.in_(SERVICE_TYPES),
+        )
+        .where(HetznerServer.company_id == company_id)
+        .order_by(HetznerServer.name.asc(), HetznerServer.id.asc())
+    ).all()
+
+    servers: dict[int, tuple[str, dict[str, HetznerServicePolicy]]] = {}
+    for server_id, server_name, policy in rows:
+        _, policies = servers.setdefault(server_id, (server_name, {}))
+        if policy is not None:
+            policies[policy.service_type] = policy
+
+    now = datetime.now(timezone.utc)
+    board: list[ServiceStatus] = []
+    for server_id, (server_name, policies) in servers.items():
+        for service in SERVICE_TYPES:
+            policy = policies.get(service)
+            status, details = policy_status(policy, now)
+            board.append(
+                ServiceStatus(
+                    server_id=server_id,
+                    server_name=server_name,
+                    service_type=service,
+                    status=status,
+                    details=details,
+                    next_run_at=policy.next_run_at if policy else None,
+                    last_run_at=policy.last_run_at if policy else None,
+                )
+            )
+    return board
+
+
+def _summary_key(company_id: int) -> str:
+    return f"{STATUS_SUMMARY_PREFIX}{company_id}"
+
+
+def status_summary(db: Session, company_id: int) -> tuple[dict, bool]:
+    # Returns (summary, served_from_cache). Redis is optional: without it the board is computed every time.
+    try:
+        cached = redis_client.get(_summary_key(company_id))
+    except RedisError:
+        cached = None
+    if cached:
+        return json.loads(cached), True
+
+    counts: dict[str, int] = {}
+    board = load_status_board(db, company_id)
+    for item in board:
+        counts[item.status] = counts.get(item.status, 0) + 1
+    summary = {
+        "company_id": company_id,
+        "total": len(board),
+        "alerts": sum(count for status, count in counts.items() if status in ALERT_STATUSES),
+        "counts": counts,
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+    }
+    # The TTL also bounds staleness of time-based statuses ("atraso") that no write invalidates.
+    try:
+        redis_client.set(_summary_key(company_id), json.dumps(summary), ex=settings.hetzner_status_cache_ttl_seconds)
+    except RedisError:
+        pass
+    return summary, False
+
+
+def invalidate_status_summary(*company_ids: int) -> None:
+    if not company_ids:
+        return
+    try:
+        redis_client.delete(*(_summary_key(company_id) for company_id in company_ids))
+    except RedisError:
+        pass
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_status_changes(session: Session, flush_context) -> None:
+    server_ids: set[int] = set()
+    company_ids: set[int] = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, HetznerServer):
+            company_ids.add(obj.company_id)
+        elif isinstance(obj, (HetznerServicePolicy, HetznerServiceLog)):
+            server_ids.add(obj.server_id)
+    if server_ids:
+        company_ids.update(
+            session.execute(
+                select(HetznerServer.company_id).where(HetznerServer.id.in_(server_ids))
+            ).scalars()
+        )
+    company_ids.discard(None)
+    if company_ids:
+        session.info.setdefault(_PENDING_COMPANIES_KEY, set()).update(company_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session) -> None:
+    company_ids = session.info.pop(_PENDING_COMPANIES_KEY, None)
+    if company_ids:
+        invalidate_status_summary(*company_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_COMPANIES_KEY, None)
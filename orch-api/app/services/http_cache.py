@@ -0,0 +1,102 @@
+import hashlib
+import time
+from typing import Any, Callable
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from redis.exceptions import RedisError
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.services.cache import TTLCache, redis_client
+
+TABLE_REVISIONS_KEY = "orch:table-revisions"
+CACHED_TABLES = {"runbooks", "access_areas", "companies", "hetzner_servers"}
+_PENDING_TABLES_KEY = "http_cache_tables"
+
+# Serialized list bodies keyed by ETag; a revision bump changes the key, the TTL bounds memory.
+response_cache = TTLCache(settings.http_cache_ttl_seconds, settings.http_cache_max_entries)
+
+
+def bump_table_revisions(*tables: str) -> None:
+    if not tables:
+        return
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for table in tables:
+            pipe.hincrby(TABLE_REVISIONS_KEY, table, 1)
+        pipe.execute()
+    except RedisError:
+        pass
+
+
+def table_revisions(tables: tuple[str, ...]) -> list[int] | None:
+    # Counters start at a time-based value so a Redis flush never brings back a value an
+    # outstanding ETag was built from.
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for table in tables:
+            pipe.hsetnx(TABLE_REVISIONS_KEY, table, time.time_ns())
+        pipe.hmget(TABLE_REVISIONS_KEY, list(tables))
+        *_, values = pipe.execute()
+    except RedisError:
+        return None
+    return [int(value) for value in values]
+
+
+def _matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {value.strip().removeprefix("W/") for value in if_none_match.split(",")}
+    return etag in candidates or "*" in candidates
+
+
+def cached_list_response(
+    request: Request,
+    tables: tuple[str, ...],
+    scope: str,
+    adapter: TypeAdapter,
+    load: Callable[[], Any],
+) -> Response:
+    # `scope` names everything besides the URL that changes the body (e.g. the caller's areas).
+    revisions = table_revisions(tables)
+    if revisions is None:
+        # Without Redis there is nothing to validate against: always serve fresh, uncached.
+        body = adapter.dump_json(adapter.validate_python(load(), from_attributes=True), by_alias=True)
+        return Response(content=body, media_type="application/json")
+
+    fingerprint = f"{request.url.path}?{request.url.query}|{scope}|{','.join(map(str, revisions))}"
+    etag = f'"{hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:32]}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    body = response_cache.get(etag)
+    if body is None:
+        body = adapter.dump_json(adapter.validate_python(load(), from_attributes=True), by_alias=True)
+        response_cache.set(etag, body)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_tables(session: Session, flush_context) -> None:
+    tables = {
+        obj.__table__.name
+        for obj in (*session.new, *session.dirty, *session.deleted)
+        if getattr(obj, "__table__", None) is not None and obj.__table__.name in CACHED_TABLES
+    }
+    if tables:
+        session.info.setdefault(_PENDING_TABLES_KEY, set()).update(tables)
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_after_commit(session: Session) -> None:
+    tables = session.info.pop(_PENDING_TABLES_KEY, None)
+    if tables:
+        bump_table_revisions(*tables)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_TABLES_KEY, None)
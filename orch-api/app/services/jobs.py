@@ -1,9 +1,19 @@
+import threading
 import time
+from dataclasses import dataclass
 from datetime import datetime, timezone
+from typing import Callable
 
-from sqlalchemy.orm import Session
+from redis.exceptions import RedisError
+from sqlalchemy import and_, insert, or_, update
+from sqlalchemy.orm import Session, undefer
 
-from app.models import Job, JobLog
+from app.core.config import settings
+from app.db import SessionLocal
+from app.models import Job, JobGroup, JobLog
+from app.services.artifacts import store_job_output
+from app.services.queue import DEFAULT_LANE, DEFAULT_TENANT, queue_client
+from app.services.tracing import start_span
 
 TERMINAL_STATUSES = {"SUCCESS", "ERROR", "CANCELED"}
 
@@ -17,40 +27,361 @@ def append_job_log(db: Session, job_id: int, message: str, level: str = "INFO")
     db.add(row)
     db.commit()
     db.refresh(row)
+    publish_job_log(row)
     return row
 
 
-def execute_job_simulation(db: Session, job: Job) -> None:
-    job.status = "RUNNING"
-    job.started_at = now_utc()
-    db.commit()
+def serialize_job_log(row: JobLog) -> dict:
+    return {
+        "id": row.id,
+        "job_id": row.job_id,
+        "ts": row.ts.isoformat(),
+        "level": row.level,
+        "message": row.message,
+    }
 
-    append_job_log(db, job.id, f"Starting runbook {job.runbook_name}")
 
+def publish_job_log(row: JobLog) -> None:
+    # Live streaming is best-effort: subscribers backfill anything missed from the database.
     try:
-        steps = [
-            "Validating inputs",
-            "Connecting to target system",
-            "Applying runbook actions",
-            "Finalizing artifacts",
-        ]
-        for index, step in enumerate(steps, start=1):
-            append_job_log(db, job.id, f"[{index}/{len(steps)}] {step}")
-            time.sleep(1)
+        queue_client.publish_job_log(row.job_id, serialize_job_log(row))
+    except RedisError:
+        pass
+
+
+def publish_job_logs(job_id: int, logs: list[dict]) -> None:
+    try:
+        queue_client.publish_job_logs(job_id, logs)
+    except RedisError:
+        pass
+
+
+def publish_job_status(job: Job) -> None:
+    try:
+        queue_client.publish_job_status(job.id, job.status)
+    except RedisError:
+        pass
+
+
+class JobCanceled(Exception):
+    pass
+
+
+class JobLogWriter:
+    """Buffered log sink for workers: flushes on size, on delay, or explicitly before status changes."""
+
+    def __init__(
+        self,
+        job_id: int,
+        max_lines: int | None = None,
+        max_delay_seconds: float | None = None,
+        session_factory: Callable[[], Session] = SessionLocal,
+        cancel: threading.Event | None = None,
+    ):
+        self.job_id = job_id
+        self._cancel = cancel
+        self._max_lines = max_lines or settings.job_log_flush_lines
+        self._max_delay = (
+            max_delay_seconds if max_delay_seconds is not None else settings.job_log_flush_interval_ms / 1000
+        )
+        self._session_factory = session_factory
+        self._pending: list[dict] = []
+        self._lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+
+    def write(self, message: str, level: str = "INFO") -> None:
+        with self._lock:
+            self._pending.append({"job_id": self.job_id, "ts": now_utc(), "level": level, "message": message})
+            if len(self._pending) >= self._max_lines:
+                self._flush_locked()
+            elif self._timer is None:
+                self._timer = threading.Timer(self._max_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def raise_if_canceled(self) -> None:
+        # Cancellation point for handlers, between steps that can be abandoned: a job thread
+        # cannot be interrupted, so a draining worker stops it here.
+        if self._cancel is not None and self._cancel.is_set():
+            raise JobCanceled("Job canceled: the worker is shutting down")
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self) -> "JobLogWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _flush_locked(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+
+        rows, self._pending = self._pending, []
+        # Own session: the flush timer runs on another thread than the job's session.
+        # Flushes are serialized by the lock, so ids grow monotonically across batches;
+        # sort_by_parameter_order keeps them aligned with the buffered order within one.
+        with self._session_factory() as db:
+            ids = (
+                db.execute(insert(JobLog).returning(JobLog.id, sort_by_parameter_order=True), rows)
+                .scalars()
+                .all()
+            )
+            db.commit()
+
+        publish_job_logs(
+            self.job_id,
+            [
+                {
+                    "id": row_id,
+                    "job_id": row["job_id"],
+                    "ts": row["ts"].isoformat(),
+                    "level": row["level"],
+                    "message": row["message"],
+                }
+                for row_id, row in zip(ids, rows)
+            ],
+        )
+
+
+def claim_job(db: Session, job_id: int, attempt: str | None = None) -> Job | None:
+    # Compare-and-set PENDING -> RUNNING: only one worker can win a given job. A job
+    # still RUNNING under another attempt was re-delivered after its lease expired,
+    # so the new delivery takes it over and the old one can no longer finish it.
+    claimable = Job.status == "PENDING"
+    if attempt is not None:
+        claimable = or_(claimable, and_(Job.status == "RUNNING", Job.attempt_id.is_distinct_from(attempt)))
+    result = db.execute(
+        update(Job)
+        .where(Job.id == job_id, claimable)
+        .values(status="RUNNING", started_at=now_utc(), attempt_id=attempt)
+    )
+    db.commit()
+    if result.rowcount != 1:
+        return None
+    return db.get(Job, job_id, options=[undefer(Job.input_json)])
+
+
+def reset_abandoned_job(db: Session, job_id: int, attempt: str | None, reason: str) -> bool:
+    # Called once the message is back in the queue; a no-op when the job already finished
+    # or the new delivery claimed it in the meantime.
+    result = db.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == "RUNNING", Job.attempt_id.is_not_distinct_from(attempt))
+        .values(status="PENDING", started_at=None)
+    )
+    db.commit()
+    if result.rowcount != 1:
+        return False
+    append_job_log(db, job_id, f"Job re-queued: {reason}", "WARNING")
+    return True
+
 
-        job.status = "SUCCESS"
-        job.output_json = {
-            "result": "ok",
-            "runbook": job.runbook_name,
-            "job_id": job.id,
-            "finished_at": now_utc().isoformat(),
-        }
-        append_job_log(db, job.id, "Runbook finished successfully", "SUCCESS")
-    except Exception as exc:  # pragma: no cover
+def finish_job(db: Session, job: Job, status: str, output: object) -> bool:
+    # Fenced on the claiming attempt: False when the job was re-delivered (or canceled)
+    # meanwhile, and this run's writes are rolled back instead of overwriting the new one.
+    result = db.execute(
+        update(Job)
+        .where(Job.id == job.id, Job.status == "RUNNING", Job.attempt_id.is_not_distinct_from(job.attempt_id))
+        .values(status=status, output_json=output, finished_at=now_utc())
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        db.rollback()
+        return False
+    db.commit()
+    return True
+
+
+@dataclass(frozen=True)
+class JobHandler:
+    run: Callable[[Session, Job, "JobLogWriter"], dict]
+    category: str
+
+
+_job_handlers: dict[str, JobHandler] = {}
+
+
+def register_job_handler(runbook_name: str, category: str = "general"):
+    # Internal jobs (no Runbook row) that the worker runs instead of the generic simulation.
+    def decorator(func):
+        _job_handlers[runbook_name] = JobHandler(run=func, category=category)
+        return func
+
+    return decorator
+
+
+def job_handler_category(runbook_name: str) -> str | None:
+    handler = _job_handlers.get(runbook_name)
+    return handler.category if handler else None
+
+
+def create_job(
+    db: Session,
+    runbook_name: str,
+    inputs: dict,
+    created_by: int | None,
+    requested_by: str,
+) -> Job:
+    # Added to the caller's transaction; enqueue with enqueue_created_job once it is committed.
+    job = Job(runbook_name=runbook_name, status="PENDING", input_json=inputs, created_by=created_by)
+    db.add(job)
+    db.flush()
+    db.add(JobLog(job_id=job.id, message=f"Job created by {requested_by}", level="INFO"))
+    return job
+
+
+def enqueue_created_job(db: Session, job: Job, lane: str = DEFAULT_LANE, tenant: str = DEFAULT_TENANT) -> Job:
+    # Returns the job in ERROR status when Redis is down; callers turn that into a 503.
+    try:
+        queue_client.enqueue_job(job.id, lane=lane, tenant=tenant)
+        append_job_log(db, job.id, f"Job queued on Redis (lane={lane}, tenant={tenant})")
+    except RedisError:
         job.status = "ERROR"
-        job.output_json = {"error": str(exc)}
-        append_job_log(db, job.id, f"Runbook failed: {exc}", "ERROR")
-    finally:
-        job.finished_at = now_utc()
+        job.output_json = {"error": "queue_unavailable"}
         db.commit()
+        append_job_log(db, job.id, "Redis queue unavailable", "ERROR")
+    return job
+
+
+def submit_job(
+    db: Session,
+    runbook_name: str,
+    inputs: dict,
+    created_by: int | None,
+    requested_by: str,
+    lane: str = DEFAULT_LANE,
+    tenant: str = DEFAULT_TENANT,
+) -> Job:
+    job = create_job(db, runbook_name, inputs, created_by, requested_by)
+    db.commit()
+    return enqueue_created_job(db, job, lane=lane, tenant=tenant)
+
+
+def create_job_group(
+    db: Session,
+    runbook_name: str,
+    input_sets: list[dict],
+    created_by: int | None,
+    requested_by: str,
+    lane: str = DEFAULT_LANE,
+) -> tuple[JobGroup, list[int]]:
+    # Added to the caller's transaction like create_job, but with one multi-row insert for the
+    # jobs and one for their first log lines instead of a flush per job.
+    group = JobGroup(runbook_name=runbook_name, lane=lane, total=len(input_sets), created_by=created_by)
+    db.add(group)
+    db.flush()
+    created_at = now_utc()
+    job_ids = (
+        db.execute(
+            insert(Job).returning(Job.id, sort_by_parameter_order=True),
+            [
+                {
+                    "runbook_name": runbook_name,
+                    "status": "PENDING",
+                    "input_json": inputs,
+                    "created_by": created_by,
+                    "group_id": group.id,
+                    "created_at": created_at,
+                }
+                for inputs in input_sets
+            ],
+        )
+        .scalars()
+        .all()
+    )
+    db.execute(
+        insert(JobLog),
+        [
+            {"job_id": job_id, "ts": created_at, "level": "INFO", "message": f"Job created by {requested_by}"}
+            for job_id in job_ids
+        ],
+    )
+    return group, job_ids
+
+
+def enqueue_job_group(db: Session, group: JobGroup, jobs: list[tuple[int, str]]) -> bool:
+    # (job_id, tenant) pairs of a committed group, pushed in one pipeline; the queued log lines
+    # go in with a single insert. Returns False, with the jobs in ERROR, when Redis is down.
+    # Nothing is published: no client can be subscribed to jobs created a moment ago.
+    ts = now_utc()
+    try:
+        queue_client.enqueue_jobs(jobs, lane=group.lane)
+        logs = [
+            {
+                "job_id": job_id,
+                "ts": ts,
+                "level": "INFO",
+                "message": f"Job queued on Redis (lane={group.lane}, tenant={tenant})",
+            }
+            for job_id, tenant in jobs
+        ]
+        queued = True
+    except RedisError:
+        db.execute(
+            update(Job)
+            .where(Job.group_id == group.id, Job.status == "PENDING")
+            .values(status="ERROR", output_json={"error": "queue_unavailable"})
+            .execution_options(synchronize_session=False)
+        )
+        logs = [{"job_id": job_id, "ts": ts, "level": "ERROR", "message": "Redis queue unavailable"} for job_id, _ in jobs]
+        queued = False
+    db.execute(insert(JobLog), logs)
+    db.commit()
+    return queued
+
+
+def execute_job(db: Session, job: Job, cancel: threading.Event | None = None) -> bool:
+    # Returns False when the result was discarded because another delivery owns the job.
+    handler = _job_handlers.get(job.runbook_name)
+    run = handler.run if handler else _run_job_simulation
+    status, output = "ERROR", None
+    with JobLogWriter(job.id, cancel=cancel) as log:
+        log.write(f"Starting runbook {job.runbook_name}")
+        try:
+            with start_span("runbook.run", runbook=job.runbook_name, job_id=job.id):
+                output = run(db, job, log)
+            output = store_job_output(db, job, output)
+            status = "SUCCESS"
+            log.write("Runbook finished successfully", "SUCCESS")
+        except Exception as exc:  # pragma: no cover
+            db.rollback()
+            output = {"error": str(exc)}
+            log.write(f"Runbook failed: {exc}", "ERROR")
+        finally:
+            log.flush()
+            recorded = finish_job(db, job, status, output)
+            if recorded:
+                publish_job_status(job)
+            else:
+                log.write(f"Result discarded ({status}): the job was re-delivered or canceled meanwhile", "WARNING")
+    return recorded
+
+
+def _run_job_simulation(db: Session, job: Job, log: JobLogWriter) -> dict:
+    steps = [
+        "Validating inputs",
+        "Connecting to target system",
+        "Applying runbook actions",
+        "Finalizing artifacts",
+    ]
+    for index, step in enumerate(steps, start=1):
+        log.raise_if_canceled()
+        with start_span("runbook.step", step=step, index=index):
+            log.write(f"[{index}/{len(steps)}] {step}")
+            time.sleep(1)
 
+    return {
+        "result": "ok",
+        "runbook": job.runbook_name,
+        "job_id": job.id,
+        "finished_at": now_utc().isoformat(),
+    }
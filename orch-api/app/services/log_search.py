@@ -0,0 +1,198 @@
+import html
+import re
+from datetime import datetime
+
+from sqlalchemy import DateTime, bindparam, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+# Postgres: a stored tsvector column with a GIN index. SQLite: an external-content FTS5 table
+# kept in sync by triggers. Both are created by migration v0004 and use the 'simple'
+# configuration: log lines are host names, error codes and identifiers, not prose to stem.
+TSVECTOR_COLUMN = "message_tsv"
+TSVECTOR_INDEX = "ix_job_logs_message_tsv"
+FTS_TABLE = "job_logs_fts"
+
+# Private-use code points mark highlights until the snippet is HTML-escaped.
+_HIT_START, _HIT_STOP = "\ue000", "\ue001"
+# websearch_to_tsquery syntax: an optional leading "-", then a quoted phrase or a bare word.
+_WEBSEARCH_TOKEN = re.compile(r'(-?)(?:"([^"]*)"?|([^\s"]+))')
+_WORD_CHARACTER = re.compile(r"\w", re.UNICODE)
+
+
+def ensure_search_index(conn: Connection) -> None:
+    if conn.dialect.name == "postgresql":
+        conn.execute(
+            text(
+                f"ALTER TABLE job_logs ADD COLUMN IF NOT EXISTS {TSVECTOR_COLUMN} tsvector "
+                "GENERATED ALWAYS AS (to_tsvector('simple', coalesce(message, ''))) STORED"
+            )
+        )
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {TSVECTOR_INDEX} ON job_logs USING GIN ({TSVECTOR_COLUMN})"))
+        return
+    if conn.dialect.name != "sqlite":
+        return
+    exists = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+    ).scalar()
+    conn.execute(
+        text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            "message, content='job_logs', content_rowid='id', tokenize='unicode61')"
+        )
+    )
+    conn.execute(
+        text(
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON job_logs BEGIN "
+            f"INSERT INTO {FTS_TABLE}(rowid, message) VALUES (new.id, new.message); END"
+        )
+    )
+    conn.execute(
+        text(
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON job_logs BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, message) VALUES ('delete', old.id, old.message); END"
+        )
+    )
+    conn.execute(
+        text(
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF message ON job_logs BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, message) VALUES ('delete', old.id, old.message); "
+            f"INSERT INTO {FTS_TABLE}(rowid, message) VALUES (new.id, new.message); END"
+        )
+    )
+    if not exists:
+        conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+
+def _websearch_clauses(query: str) -> list[tuple[list[str], list[str]]]:
+    # Read the way websearch_to_tsquery reads it: OR separates alternatives; within one, every
+    # word and "phrase" is required and a leading - excludes one. Returns (required, excluded)
+    # per alternative, dropping those with nothing required: they match nearly every row and
+    # FTS5 cannot express them.
+    clauses: list[tuple[list[str], list[str]]] = [([], [])]
+    for negated, phrase, word in _WEBSEARCH_TOKEN.findall(query):
+        if not negated and word.lower() == "or":
+            clauses.append(([], []))
+            continue
+        term = phrase or word
+        if _WORD_CHARACTER.search(term):
+            clauses[-1][1 if negated else 0].append(term)
+    return [(required, excluded) for required, excluded in clauses if required]
+
+
+def _websearch_query(clauses: list[tuple[list[str], list[str]]]) -> str:
+    # Rebuilt for websearch_to_tsquery so Postgres evaluates exactly what FTS5 does.
+    return " or ".join(
+        " ".join([f'"{term}"' for term in required] + [f'-"{term}"' for term in excluded])
+        for required, excluded in clauses
+    )
+
+
+def _fts5_query(clauses: list[tuple[list[str], list[str]]]) -> str:
+    # Every term becomes an FTS5 phrase, so FTS5 operators typed by the user stay plain text
+    # and srv-web-7 matches as one sequence, like the Postgres phrase it becomes.
+    def quote(term: str) -> str:
+        return '"' + term.replace('"', '""') + '"'
+
+    return " OR ".join(
+        "(" + " AND ".join(quote(term) for term in required) + "".join(f" NOT {quote(term)}" for term in excluded) + ")"
+        for required, excluded in clauses
+    )
+
+
+def _html_snippet(snippet: str | None) -> str:
+    escaped = html.escape(snippet or "")
+    return escaped.replace(_HIT_START, "<mark>").replace(_HIT_STOP, "</mark>")
+
+
+def search_job_logs(
+    db: Session,
+    query: str,
+    limit: int,
+    before_id: int | None = None,
+    runbook: str | None = None,
+    status: str | None = None,
+    level: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> tuple[list[dict], int | None]:
+    # Newest first, keyset-paginated on job_logs.id: the index narrows the matches, the id
+    # order and LIMIT bound the work per page. Returns (hits, next before_id).
+    clauses = _websearch_clauses(query)
+    if not clauses:
+        return [], None
+    dialect = db.get_bind().dialect.name
+    params: dict = {"limit": limit + 1}
+    filters: list[str] = []
+    if before_id is not None:
+        filters.append("jl.id < :before_id")
+        params["before_id"] = before_id
+    if runbook:
+        filters.append("j.runbook_name = :runbook")
+        params["runbook"] = runbook
+    if status:
+        filters.append("j.status = :status")
+        params["status"] = status
+    if level:
+        filters.append("jl.level = :level")
+        params["level"] = level.upper()
+    if since:
+        filters.append("jl.ts >= :since")
+        params["since"] = since
+    if until:
+        filters.append("jl.ts < :until")
+        params["until"] = until
+    where = "".join(f" AND {condition}" for condition in filters)
+
+    def fetch(sql: str) -> list[dict]:
+        # Typed binds so SQLite compares against the same datetime format SQLAlchemy stores.
+        statement = text(sql).bindparams(
+            *(bindparam(name, type_=DateTime(timezone=True)) for name in ("since", "until") if name in params)
+        )
+        return [dict(row) for row in db.execute(statement, params).mappings()]
+
+    if dialect == "postgresql":
+        params["query"] = _websearch_query(clauses)
+        params["options"] = f"StartSel={_HIT_START}, StopSel={_HIT_STOP}, MaxFragments=2"
+
+        def postgres_sql(document: str, id_range: str, order: str) -> str:
+            # Headlines are computed in the outer query, only for the rows of this page.
+            return (
+                "SELECT hit.*, ts_headline('simple', hit.message, websearch_to_tsquery('simple', :query), :options) "
+                "AS snippet FROM ("
+                "SELECT jl.id, jl.job_id, jl.ts, jl.level, jl.message, j.runbook_name, j.status AS job_status "
+                "FROM job_logs jl JOIN jobs j ON j.id = jl.job_id "
+                f"WHERE {document} @@ websearch_to_tsquery('simple', :query) AND {id_range}{where} "
+                f"ORDER BY {order} DESC LIMIT :limit) hit ORDER BY hit.id DESC"
+            )
+
+        # The planner gets a fixed selectivity guess for the tsquery and walks the id index
+        # backwards whatever the term: instant for common terms, a full-table walk for rare
+        # or absent ones. So the walk is bounded to the newest LOG_SEARCH_RECENT_ROWS ids
+        # (coalesce() keeps it off the GIN index, which costs more than the walk for phrases
+        # of common tokens), and only a page it leaves short is finished from the GIN index
+        # (id + 0 keeps the planner off the id index; the bitmap then holds few matches).
+        newest = before_id
+        if newest is None:
+            newest = (db.execute(text("SELECT max(id) FROM job_logs")).scalar() or 0) + 1
+        params["recent_floor"] = newest - max(settings.log_search_recent_rows, 1)
+        indexed = f"jl.{TSVECTOR_COLUMN}"
+        rows = fetch(postgres_sql(f"coalesce({indexed}, ''::tsvector)", "jl.id >= :recent_floor", "jl.id"))
+        if len(rows) <= limit:
+            rows += fetch(postgres_sql(indexed, "jl.id < :recent_floor", "jl.id + 0"))
+    else:
+        params["query"] = _fts5_query(clauses)
+        rows = fetch(
+            "SELECT jl.id, jl.job_id, jl.ts, jl.level, jl.message, j.runbook_name, j.status AS job_status, "
+            f"snippet({FTS_TABLE}, 0, '{_HIT_START}', '{_HIT_STOP}', '…', 16) AS snippet "
+            f"FROM {FTS_TABLE} JOIN job_logs jl ON jl.id = {FTS_TABLE}.rowid JOIN jobs j ON j.id = jl.job_id "
+            f"WHERE {FTS_TABLE} MATCH :query{where} ORDER BY jl.id DESC LIMIT :limit"
+        )
+
+    for row in rows:
+        row["snippet"] = _html_snippet(row["snippet"])
+    items = rows[:limit]
+    next_before_id = items[-1]["id"] if len(rows) > limit else None
+    return items, next_before_id
@@ -0,0 +1,98 @@
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.services.cache import redis_client
+
+LOGIN_FAILURES_KEY = "orch:login:failures:{scope}:{value}"
+
+# Reserves one attempt on every counter at once, or none when any is at its limit: the
+# check and the increment are one step, so concurrent logins cannot all pass the check
+# before any of them records a failure. Fixed window from the first attempt.
+#   KEYS: counters   ARGV: window seconds, limit per counter
+# Returns 0 when reserved, else the seconds until the fullest counter resets.
+RESERVE_ATTEMPT_SCRIPT = """
+local retry_after = 0
+for i, key in ipairs(KEYS) do
+  if tonumber(redis.call('GET', key) or '0') >= tonumber(ARGV[i + 1]) then
+    local ttl = redis.call('TTL', key)
+    if ttl <= 0 then ttl = tonumber(ARGV[1]) end
+    retry_after = math.max(retry_after, ttl)
+  end
+end
+if retry_after > 0 then
+  return retry_after
+end
+for _, key in ipairs(KEYS) do
+  if redis.call('INCR', key) == 1 then
+    redis.call('EXPIRE', key, ARGV[1])
+  end
+end
+return 0
+"""
+
+# Gives a reserved attempt back; a counter that expired meanwhile is left alone.
+#   KEYS: counters
+RELEASE_ATTEMPT_SCRIPT = """
+for _, key in ipairs(KEYS) do
+  if tonumber(redis.call('GET', key) or '0') > 0 then
+    redis.call('DECR', key)
+  end
+end
+return 0
+"""
+
+_reserve_attempt = redis_client.register_script(RESERVE_ATTEMPT_SCRIPT)
+_release_attempt = redis_client.register_script(RELEASE_ATTEMPT_SCRIPT)
+
+
+def _account_key(email: str) -> str:
+    return LOGIN_FAILURES_KEY.format(scope="account", value=email.lower())
+
+
+def _ip_key(ip: str) -> str:
+    return LOGIN_FAILURES_KEY.format(scope="ip", value=ip)
+
+
+def _limits(email: str, ip: str | None) -> list[tuple[str, int]]:
+    limits = [(_account_key(email), settings.login_max_failures_per_account)]
+    if ip:
+        limits.append((_ip_key(ip), settings.login_max_failures_per_ip))
+    return [(key, limit) for key, limit in limits if limit > 0]
+
+
+def reserve_login_attempt(email: str, ip: str | None) -> int:
+    # Counts the attempt as a failure up front, before any hashing; a failed login just keeps
+    # it. Returns the seconds until the account or address may try again, 0 when reserved.
+    limits = _limits(email, ip)
+    if not limits:
+        return 0
+    try:
+        return int(
+            _reserve_attempt(
+                keys=[key for key, _ in limits],
+                args=[settings.login_failure_window_seconds, *(limit for _, limit in limits)],
+            )
+        )
+    except RedisError:
+        return 0
+
+
+def release_login_attempt(email: str, ip: str | None) -> None:
+    # The attempt was never judged (e.g. the hasher was busy): it does not count.
+    limits = _limits(email, ip)
+    if not limits:
+        return
+    try:
+        _release_attempt(keys=[key for key, _ in limits])
+    except RedisError:
+        pass
+
+
+def clear_login_failures(email: str, ip: str | None) -> None:
+    # Successful login: the account starts over and the address gets its reservation back.
+    try:
+        redis_client.delete(_account_key(email))
+        if ip and settings.login_max_failures_per_ip > 0:
+            _release_attempt(keys=[_ip_key(ip)])
+    except RedisError:
+        pass
@@ -0,0 +1,105 @@
+import time
+from contextvars import ContextVar
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Metrics live in the default registry of each process: the API serves them at /metrics and
+# the worker on WORKER_METRICS_PORT. With several uvicorn workers, scrape each process.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+JOB_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+http_request_duration = Histogram(
+    "orch_http_request_duration_seconds",
+    "API request latency by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+http_requests_in_flight = Gauge("orch_http_requests_in_flight", "API requests being served")
+db_statements_per_request = Histogram(
+    "orch_db_statements_per_request",
+    "SQL statements executed while serving one API request",
+    ["route"],
+    buckets=STATEMENT_BUCKETS,
+)
+db_pool_connections = Gauge(
+    "orch_db_pool_connections", "Database pool connections by state", ["engine", "state"]
+)
+queue_depth = Gauge("orch_queue_depth", "Jobs waiting in each queue lane", ["lane"])
+queue_in_flight = Gauge("orch_queue_in_flight", "Jobs leased by workers")
+queue_expired_leases = Gauge("orch_queue_expired_leases", "Leases past their visibility timeout")
+
+password_hash_duration = Histogram(
+    "orch_password_hash_duration_seconds", "Password hash/verify latency including pool wait", buckets=LATENCY_BUCKETS
+)
+password_hash_queue_depth = Gauge("orch_password_hash_queue_depth", "Password hash calls waiting for a process")
+password_hash_rejected = Counter("orch_password_hash_rejected_total", "Password hash calls rejected with 503")
+
+job_duration = Histogram(
+    "orch_job_duration_seconds", "Job run time in the worker", ["runbook", "outcome"], buckets=JOB_BUCKETS
+)
+job_queue_wait = Histogram(
+    "orch_job_queue_wait_seconds", "Time from enqueue to dequeue by a worker", ["lane"], buckets=JOB_BUCKETS
+)
+worker_slots = Gauge("orch_worker_slots", "Concurrent job slots of the worker")
+worker_busy_slots = Gauge("orch_worker_busy_slots", "Job slots currently running a job")
+worker_heartbeat_age = Gauge("orch_worker_heartbeat_age_seconds", "Seconds since the worker last renewed its leases")
+
+# Per-request statement counter; routes run in the threadpool with a copy of the request's
+# context, which still points at the same list.
+_statement_count: ContextVar[list[int] | None] = ContextVar("orch_statement_count", default=None)
+
+
+def _count_statement(*_args) -> None:
+    counter = _statement_count.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+def instrument_engine(engine: Engine, name: str) -> None:
+    event.listen(engine, "before_cursor_execute", _count_statement)
+    pool = engine.pool
+    if hasattr(pool, "checkedout"):
+        db_pool_connections.labels(name, "checked_out").set_function(pool.checkedout)
+        db_pool_connections.labels(name, "idle").set_function(pool.checkedin)
+        db_pool_connections.labels(name, "overflow").set_function(lambda: max(pool.overflow(), 0))
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        counter = [0]
+        token = _statement_count.set(counter)
+        http_requests_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec()
+            _statement_count.reset(token)
+            # The route template, not the raw path, keeps label cardinality bounded.
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            http_request_duration.labels(scope["method"], route, str(status["code"])).observe(
+                time.perf_counter() - started
+            )
+            db_statements_per_request.labels(route).observe(counter[0])
+
+
+def render_latest() -> tuple[bytes, str]:
+    return generate_latest(), CONTENT_TYPE_LATEST
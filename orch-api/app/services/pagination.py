@@ -0,0 +1,38 @@
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import Select, func, select, text
+from sqlalchemy.orm import Session
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(*values) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise InvalidCursor("invalid_cursor") from exc
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor("invalid_cursor")
+    return values
+
+
+def count_rows(db: Session, stmt: Select, estimate: bool = False) -> tuple[int, bool]:
+    # On Postgres the planner's row estimate is read from EXPLAIN instead of counting.
+    if estimate and db.get_bind().dialect.name == "postgresql":
+        compiled = stmt.compile(dialect=db.get_bind().dialect, compile_kwargs={"literal_binds": True})
+        plan = db.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}")).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"]), True
+    total = db.execute(select(func.count()).select_from(stmt.order_by(None).subquery())).scalar() or 0
+    return total, False
@@ -0,0 +1,121 @@
+from datetime import date, datetime, timezone
+
+from sqlalchemy import Table, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import AddConstraint, CreateIndex
+
+# Native monthly range partitions (Postgres only). A table is converted once with
+# convert_to_partitioned; afterwards partitions are created ahead of time and old
+# ones are detached and dropped instead of deleting rows.
+MONTHS_AHEAD = 2
+
+
+def _month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def _add_months(value: date, months: int) -> date:
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def is_partitioned(conn: Connection, table: str) -> bool:
+    return bool(
+        conn.execute(
+            text(
+                "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+                "WHERE c.relname = :table AND pg_table_is_visible(c.oid)"
+            ),
+            {"table": table},
+        ).scalar()
+    )
+
+
+def list_partitions(conn: Connection, table: str) -> list[str]:
+    return list(
+        conn.execute(
+            text(
+                "SELECT child.relname FROM pg_inherits i "
+                "JOIN pg_class parent ON parent.oid = i.inhparent "
+                "JOIN pg_class child ON child.oid = i.inhrelid "
+                "WHERE parent.relname = :table ORDER BY child.relname"
+            ),
+            {"table": table},
+        ).scalars()
+    )
+
+
+def ensure_partitions(conn: Connection, table: str, start: date, end: date) -> list[str]:
+    created: list[str] = []
+    existing = set(list_partitions(conn, table))
+    month = _month_start(start)
+    while month <= end:
+        name = partition_name(table, month)
+        if name not in existing:
+            conn.execute(
+                text(
+                    f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{table}" '
+                    f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+                )
+            )
+            created.append(name)
+        month = _add_months(month, 1)
+    return created
+
+
+def ensure_future_partitions(conn: Connection, table: str, months_ahead: int = MONTHS_AHEAD) -> list[str]:
+    today = datetime.now(timezone.utc).date()
+    return ensure_partitions(conn, table, today, _add_months(_month_start(today), months_ahead))
+
+
+def drop_expired_partitions(conn: Connection, table: str, cutoff: datetime) -> list[str]:
+    # A monthly partition goes only once its whole range is older than the cutoff.
+    dropped: list[str] = []
+    prefix = f"{table}_p"
+    for name in list_partitions(conn, table):
+        suffix = name[len(prefix) :]
+        if not name.startswith(prefix) or len(suffix) != 6 or not suffix.isdigit():
+            continue
+        upper = _add_months(date(int(suffix[:4]), int(suffix[4:]), 1), 1)
+        if upper <= cutoff.date():
+            conn.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"'))
+            conn.execute(text(f'DROP TABLE "{name}"'))
+            dropped.append(name)
+    return dropped
+
+
+def convert_to_partitioned(conn: Connection, table: Table, column: str) -> None:
+    # One-off rewrite under an exclusive lock: plan a maintenance window for large tables.
+    name = table.name
+    legacy = f"{name}_unpartitioned"
+    sequence = f"{name}_id_seq"
+    conn.execute(text(f'LOCK TABLE "{name}" IN ACCESS EXCLUSIVE MODE'))
+    conn.execute(text(f'ALTER TABLE "{name}" RENAME TO "{legacy}"'))
+    conn.execute(
+        text(
+            f'CREATE TABLE "{name}" (LIKE "{legacy}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED) '
+            f'PARTITION BY RANGE ("{column}")'
+        )
+    )
+    # Partition keys must be part of the primary key.
+    conn.execute(text(f'ALTER TABLE "{name}" ADD CONSTRAINT "{name}_pkey_{column}" PRIMARY KEY (id, "{column}")'))
+    conn.execute(text(f'CREATE TABLE "{name}_default" PARTITION OF "{name}" DEFAULT'))
+
+    oldest = conn.execute(text(f'SELECT min("{column}") FROM "{legacy}"')).scalar()
+    today = datetime.now(timezone.utc).date()
+    ensure_partitions(conn, name, oldest.date() if oldest else today, _add_months(_month_start(today), MONTHS_AHEAD))
+
+    # Mapped columns only: generated ones (the job_logs tsvector) are recomputed on insert.
+    columns = ", ".join(f'"{column.name}"' for column in table.columns)
+    conn.execute(text(f'INSERT INTO "{name}" ({columns}) SELECT {columns} FROM "{legacy}"'))
+    conn.execute(text(f'ALTER SEQUENCE "{sequence}" OWNED BY NONE'))
+    conn.execute(text(f'DROP TABLE "{legacy}"'))
+    conn.execute(text(f'ALTER SEQUENCE "{sequence}" OWNED BY "{name}".id'))
+    for constraint in table.foreign_key_constraints:
+        conn.execute(AddConstraint(constraint))
+    for index in table.indexes:
+        conn.execute(CreateIndex(index))
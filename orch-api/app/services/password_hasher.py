@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from app.core.config import settings
+from app.core.security import get_password_hash, verify_and_update_password
+from app.services.metrics import password_hash_duration, password_hash_queue_depth, password_hash_rejected
+
+
+class HasherBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    """pbkdf2 in a dedicated process pool; calls beyond workers + max_queue are rejected."""
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = max(workers, 1)
+        self.max_queue = max(max_queue, 0)
+        self.completed = 0
+        self.rejected = 0
+        self._in_flight = 0
+        self._latencies: deque[float] = deque(maxlen=1024)
+        self._executor: ProcessPoolExecutor | None = None
+        self._dummy_hash: str | None = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        if self._executor is None:
+            # Forking every worker up front (the first submit starts them all) keeps the fork ahead
+            # of the API's own background threads; call this before starting them.
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            self._executor.submit(int).result()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _run(self, func, *args):
+        # Called from the request threadpool; the request thread waits while a child hashes.
+        with self._lock:
+            if self._in_flight >= self.workers + self.max_queue:
+                self.rejected += 1
+                password_hash_rejected.inc()
+                raise HasherBusy()
+            self.start()
+            self._in_flight += 1
+            password_hash_queue_depth.set(max(self._in_flight - self.workers, 0))
+            executor = self._executor
+        started = time.perf_counter()
+        try:
+            return executor.submit(func, *args).result()
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._in_flight -= 1
+                self.completed += 1
+                self._latencies.append(elapsed)
+                password_hash_queue_depth.set(max(self._in_flight - self.workers, 0))
+            password_hash_duration.observe(elapsed)
+
+    def hash(self, password: str) -> str:
+        return self._run(get_password_hash, password)
+
+    def verify(self, password: str, hashed: str | None) -> tuple[bool, str | None]:
+        # Returns (valid, new_hash); new_hash is set when the stored cost differs from the configured one.
+        # Unknown accounts still pay for one verification so response time does not reveal them.
+        if hashed is None:
+            if self._dummy_hash is None:
+                self._dummy_hash = self.hash("dummy-password")
+            self._run(verify_and_update_password, password, self._dummy_hash)
+            return False, None
+        return self._run(verify_and_update_password, password, hashed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            in_flight = self._in_flight
+
+        def percentile(p: float) -> float | None:
+            if not latencies:
+                return None
+            return round(latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000, 2)
+
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": in_flight,
+            "queue_depth": max(in_flight - self.workers, 0),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "latency_p50_ms": percentile(0.5),
+            "latency_p99_ms": percentile(0.99),
+        }
+
+
+password_hasher = PasswordHasher(settings.password_hash_workers, settings.password_hash_max_queue)
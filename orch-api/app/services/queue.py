@@ -1,16 +1,205 @@
 import json
+import time
+import uuid
+from dataclasses import dataclass
 
 from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
+from redis.asyncio.client import PubSub
 from redis.exceptions import RedisError
 
 from app.core.config import settings
+from app.services.tracing import current_traceparent, start_span
 
-QUEUE_NAME = "orch:jobs"
+# Every queue key carries the same hash tag, so on Redis Cluster they all live in one slot:
+# the scripts reach tenant queues whose names are only known inside Lua.
+QUEUE_TAG = "{orch:jobs}"
+QUEUE_NAME = QUEUE_TAG
+LANE_PREFIX = f"{QUEUE_TAG}:lane:"
+NOTIFY_NAME = f"{QUEUE_TAG}:notify"
+PROCESSING_NAME = f"{QUEUE_TAG}:processing"
+LEASES_NAME = f"{QUEUE_TAG}:leases"
+# Names from before the hash tag; the worker adopts whatever is still left in them.
+UNTAGGED_QUEUE_NAME = "orch:jobs"
+UNTAGGED_LANE_PREFIX = "orch:jobs:lane:"
+UNTAGGED_NOTIFY_NAME = "orch:jobs:notify"
+UNTAGGED_PROCESSING_NAME = "orch:jobs:processing"
+UNTAGGED_LEASES_NAME = "orch:jobs:leases"
+JOB_EVENTS_PREFIX = "orch:job-events:"
+
+LANES = ("high", "normal", "low")
+DEFAULT_LANE = "normal"
+DEFAULT_TENANT = "default"
+NOTIFY_MAX_TOKENS = 64
+# Payloads per PUSH_SCRIPT call; Lua unpack() of ARGV has a stack limit of a few thousand.
+ENQUEUE_BATCH_SIZE = 500
+
+# Each lane keeps one list per tenant plus a ring of tenants with pending work
+# (list + set for membership) and their deficit counters.
+#   KEYS: tenant queue, ring, ring members, notify list
+PUSH_LUA = """
+local function push(tenant, position, payloads)
+  local command = position == 'head' and 'LPUSH' or 'RPUSH'
+  for _, payload in ipairs(payloads) do
+    redis.call(command, KEYS[1], payload)
+    redis.call('LPUSH', KEYS[4], '1')
+  end
+  redis.call('LTRIM', KEYS[4], 0, %d)
+  if redis.call('SADD', KEYS[3], tenant) == 1 then
+    redis.call('RPUSH', KEYS[2], tenant)
+  end
+end
+""" % (NOTIFY_MAX_TOKENS - 1)
+
+#   ARGV: tenant, "head" | "tail", payloads...
+PUSH_SCRIPT = PUSH_LUA + """
+push(ARGV[1], ARGV[2], {unpack(ARGV, 3)})
+return #ARGV - 2
+"""
+
+# Moves a message from processing back to its tenant queue in one step, as a new
+# delivery (ARGV[5], the same message with a fresh attempt id). When ARGV[4] is
+# set, only if its lease expired before that time (i.e. the owner did not renew it
+# meanwhile).
+#   KEYS: tenant queue, ring, ring members, notify list, processing list, leases
+#   ARGV: tenant, "head" | "tail", payload, expired before, redelivered payload
+REQUEUE_SCRIPT = PUSH_LUA + """
+if ARGV[4] ~= '' then
+  local score = redis.call('ZSCORE', KEYS[6], ARGV[3])
+  if not score or tonumber(score) > tonumber(ARGV[4]) then
+    return 0
+  end
+end
+redis.call('ZREM', KEYS[6], ARGV[3])
+if redis.call('LREM', KEYS[5], 1, ARGV[3]) == 0 then
+  return 0
+end
+push(ARGV[1], ARGV[2], {ARGV[5]})
+return 1
+"""
+
+# Strict priority across lanes, deficit round robin across the tenants of a lane:
+# a tenant at the head of the ring is topped up with its weight when its deficit
+# runs out and keeps the head until it has spent it.
+#   KEYS: processing list, leases, legacy queue
+#   ARGV: lane prefix, lease deadline, weights json, lanes...
+DEQUEUE_SCRIPT = """
+local weights = cjson.decode(ARGV[3])
+local function lease(payload)
+  redis.call('ZADD', KEYS[2], ARGV[2], payload)
+  return payload
+end
+local legacy = redis.call('LMOVE', KEYS[3], KEYS[1], 'LEFT', 'RIGHT')
+if legacy then
+  return lease(legacy)
+end
+for i = 4, #ARGV do
+  local base = ARGV[1] .. ARGV[i]
+  local ring = base .. ':tenants'
+  local members = ring .. ':members'
+  local deficits = ring .. ':deficit'
+  local remaining = redis.call('LLEN', ring)
+  while remaining > 0 do
+    remaining = remaining - 1
+    local tenant = redis.call('LINDEX', ring, 0)
+    local queue = base .. ':' .. tenant
+    local payload = redis.call('LMOVE', queue, KEYS[1], 'LEFT', 'RIGHT')
+    if payload then
+      local deficit = tonumber(redis.call('HGET', deficits, tenant) or '0')
+      if deficit < 1 then
+        deficit = deficit + (tonumber(weights[tenant]) or 1)
+      end
+      deficit = deficit - 1
+      if redis.call('LLEN', queue) == 0 then
+        redis.call('LPOP', ring)
+        redis.call('SREM', members, tenant)
+        redis.call('HDEL', deficits, tenant)
+      elseif deficit < 1 then
+        redis.call('LMOVE', ring, ring, 'LEFT', 'RIGHT')
+        redis.call('HSET', deficits, tenant, deficit)
+      else
+        redis.call('HSET', deficits, tenant, deficit)
+      end
+      return lease(payload)
+    end
+    redis.call('LPOP', ring)
+    redis.call('SREM', members, tenant)
+    redis.call('HDEL', deficits, tenant)
+  end
+end
+return false
+"""
+
+# Messages moved into processing whose worker died before writing the lease get one
+# now, so they expire like any other abandoned message.
+LEASE_ORPHANS_SCRIPT = """
+local processing = redis.call('LRANGE', KEYS[1], 0, -1)
+for _, payload in ipairs(processing) do
+  redis.call('ZADD', KEYS[2], 'NX', ARGV[1], payload)
+end
+return #processing
+"""
+
+def job_events_channel(job_id: int) -> str:
+    return f"{JOB_EVENTS_PREFIX}{job_id}"
+
+
+def _lane_key(lane: str) -> str:
+    return f"{LANE_PREFIX}{lane}"
+
+
+@dataclass(frozen=True)
+class QueuedJob:
+    job_id: int
+    payload: str
+    lane: str = DEFAULT_LANE
+    tenant: str = DEFAULT_TENANT
+    enqueued_at: float | None = None
+    traceparent: str | None = None
+    # Unique per delivery; legacy messages have none.
+    attempt: str | None = None
+
+
+def _parse_message(payload: str) -> QueuedJob:
+    parsed = json.loads(payload)
+    return QueuedJob(
+        job_id=int(parsed["job_id"]),
+        payload=payload,
+        lane=parsed.get("lane") or DEFAULT_LANE,
+        tenant=parsed.get("tenant") or DEFAULT_TENANT,
+        enqueued_at=parsed.get("enqueued_at"),
+        traceparent=parsed.get("traceparent"),
+        attempt=parsed.get("attempt"),
+    )
+
+
+def _new_attempt() -> str:
+    return uuid.uuid4().hex
+
+
+def _redelivery_payload(queued: QueuedJob) -> str:
+    # Same message under a fresh attempt id, so the delivery it replaces is fenced off.
+    message = json.loads(queued.payload)
+    message["attempt"] = _new_attempt()
+    return json.dumps(message)
 
 
 class QueueClient:
-    def __init__(self, redis_url: str):
+    def __init__(
+        self,
+        redis_url: str,
+        visibility_timeout_seconds: int = 60,
+        tenant_weights: dict[str, int] | None = None,
+    ):
+        self._redis_url = redis_url
         self._redis = Redis.from_url(redis_url, decode_responses=True)
+        self._async_redis: AsyncRedis | None = None
+        self.visibility_timeout_seconds = visibility_timeout_seconds
+        self._weights_json = json.dumps(tenant_weights or {})
+        self._push = self._redis.register_script(PUSH_SCRIPT)
+        self._dequeue = self._redis.register_script(DEQUEUE_SCRIPT)
+        self._lease_orphans = self._redis.register_script(LEASE_ORPHANS_SCRIPT)
+        self._requeue = self._redis.register_script(REQUEUE_SCRIPT)
 
     def ping(self) -> bool:
         try:
@@ -18,18 +207,184 @@ class QueueClient:
         except RedisError:
             return False
 
-    def enqueue_job(self, job_id: int) -> None:
-        payload = json.dumps({"job_id": job_id})
-        self._redis.rpush(QUEUE_NAME, payload)
+    def _tenant_keys(self, lane: str, tenant: str) -> list[str]:
+        base = _lane_key(lane)
+        return [f"{base}:{tenant}", f"{base}:tenants", f"{base}:tenants:members", NOTIFY_NAME]
 
-    def dequeue_job(self, timeout_seconds: int = 0) -> int | None:
-        value = self._redis.blpop(QUEUE_NAME, timeout=timeout_seconds)
-        if not value:
+    @property
+    def async_redis(self) -> AsyncRedis:
+        # Created on first use so it binds to the running event loop (SSE subscribers only).
+        if self._async_redis is None:
+            self._async_redis = AsyncRedis.from_url(self._redis_url, decode_responses=True)
+        return self._async_redis
+
+    @staticmethod
+    def _enqueue_payload(job_id: int, lane: str, tenant: str) -> str:
+        if lane not in LANES:
+            raise ValueError(f"Unknown queue lane: {lane}")
+        # The attempt id keeps payloads unique, so LREM on ack never touches another delivery.
+        message = {
+            "job_id": job_id,
+            "lane": lane,
+            "tenant": tenant,
+            "enqueued_at": time.time(),
+            "attempt": _new_attempt(),
+        }
+        traceparent = current_traceparent()
+        if traceparent:
+            message["traceparent"] = traceparent
+        return json.dumps(message)
+
+    def enqueue_job(self, job_id: int, lane: str = DEFAULT_LANE, tenant: str = DEFAULT_TENANT) -> None:
+        payload = self._enqueue_payload(job_id, lane, tenant)
+        with start_span("redis.enqueue", job_id=job_id, lane=lane):
+            self._push(keys=self._tenant_keys(lane, tenant), args=[tenant, "tail", payload])
+
+    def enqueue_jobs(self, jobs: list[tuple[int, str]], lane: str = DEFAULT_LANE) -> None:
+        # (job_id, tenant) pairs pushed in one MULTI/EXEC round trip: all of them or none.
+        by_tenant: dict[str, list[str]] = {}
+        for job_id, tenant in jobs:
+            by_tenant.setdefault(tenant, []).append(self._enqueue_payload(job_id, lane, tenant))
+        with start_span("redis.enqueue", jobs=len(jobs), lane=lane):
+            pipe = self._redis.pipeline(transaction=True)
+            for tenant, payloads in by_tenant.items():
+                for start in range(0, len(payloads), ENQUEUE_BATCH_SIZE):
+                    batch = payloads[start : start + ENQUEUE_BATCH_SIZE]
+                    self._push(keys=self._tenant_keys(lane, tenant), args=[tenant, "tail", *batch], client=pipe)
+            pipe.execute()
+
+    def _try_dequeue(self) -> QueuedJob | None:
+        payload = self._dequeue(
+            keys=[PROCESSING_NAME, LEASES_NAME, QUEUE_NAME],
+            args=[LANE_PREFIX, time.time() + self.visibility_timeout_seconds, self._weights_json, *LANES],
+        )
+        return _parse_message(payload) if payload else None
+
+    def dequeue_job(self, timeout_seconds: int = 0) -> QueuedJob | None:
+        queued = self._try_dequeue()
+        if queued is not None:
+            return queued
+        # Lua cannot block, so wait for an enqueue notification and try once more.
+        if not self._redis.blpop(NOTIFY_NAME, timeout=timeout_seconds):
             return None
-        _, payload = value
-        parsed = json.loads(payload)
-        return int(parsed["job_id"])
+        return self._try_dequeue()
+
+    def ack(self, queued: QueuedJob) -> None:
+        pipe = self._redis.pipeline(transaction=True)
+        pipe.lrem(PROCESSING_NAME, 1, queued.payload)
+        pipe.zrem(LEASES_NAME, queued.payload)
+        pipe.execute()
+
+    def extend_leases(self, queued_jobs: list[QueuedJob]) -> None:
+        if not queued_jobs:
+            return
+        deadline = time.time() + self.visibility_timeout_seconds
+        self._redis.zadd(LEASES_NAME, {queued.payload: deadline for queued in queued_jobs}, xx=True)
+
+    def _requeue_message(self, queued: QueuedJob, position: str, expired_before: float | None) -> QueuedJob | None:
+        # Returns the new delivery, or None when the message was no longer ours to move.
+        payload = _redelivery_payload(queued)
+        moved = self._requeue(
+            keys=[*self._tenant_keys(queued.lane, queued.tenant), PROCESSING_NAME, LEASES_NAME],
+            args=[
+                queued.tenant,
+                position,
+                queued.payload,
+                "" if expired_before is None else expired_before,
+                payload,
+            ],
+        )
+        return _parse_message(payload) if moved else None
+
+    def release(self, queued: QueuedJob) -> QueuedJob | None:
+        return self._requeue_message(queued, "tail", None)
+
+    def expired_jobs(self, limit: int = 100) -> list[QueuedJob]:
+        now = time.time()
+        self._lease_orphans(keys=[PROCESSING_NAME, LEASES_NAME], args=[now + self.visibility_timeout_seconds])
+        payloads = self._redis.zrangebyscore(LEASES_NAME, "-inf", now, start=0, num=limit)
+        return [_parse_message(payload) for payload in payloads]
+
+    def requeue_expired(self, queued: QueuedJob) -> QueuedJob | None:
+        # Back to the head of its tenant queue: it already waited its turn once.
+        return self._requeue_message(queued, "head", time.time())
+
+    def adopt_untagged_keys(self) -> int:
+        # Single-node Redis only (a cluster never ran the untagged layout). Pending messages
+        # go to the legacy queue, which is drained first; in-flight ones keep their lease, so
+        # an old worker that dies with them is reclaimed like any other.
+        untagged_rings = [f"{UNTAGGED_LANE_PREFIX}{lane}:tenants" for lane in LANES]
+        pipe = self._redis.pipeline(transaction=False)
+        for key in (UNTAGGED_QUEUE_NAME, UNTAGGED_PROCESSING_NAME, *untagged_rings):
+            pipe.exists(key)
+        if not any(pipe.execute()):
+            return 0
+        adopted = 0
+        for lane, ring in zip(LANES, untagged_rings):
+            base = f"{UNTAGGED_LANE_PREFIX}{lane}"
+            for tenant in self._redis.lrange(ring, 0, -1):
+                while self._redis.lmove(f"{base}:{tenant}", QUEUE_NAME, "LEFT", "RIGHT"):
+                    adopted += 1
+            self._redis.delete(ring, f"{ring}:members", f"{ring}:deficit")
+        while self._redis.lmove(UNTAGGED_QUEUE_NAME, QUEUE_NAME, "LEFT", "RIGHT"):
+            adopted += 1
+        for payload in self._redis.lrange(UNTAGGED_PROCESSING_NAME, 0, -1):
+            deadline = self._redis.zscore(UNTAGGED_LEASES_NAME, payload)
+            pipe = self._redis.pipeline(transaction=True)
+            pipe.rpush(PROCESSING_NAME, payload)
+            pipe.zadd(LEASES_NAME, {payload: deadline or time.time() + self.visibility_timeout_seconds})
+            pipe.execute()
+            # Copied before removed: an ack from the old worker in between wins.
+            if self._redis.lrem(UNTAGGED_PROCESSING_NAME, 1, payload):
+                self._redis.zrem(UNTAGGED_LEASES_NAME, payload)
+                adopted += 1
+            else:
+                self.ack(_parse_message(payload))
+        self._redis.delete(UNTAGGED_NOTIFY_NAME)
+        if adopted:
+            self._redis.lpush(NOTIFY_NAME, "1")
+        return adopted
+
+    def stats(self) -> dict:
+        lanes: list[dict] = []
+        for lane in LANES:
+            base = _lane_key(lane)
+            tenants = self._redis.lrange(f"{base}:tenants", 0, -1)
+            pipe = self._redis.pipeline(transaction=False)
+            for tenant in tenants:
+                pipe.llen(f"{base}:{tenant}")
+            depths = dict(zip(tenants, pipe.execute())) if tenants else {}
+            lanes.append({"lane": lane, "depth": sum(depths.values()), "tenants": depths})
+
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.llen(PROCESSING_NAME)
+        pipe.zcount(LEASES_NAME, "-inf", time.time())
+        pipe.llen(QUEUE_NAME)
+        in_flight, expired, legacy = pipe.execute()
+        return {"lanes": lanes, "in_flight": in_flight, "expired_leases": expired, "legacy_depth": legacy}
+
+    def publish_job_log(self, job_id: int, log: dict) -> None:
+        self._redis.publish(job_events_channel(job_id), json.dumps({"kind": "log", "log": log}))
+
+    def publish_job_logs(self, job_id: int, logs: list[dict]) -> None:
+        channel = job_events_channel(job_id)
+        with start_span("redis.publish_logs", job_id=job_id, count=len(logs)):
+            pipe = self._redis.pipeline(transaction=False)
+            for log in logs:
+                pipe.publish(channel, json.dumps({"kind": "log", "log": log}))
+            pipe.execute()
+
+    def publish_job_status(self, job_id: int, status: str) -> None:
+        with start_span("redis.publish_status", job_id=job_id, status=status):
+            self._redis.publish(job_events_channel(job_id), json.dumps({"kind": "status", "status": status}))
 
+    def job_events_pubsub(self) -> PubSub:
+        # One shared async pool; each subscriber still holds its own connection while listening.
+        return self.async_redis.pubsub()
 
-queue_client = QueueClient(settings.redis_url)
 
+queue_client = QueueClient(
+    settings.redis_url,
+    settings.queue_visibility_timeout_seconds,
+    settings.queue_tenant_weights_map,
+)
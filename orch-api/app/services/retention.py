@@ -0,0 +1,143 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from redis.exceptions import RedisError
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import AuditLog, Company, HetznerServiceLog, JobLog
+from app.services import partitions
+from app.services.cache import redis_client
+from app.services.hetzner_status import as_utc, invalidate_status_summary
+
+RETENTION_LOCK_KEY = "orch:retention:lock"
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    model: type
+    ts_column: str
+    days_setting: str
+
+    @property
+    def table(self) -> str:
+        return self.model.__tablename__
+
+    @property
+    def days(self) -> int:
+        return getattr(settings, self.days_setting)
+
+    def cutoff(self, now: datetime) -> datetime:
+        return now - timedelta(days=self.days)
+
+
+# days <= 0 keeps the table forever.
+RETENTION_POLICIES = (
+    RetentionPolicy(JobLog, "ts", "retention_job_logs_days"),
+    RetentionPolicy(AuditLog, "ts", "retention_audit_days"),
+    RetentionPolicy(HetznerServiceLog, "created_at", "retention_hetzner_logs_days"),
+)
+
+
+def _is_postgres(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def _expired_ids(policy: RetentionPolicy, cutoff: datetime, limit: int):
+    model = policy.model
+    stmt = select(model.id).where(getattr(model, policy.ts_column) < cutoff)
+    if model is HetznerServiceLog:
+        # Actions still being polled keep their row until they finish.
+        stmt = stmt.where(HetznerServiceLog.status != "running")
+    return stmt.order_by(model.id).limit(limit)
+
+
+def purge_expired_rows(db: Session, policy: RetentionPolicy, cutoff: datetime, batch_size: int) -> int:
+    # Short transactions keep locks and WAL bursts bounded while the backlog drains.
+    deleted = 0
+    while True:
+        ids = list(db.execute(_expired_ids(policy, cutoff, batch_size)).scalars())
+        if not ids:
+            return deleted
+        db.execute(delete(policy.model).where(policy.model.id.in_(ids)))
+        db.commit()
+        deleted += len(ids)
+        if len(ids) < batch_size:
+            return deleted
+
+
+def apply_retention(db: Session, now: datetime | None = None) -> dict[str, dict]:
+    now = now or datetime.now(timezone.utc)
+    results: dict[str, dict] = {}
+    for policy in RETENTION_POLICIES:
+        result: dict = {"dropped_partitions": [], "deleted_rows": 0, "created_partitions": []}
+        partitioned = _is_postgres(db) and partitions.is_partitioned(db.connection(), policy.table)
+        if partitioned:
+            result["created_partitions"] = partitions.ensure_future_partitions(db.connection(), policy.table)
+            db.commit()
+        if policy.days > 0:
+            cutoff = policy.cutoff(now)
+            if partitioned:
+                result["dropped_partitions"] = partitions.drop_expired_partitions(db.connection(), policy.table, cutoff)
+                db.commit()
+            # Rows in the default partition and the partially expired month still go row by row.
+            result["deleted_rows"] = purge_expired_rows(db, policy, cutoff, max(settings.retention_batch_size, 1))
+        results[policy.table] = result
+
+    if results["hetzner_service_logs"]["deleted_rows"] or results["hetzner_service_logs"]["dropped_partitions"]:
+        # Bulk deletes bypass the session hooks that normally drop the cached summaries.
+        invalidate_status_summary(*db.execute(select(Company.id)).scalars())
+    return results
+
+
+def run_retention_once(db: Session) -> dict[str, dict] | None:
+    # Several workers may run the loop; only one pass per interval does the work.
+    ttl = max(settings.retention_interval_minutes * 60 - 5, 30)
+    try:
+        if not redis_client.set(RETENTION_LOCK_KEY, "1", nx=True, ex=ttl):
+            return None
+    except RedisError:
+        return None
+    return apply_retention(db)
+
+
+def _table_stats_postgres(db: Session, table: str) -> tuple[int, int | None]:
+    # Planner statistics: exact counts on multi-million row tables would scan them.
+    rows, size = db.execute(
+        text(
+            "SELECT coalesce(sum(greatest(c.reltuples, 0)), 0)::bigint, coalesce(sum(pg_total_relation_size(c.oid)), 0)::bigint "
+            "FROM pg_class c WHERE c.oid = to_regclass(:table) "
+            "OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass(:table))"
+        ),
+        {"table": table},
+    ).one()
+    return int(rows), int(size)
+
+
+def storage_report(db: Session) -> list[dict]:
+    postgres = _is_postgres(db)
+    report: list[dict] = []
+    for policy in RETENTION_POLICIES:
+        ts_column = getattr(policy.model, policy.ts_column)
+        oldest = db.execute(select(func.min(ts_column))).scalar()
+        if postgres:
+            rows, size = _table_stats_postgres(db, policy.table)
+            partitioned = partitions.is_partitioned(db.connection(), policy.table)
+            partition_count = len(partitions.list_partitions(db.connection(), policy.table)) if partitioned else 0
+        else:
+            rows = db.execute(select(func.count()).select_from(policy.model)).scalar_one()
+            size, partitioned, partition_count = None, False, 0
+        report.append(
+            {
+                "table": policy.table,
+                "rows": rows,
+                "rows_is_estimate": postgres,
+                "size_bytes": size,
+                "partitioned": partitioned,
+                "partitions": partition_count,
+                "retention_days": policy.days if policy.days > 0 else None,
+                "oldest": as_utc(oldest) if oldest else None,
+            }
+        )
+    return report
@@ -1,9 +1,16 @@
-from sqlalchemy import select
+from sqlalchemy import func, select, true
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
 from app.core.security import get_password_hash
-from app.models import AccessArea, Role, Runbook, User
+from app.db import dialect_insert
+from app.migrations import SEED_VERSION_KEY, read_state, write_state
+from app.models import AccessArea, Role, Runbook, User, UserArea, UserRole
+from app.services.http_cache import bump_table_revisions
+
+# Bump when the defaults below change so running processes re-seed on their next start.
+SEED_VERSION = 1
+SEED_LOCK_ID = 0x6F726369
 
 DEFAULT_ROLES = ["admin", "operator", "viewer"]
 DEFAULT_AREAS = ["general", "cloudflare", "deploy", "portainer"]
@@ -62,59 +69,48 @@ DEFAULT_RUNBOOKS = [
 ]
 
 
-def _seed_roles(db: Session) -> None:
-    for role_name in DEFAULT_ROLES:
-        found = db.execute(select(Role).where(Role.name == role_name)).scalar_one_or_none()
-        if not found:
-            db.add(Role(name=role_name))
-    db.commit()
+def _insert_missing(db: Session, model, rows: list[dict], key: str) -> None:
+    db.execute(dialect_insert(db, model).values(rows).on_conflict_do_nothing(index_elements=[key]))
 
 
 def _seed_admin(db: Session) -> None:
-    user = db.execute(select(User).where(User.email == settings.admin_email)).scalar_one_or_none()
-    admin_role = db.execute(select(Role).where(Role.name == "admin")).scalar_one()
-    all_areas = db.execute(select(AccessArea)).scalars().all()
-
-    if not user:
-        user = User(
-            email=settings.admin_email,
-            password_hash=get_password_hash(settings.admin_password),
-            status="active",
-        )
-        db.add(user)
-
-    if admin_role not in user.roles:
-        user.roles.append(admin_role)
-    user.areas = all_areas
-    db.commit()
+    # Existing admins keep their password; the hash is only computed when the row is missing.
+    if db.execute(select(User.id).where(User.email == settings.admin_email)).scalar() is None:
+        admin = {
+            "email": settings.admin_email,
+            "password_hash": get_password_hash(settings.admin_password),
+            "status": "active",
+        }
+        _insert_missing(db, User, [admin], "email")
 
-
-def _seed_areas(db: Session) -> None:
-    for area_name in DEFAULT_AREAS:
-        found = db.execute(select(AccessArea).where(AccessArea.name == area_name)).scalar_one_or_none()
-        if not found:
-            db.add(AccessArea(name=area_name))
-    db.commit()
+    admin_id = select(User.id).where(User.email == settings.admin_email).scalar_subquery()
+    db.execute(
+        dialect_insert(db, UserRole)
+        .from_select(["user_id", "role_id"], select(admin_id, Role.id).where(Role.name == "admin"))
+        .on_conflict_do_nothing(index_elements=["user_id", "role_id"])
+    )
+    db.execute(
+        dialect_insert(db, UserArea)
+        # SQLite needs a WHERE before ON CONFLICT in INSERT ... SELECT.
+        .from_select(["user_id", "area_id"], select(admin_id, AccessArea.id).where(true()))
+        .on_conflict_do_nothing(index_elements=["user_id", "area_id"])
+    )
 
 
-def _seed_runbooks(db: Session) -> None:
-    for item in DEFAULT_RUNBOOKS:
-        found = db.execute(select(Runbook).where(Runbook.name == item["name"])).scalar_one_or_none()
-        if not found:
-            db.add(
-                Runbook(
-                    name=item["name"],
-                    version=item["version"],
-                    category=item["category"],
-                    schema_json=item["schema_json"],
-                    enabled=True,
-                )
-            )
-    db.commit()
+def seed_defaults(db: Session, force: bool = False) -> bool:
+    # One transaction, one INSERT ... ON CONFLICT DO NOTHING per table. Returns False when
+    # another process already seeded this version.
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(select(func.pg_advisory_xact_lock(SEED_LOCK_ID)))
+    if not force and read_state(db.connection()).get(SEED_VERSION_KEY, 0) >= SEED_VERSION:
+        db.rollback()
+        return False
 
-
-def seed_defaults(db: Session) -> None:
-    _seed_roles(db)
-    _seed_areas(db)
+    _insert_missing(db, Role, [{"name": name} for name in DEFAULT_ROLES], "name")
+    _insert_missing(db, AccessArea, [{"name": name} for name in DEFAULT_AREAS], "name")
+    _insert_missing(db, Runbook, [{**item, "enabled": True} for item in DEFAULT_RUNBOOKS], "name")
     _seed_admin(db)
-    _seed_runbooks(db)
+    write_state(db.connection(), SEED_VERSION_KEY, SEED_VERSION)
+    db.commit()
+    bump_table_revisions("access_areas", "runbooks")
+    return True
@@ -0,0 +1,240 @@
+import importlib
+import json
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Iterator
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    start_ns: int
+    end_ns: int | None = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+    error: str | None = None
+
+    @property
+    def traceparent(self) -> str:
+        # W3C trace context; only sampled traces are ever propagated.
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(((self.end_ns or self.start_ns) - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class SpanExporter:
+    def export(self, span: Span) -> None:
+        raise NotImplementedError
+
+    def shutdown(self) -> None:
+        pass
+
+
+class InMemorySpanExporter(SpanExporter):
+    def __init__(self, max_spans: int = 10000):
+        self._spans: deque[Span] = deque(maxlen=max_spans)
+
+    def export(self, span: Span) -> None:
+        self._spans.append(span)
+
+    @property
+    def spans(self) -> list[Span]:
+        return list(self._spans)
+
+    def clear(self) -> None:
+        self._spans.clear()
+
+
+class FileSpanExporter(SpanExporter):
+    """One JSON object per finished span; appends are safe across API, worker and pool processes."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as handle:
+            handle.write(line)
+
+
+def load_exporter(name: str) -> SpanExporter | None:
+    # "memory", "file", or "package.module:factory" for anything else (OTLP bridge, etc.).
+    if not name:
+        return None
+    if name == "memory":
+        return InMemorySpanExporter()
+    if name == "file":
+        return FileSpanExporter(settings.tracing_file_path)
+    module_name, _, attribute = name.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)()
+
+
+_exporter: SpanExporter | None = load_exporter(settings.tracing_exporter)
+_current_span: ContextVar[Span | None] = ContextVar("orch_current_span", default=None)
+
+
+def configure_exporter(exporter: SpanExporter | None) -> None:
+    global _exporter
+    _exporter = exporter
+
+
+def current_span() -> Span | None:
+    return _current_span.get()
+
+
+def current_traceparent() -> str | None:
+    span = _current_span.get()
+    return span.traceparent if span else None
+
+
+def parse_traceparent(value: str | None) -> tuple[str, str] | None:
+    parts = (value or "").strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    _, trace_id, parent_id, flags = parts
+    try:
+        if int(trace_id, 16) == 0 or int(parent_id, 16) == 0 or not int(flags, 16) & 1:
+            return None
+    except ValueError:
+        return None
+    return trace_id, parent_id
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+def begin_span(name: str, start_ns: int | None = None, **attributes) -> Span | None:
+    # A leaf child of the current span, or None outside a trace. Finish with end_span.
+    parent = _current_span.get()
+    if parent is None or _exporter is None:
+        return None
+    return Span(name, parent.trace_id, _new_id(64), parent.span_id, start_ns or time.time_ns(), attributes=attributes)
+
+
+def end_span(span: Span | None, error: BaseException | str | None = None) -> None:
+    if span is None or _exporter is None:
+        return
+    span.end_ns = time.time_ns()
+    if error is not None:
+        span.error = str(error)[:500] or type(error).__name__
+    try:
+        _exporter.export(span)
+    except Exception:  # pragma: no cover
+        pass  # Tracing never fails the traced operation.
+
+
+@contextmanager
+def _activate(span: Span | None) -> Iterator[Span | None]:
+    if span is None:
+        yield None
+        return
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as exc:
+        end_span(span, exc)
+        raise
+    else:
+        end_span(span)
+    finally:
+        _current_span.reset(token)
+
+
+def start_span(name: str, **attributes) -> Iterator[Span | None]:
+    # Child span that becomes the current one; a no-op outside a trace.
+    return _activate(begin_span(name, **attributes))
+
+
+def start_trace(name: str, traceparent: str | None = None, start_ns: int | None = None, **attributes):
+    # Entry points (API request, worker job): continue a remote parent or sample a new trace.
+    if _exporter is None:
+        return _activate(None)
+    parent = parse_traceparent(traceparent)
+    if parent is None:
+        if random.random() >= settings.tracing_sample_ratio:
+            return _activate(None)
+        trace_id, parent_id = _new_id(128), None
+    else:
+        trace_id, parent_id = parent
+    span = Span(name, trace_id, _new_id(64), parent_id, start_ns or time.time_ns(), attributes=attributes)
+    return _activate(span)
+
+
+class TracingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _exporter is None or scope["path"] in ("/metrics", "/health"):
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        traceparent = headers.get(b"traceparent", b"").decode("latin-1") or None
+        with start_trace(f"{scope['method']} {scope['path']}", traceparent) as span:
+            status = {"code": 500}
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    status["code"] = message["status"]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                if span is not None:
+                    route = getattr(scope.get("route"), "path", None)
+                    if route:
+                        span.name = f"{scope['method']} {route}"
+                    span.attributes.update({"http.path": scope["path"], "http.status_code": status["code"]})
+                    if status["code"] >= 500 and span.error is None:
+                        span.error = f"HTTP {status['code']}"
+
+
+def instrument_engine(engine: Engine) -> None:
+    def before(conn, cursor, statement, parameters, context, executemany):
+        if context is None:
+            return
+        context._orch_span = begin_span("db.query", statement=statement[:200], dialect=conn.dialect.name)
+
+    def after(conn, cursor, statement, parameters, context, executemany):
+        end_span(getattr(context, "_orch_span", None))
+
+    def on_error(exception_context):
+        execution_context = exception_context.execution_context
+        if execution_context is not None:
+            end_span(getattr(execution_context, "_orch_span", None), exception_context.original_exception)
+
+    event.listen(engine, "before_cursor_execute", before)
+    event.listen(engine, "after_cursor_execute", after)
+    event.listen(engine, "handle_error", on_error)
+
+
+def shutdown() -> None:
+    if _exporter is not None:
+        _exporter.shutdown()
+
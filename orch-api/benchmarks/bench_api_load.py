@@ -0,0 +1,86 @@
+"""HTTP load test for a running orch-api: requests/s and latency percentiles per endpoint.
+
+Logs in once, then keeps --concurrency requests in flight against each endpoint for
+--duration seconds. Run it against the same database and hardware before and after a
+change (e.g. the sync threadpool build vs the async build) and compare the tables.
+
+Usage: python benchmarks/bench_api_load.py --url http://127.0.0.1:8000 [--concurrency 200]
+       [--duration 15] [--endpoint /v1/jobs?page_size=20 ...]
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+DEFAULT_ENDPOINTS = ["/v1/me", "/v1/jobs?page_size=20", "/v1/runbooks"]
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+async def run_endpoint(client: httpx.AsyncClient, path: str, concurrency: int, duration: float) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def user() -> None:
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                response = await client.get(path)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "path": path,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed,
+        "p50": percentile(latencies, 0.50) * 1000,
+        "p99": percentile(latencies, 0.99) * 1000,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--email", default="admin@omniforge.com.br")
+    parser.add_argument("--password", default="Admin123!")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--endpoint", action="append", default=None)
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=30) as client:
+        response = await client.post("/v1/auth/login", json={"email": args.email, "password": args.password})
+        response.raise_for_status()
+        client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+        print(f"concurrency={args.concurrency} duration={args.duration}s")
+        print(f"{'endpoint':32} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+        for path in args.endpoint or DEFAULT_ENDPOINTS:
+            result = await run_endpoint(client, path, args.concurrency, args.duration)
+            print(
+                f"{result['path']:32} {result['requests']:>9} {result['errors']:>7} "
+                f"{result['rps']:>9.0f} {result['p50']:>8.1f} {result['p99']:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
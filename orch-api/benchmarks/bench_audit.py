@@ -0,0 +1,73 @@
+"""Audit write throughput for mutating requests and login-style events.
+
+Compares, per event:
+  two commits   a business change committed, then the audit row in its own commit (old write_audit)
+  transactional business change and audit row in one commit (write_audit)
+  outbox        audit-only events buffered and bulk-inserted (write_audit(..., buffered=True))
+
+Usage: python benchmarks/bench_audit.py [--events 10000] [--database-url URL]
+Without --database-url a temporary SQLite file is used.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=10000)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+
+    from sqlalchemy import func, select
+
+    from app.db import Base, SessionLocal, engine
+    from app.models import AuditLog, Company
+    from app.services.audit import audit_outbox, write_audit
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        company = Company(name=f"bench-{time.time()}")
+        db.add(company)
+        db.commit()
+
+        started = time.perf_counter()
+        for index in range(args.events):
+            company.status = f"s{index % 2}"
+            db.commit()
+            db.add(AuditLog(action="bench.legacy", target_type="company", target_id=str(company.id), metadata_json={}))
+            db.commit()
+        legacy = args.events / (time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for index in range(args.events):
+            company.status = f"s{index % 2}"
+            write_audit(db, None, "bench.transactional", "company", str(company.id))
+            db.commit()
+        transactional = args.events / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for index in range(args.events):
+        write_audit(None, None, "bench.outbox", "user", str(index), buffered=True)
+    audit_outbox.close()
+    outbox = args.events / (time.perf_counter() - started)
+
+    with SessionLocal() as db:
+        stored = db.execute(select(func.count()).where(AuditLog.action == "bench.outbox")).scalar()
+
+    print(f"database:           {engine.url.get_backend_name()}")
+    print(f"events:             {args.events}")
+    print(f"two commits:        {legacy:,.0f} events/s")
+    print(f"transactional:      {transactional:,.0f} events/s ({transactional / legacy:.1f}x)")
+    print(f"outbox:             {outbox:,.0f} events/s ({outbox / legacy:.1f}x, {stored} stored)")
+
+
+if __name__ == "__main__":
+    main()
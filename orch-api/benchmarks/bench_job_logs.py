@@ -0,0 +1,62 @@
+"""Job log write throughput: append_job_log (one commit per line) vs JobLogWriter.
+
+Usage: python benchmarks/bench_job_logs.py [--lines 5000] [--database-url URL]
+Without --database-url a temporary SQLite file is used. Redis publishing is
+disabled so the numbers reflect database cost only.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=5000)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+
+    from app.db import Base, SessionLocal, engine
+    from app.models import Job, User
+    from app.services import jobs
+    from app.services.queue import queue_client
+
+    queue_client.publish_job_log = lambda *a, **k: None
+    queue_client.publish_job_logs = lambda *a, **k: None
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        user = User(email=f"bench-{time.time()}@local", password_hash="x")
+        db.add(user)
+        db.commit()
+        job = Job(runbook_name="bench", status="RUNNING", input_json={}, created_by=user.id)
+        db.add(job)
+        db.commit()
+        job_id = job.id
+
+        started = time.perf_counter()
+        for index in range(args.lines):
+            jobs.append_job_log(db, job_id, f"line {index}")
+        before = args.lines / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with jobs.JobLogWriter(job_id) as writer:
+        for index in range(args.lines):
+            writer.write(f"line {index}")
+    after = args.lines / (time.perf_counter() - started)
+
+    print(f"database:           {engine.url.get_backend_name()}")
+    print(f"lines:              {args.lines}")
+    print(f"append_job_log:     {before:,.0f} lines/s")
+    print(f"JobLogWriter:       {after:,.0f} lines/s")
+    print(f"speedup:            {after / before:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
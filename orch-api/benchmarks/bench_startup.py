@@ -0,0 +1,74 @@
+"""Database work done by each API process at startup.
+
+Compares, per process start on an already initialized database:
+  legacy   create_all + the per-row seed (one SELECT per role/area/runbook, four commits)
+  current  prepare_database(): one read of the recorded schema/seed versions
+and reports the one-off cost of `manage.py migrate` on an empty database.
+
+Usage: python benchmarks/bench_startup.py [--starts 50] [--database-url URL]
+Without --database-url a temporary SQLite file is used.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--starts", type=int, default=50)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+
+    from sqlalchemy import event, select
+
+    from app.db import Base, SessionLocal, engine
+    from app.main import prepare_database
+    from app.models import AccessArea, Role, Runbook, User
+    from app.services.seeder import DEFAULT_AREAS, DEFAULT_ROLES, DEFAULT_RUNBOOKS
+
+    statements = 0
+
+    def count(*_args) -> None:
+        nonlocal statements
+        statements += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+
+    def legacy_startup() -> None:
+        Base.metadata.create_all(bind=engine)
+        with SessionLocal() as db:
+            for model, names in ((Role, DEFAULT_ROLES), (AccessArea, DEFAULT_AREAS)):
+                for name in names:
+                    db.execute(select(model).where(model.name == name)).scalar_one_or_none()
+                db.commit()
+            db.execute(select(User).where(User.email == "admin@omniforge.com.br")).scalar_one_or_none()
+            db.execute(select(Role).where(Role.name == "admin")).scalar_one()
+            db.execute(select(AccessArea)).scalars().all()
+            db.commit()
+            for item in DEFAULT_RUNBOOKS:
+                db.execute(select(Runbook).where(Runbook.name == item["name"])).scalar_one_or_none()
+            db.commit()
+
+    def measure(label: str, func, runs: int) -> None:
+        nonlocal statements
+        statements = 0
+        started = time.perf_counter()
+        for _ in range(runs):
+            func()
+        elapsed = (time.perf_counter() - started) / runs
+        print(f"{label:28} {elapsed * 1000:8.2f} ms/start  {statements / runs:6.1f} statements/start")
+
+    measure("migrate + seed (empty db)", prepare_database, 1)
+    measure("legacy startup", legacy_startup, args.starts)
+    measure("current startup", prepare_database, args.starts)
+
+
+if __name__ == "__main__":
+    main()
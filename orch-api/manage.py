@@ -0,0 +1,80 @@
+import argparse
+import json
+import sys
+
+from app.core.config import settings
+from app.core.secrets import keyring
+from app.db import SessionLocal, engine
+from app.migrations import LATEST_VERSION, migrate
+from app.models import AuditLog, HetznerServiceLog, JobLog
+from app.services import partitions
+from app.services.log_search import ensure_search_index
+from app.services.credentials import reencrypt_credentials
+from app.services.retention import RETENTION_POLICIES, apply_retention
+from app.services.seeder import SEED_VERSION, seed_defaults
+
+
+def cmd_migrate(args: argparse.Namespace) -> int:
+    applied = migrate(engine)
+    print(f"schema at version {LATEST_VERSION}" + (f" (applied {applied})" if applied else " (up to date)"))
+    if not args.skip_seed:
+        with SessionLocal() as db:
+            seeded = seed_defaults(db, force=args.force_seed)
+        print(f"seed at version {SEED_VERSION}" + (" (applied)" if seeded else " (up to date)"))
+    return 0
+
+
+def cmd_retention(args: argparse.Namespace) -> int:
+    with SessionLocal() as db:
+        results = apply_retention(db)
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+def cmd_partition_logs(args: argparse.Namespace) -> int:
+    if engine.dialect.name != "postgresql":
+        print("Native partitioning requires PostgreSQL; retention falls back to batched deletes.")
+        return 1
+    columns = {policy.table: policy.ts_column for policy in RETENTION_POLICIES}
+    tables = [AuditLog.__table__, HetznerServiceLog.__table__, JobLog.__table__]
+    selected = [table for table in tables if not args.table or table.name in args.table]
+    for table in selected:
+        with engine.begin() as conn:
+            if partitions.is_partitioned(conn, table.name):
+                print(f"{table.name}: already partitioned")
+                continue
+            partitions.convert_to_partitioned(conn, table, columns[table.name])
+            if table.name == JobLog.__tablename__:
+                ensure_search_index(conn)  # the GIN index is not part of the model's indexes
+            print(f"{table.name}: partitioned by month on {columns[table.name]}")
+    return 0
+
+
+def cmd_rotate_secrets(args: argparse.Namespace) -> int:
+    print(f"keyring: {', '.join(keyring.key_ids)} (active {keyring.active_key_id})")
+    with SessionLocal() as db:
+        results = reencrypt_credentials(db, args.batch_size or settings.secret_rotation_batch_size)
+    print(json.dumps(results, indent=2))
+    return 1 if results["failed"] else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="manage.py")
+    commands = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = commands.add_parser("migrate", help="apply pending schema migrations and default data")
+    migrate_parser.add_argument("--skip-seed", action="store_true")
+    migrate_parser.add_argument("--force-seed", action="store_true", help="re-insert missing defaults")
+    migrate_parser.set_defaults(func=cmd_migrate)
+    commands.add_parser("retention", help="apply the retention policies once").set_defaults(func=cmd_retention)
+    partition = commands.add_parser("partition-logs", help="convert log tables to monthly partitions (PostgreSQL)")
+    partition.add_argument("--table", action="append", help="job_logs, audit_log or hetzner_service_logs")
+    partition.set_defaults(func=cmd_partition_logs)
+    rotate = commands.add_parser("rotate-secrets", help="re-encrypt credential secrets with the active key")
+    rotate.add_argument("--batch-size", type=int, default=None)
+    rotate.set_defaults(func=cmd_rotate_secrets)
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
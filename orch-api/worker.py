@@ -1,36 +1,401 @@
+import asyncio
+import multiprocessing
+import os
+import signal
+import threading
 import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
+from prometheus_client import start_http_server
 from redis.exceptions import RedisError
+from sqlalchemy import select
 
-from app.db import SessionLocal
-from app.models import Job
-from app.services.jobs import execute_job_simulation
-from app.services.queue import queue_client
+from app.core.config import settings
+from app.db import SessionLocal, engine
+from app.models import Job, Runbook
+from app.services import hetzner_import  # noqa: F401  (registers the import job handler)
+from app.services import metrics, tracing
+from app.services.hetzner_scheduler import dispatch_due_policies, poll_running_actions_once
+from app.services.jobs import claim_job, execute_job, job_handler_category, reset_abandoned_job
+from app.services.queue import QueuedJob, queue_client
+from app.services.retention import run_retention_once
+from app.services.tracing import start_trace
 
+DEFAULT_CATEGORY = "general"
+HELD_FULL_BACKOFF_SECONDS = 0.2
+# Heartbeat, reclaim, Hetzner action polling, scheduler and retention, plus shutdown re-queues.
+HOUSEKEEPING_THREADS = 6
 
-def process_job(job_id: int) -> None:
-    with SessionLocal() as db:
-        job = db.get(Job, job_id)
+
+def process_job(
+    job_id: int,
+    traceparent: str | None = None,
+    enqueued_at: float | None = None,
+    attempt: str | None = None,
+    cancel: threading.Event | None = None,
+) -> tuple[str, str] | None:
+    # Returns (runbook, final status) for the parent's metrics; None when another worker owns the job.
+    if enqueued_at:
+        # Sibling of the API's enqueue span, covering the time spent in Redis.
+        with start_trace("queue.wait", traceparent, start_ns=int(enqueued_at * 1e9), job_id=job_id):
+            pass
+    with start_trace("job.process", traceparent, job_id=job_id) as span, SessionLocal() as db:
+        job = claim_job(db, job_id, attempt)
         if not job:
-            return
-        if job.status not in {"PENDING", "RUNNING"}:
-            return
-        execute_job_simulation(db, job)
+            return None
+        if span is not None:
+            span.attributes["runbook"] = job.runbook_name
+        if not execute_job(db, job, cancel):
+            return None
+        return job.runbook_name, job.status
 
 
-def main() -> None:
-    print("orch-worker started")
-    while True:
+def job_category(job_id: int) -> str:
+    with SessionLocal() as db:
+        runbook_name, category = db.execute(
+            select(Job.runbook_name, Runbook.category)
+            .outerjoin(Runbook, Runbook.name == Job.runbook_name)
+            .where(Job.id == job_id)
+        ).one_or_none() or (None, None)
+    return job_handler_category(runbook_name or "") or category or DEFAULT_CATEGORY
+
+
+def requeue_job(queued: QueuedJob, reason: str) -> None:
+    if queue_client.release(queued) is None:
+        return
+    with SessionLocal() as db:
+        reset_abandoned_job(db, queued.job_id, queued.attempt, reason)
+
+
+def reclaim_expired_jobs() -> int:
+    # The message moves first, atomically and only while its lease is still expired; the
+    # row is reset afterwards. The new delivery carries a fresh attempt id, so it can take
+    # over the job even before the reset, and the old attempt can no longer finish it.
+    # Jobs that already finished are dropped by the next claim.
+    reclaimed = 0
+    queue_client.adopt_untagged_keys()
+    for queued in queue_client.expired_jobs():
+        if queue_client.requeue_expired(queued) is None:
+            continue
+        reclaimed += 1
+        with SessionLocal() as db:
+            reset_abandoned_job(db, queued.job_id, queued.attempt, "visibility timeout expired")
+    return reclaimed
+
+
+def run_scheduler_tick() -> int:
+    with SessionLocal() as db:
+        return dispatch_due_policies(db)
+
+
+def poll_hetzner_actions() -> int | None:
+    with SessionLocal() as db:
+        return poll_running_actions_once(db)
+
+
+def run_retention() -> dict | None:
+    with SessionLocal() as db:
+        return run_retention_once(db)
+
+
+def _init_job_process(pids: multiprocessing.SimpleQueue) -> None:
+    # Forked children must not reuse the parent's pooled connections.
+    engine.dispose(close=False)
+    # The fork inherits the parent's asyncio SIGTERM handler, which would swallow the signal
+    # the draining parent sends; the pid is reported so it knows whom to send it to.
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    pids.put(os.getpid())
+
+
+class WorkerPool:
+    def __init__(
+        self,
+        concurrency: int,
+        category_limits: dict[str, int],
+        process_categories: set[str],
+        process_pool_size: int,
+        drain_seconds: int,
+    ):
+        self._concurrency = concurrency
+        self._category_limits = category_limits
+        self._process_categories = process_categories
+        self._drain_seconds = drain_seconds
+        self._slots = asyncio.Semaphore(concurrency)
+        self._category_running: dict[str, int] = {}
+        # Dequeued while their category was saturated. They keep their lease but not a slot, so
+        # other categories keep flowing; a finishing job of the same category hands its slot on.
+        self._held: dict[str, deque[QueuedJob]] = {}
+        self._in_flight: dict[asyncio.Task, QueuedJob] = {}
+        self._cancel_events: dict[asyncio.Task, threading.Event] = {}
+        self._stopping = asyncio.Event()
+        self._last_heartbeat = time.monotonic()
+        metrics.worker_slots.set(concurrency)
+        metrics.worker_heartbeat_age.set_function(lambda: time.monotonic() - self._last_heartbeat)
+        # One extra thread for the blocking dequeue of the main loop.
+        self._threads = ThreadPoolExecutor(max_workers=concurrency + 1, thread_name_prefix="orch-job")
+        # Lease renewal and the other housekeeping loops get a thread each, apart from the jobs:
+        # a heartbeat stuck behind busy threads lets leases expire and running jobs run twice.
+        self._housekeeping = ThreadPoolExecutor(
+            max_workers=HOUSEKEEPING_THREADS, thread_name_prefix="orch-housekeeping"
+        )
+        self._process_pids: set[int] = set()
+        self._pid_reports = multiprocessing.SimpleQueue()
+        self._processes = (
+            ProcessPoolExecutor(
+                max_workers=process_pool_size, initializer=_init_job_process, initargs=(self._pid_reports,)
+            )
+            if process_categories
+            else None
+        )
+
+    def stop(self) -> None:
+        if not self._stopping.is_set():
+            print("orch-worker draining: no new jobs will be dequeued")
+            self._stopping.set()
+
+    def _category_has_room(self, category: str) -> bool:
+        limit = self._category_limits.get(category)
+        return limit is None or self._category_running.get(category, 0) < limit
+
+    async def _run_blocking(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._threads, func, *args)
+
+    async def _run_housekeeping(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._housekeeping, func, *args)
+
+    def _held_jobs(self) -> list[QueuedJob]:
+        return [queued for held in self._held.values() for queued in held]
+
+    def _start(self, queued: QueuedJob, category: str) -> None:
+        self._category_running[category] = self._category_running.get(category, 0) + 1
+        cancel = threading.Event()
+        task = asyncio.create_task(self._execute(queued, category, cancel))
+        self._in_flight[task] = queued
+        self._cancel_events[task] = cancel
+        task.add_done_callback(self._in_flight.pop)
+        task.add_done_callback(self._cancel_events.pop)
+
+    def _start_held(self, category: str) -> bool:
+        # Called with a slot in hand; False when nothing took it.
+        held = self._held.get(category)
+        if not held or self._stopping.is_set() or not self._category_has_room(category):
+            return False
+        self._start(held.popleft(), category)
+        return True
+
+    async def _execute(self, queued: QueuedJob, category: str, cancel: threading.Event) -> None:
+        metrics.worker_busy_slots.inc()
+        if queued.enqueued_at:
+            metrics.job_queue_wait.labels(queued.lane).observe(max(time.time() - queued.enqueued_at, 0))
+        started = time.perf_counter()
         try:
-            job_id = queue_client.dequeue_job(timeout_seconds=5)
-            if job_id is None:
-                continue
-            process_job(job_id)
-        except RedisError:
-            time.sleep(2)
+            if category in self._process_categories and self._processes is not None:
+                result = await asyncio.get_running_loop().run_in_executor(
+                    self._processes,
+                    process_job,
+                    queued.job_id,
+                    queued.traceparent,
+                    queued.enqueued_at,
+                    queued.attempt,
+                )
+            else:
+                result = await self._run_blocking(
+                    process_job, queued.job_id, queued.traceparent, queued.enqueued_at, queued.attempt, cancel
+                )
+            if result is not None:
+                runbook_name, status = result
+                metrics.job_duration.labels(runbook_name, status.lower()).observe(time.perf_counter() - started)
+            await self._run_blocking(queue_client.ack, queued)
         except Exception as exc:  # pragma: no cover
-            print(f"Worker error: {exc}")
-            time.sleep(2)
+            # Not acked: the lease expires and the reclaimer hands the job to another worker.
+            print(f"Worker error on job {queued.job_id}: {exc}")
+        finally:
+            metrics.worker_busy_slots.dec()
+            self._category_running[category] -= 1
+            if not self._start_held(category):
+                self._slots.release()
+
+    async def _acquire_slot(self) -> bool:
+        acquire = asyncio.ensure_future(self._slots.acquire())
+        stopping = asyncio.ensure_future(self._stopping.wait())
+        await asyncio.wait({acquire, stopping}, return_when=asyncio.FIRST_COMPLETED)
+        stopping.cancel()
+        if self._stopping.is_set():
+            if acquire.done() and not acquire.cancelled():
+                self._slots.release()
+            else:
+                acquire.cancel()
+            return False
+        return True
+
+    async def _heartbeat(self) -> None:
+        interval = max(queue_client.visibility_timeout_seconds / 3, 1)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                leased = list(self._in_flight.values()) + self._held_jobs()
+                await self._run_housekeeping(queue_client.extend_leases, leased)
+                self._last_heartbeat = time.monotonic()
+            except RedisError as exc:
+                print(f"Lease renewal failed: {exc}")
+
+    async def _reclaim(self) -> None:
+        while True:
+            await asyncio.sleep(settings.queue_reclaim_interval_seconds)
+            try:
+                reclaimed = await self._run_housekeeping(reclaim_expired_jobs)
+                if reclaimed:
+                    print(f"orch-worker reclaimed {reclaimed} abandoned job(s)")
+            except Exception as exc:  # pragma: no cover
+                print(f"Reclaim failed: {exc}")
+
+    async def _poll_actions(self) -> None:
+        while True:
+            await asyncio.sleep(settings.hetzner_action_poll_seconds)
+            try:
+                finished = await self._run_housekeeping(poll_hetzner_actions)
+                if finished:
+                    print(f"orch-worker finished {finished} Hetzner action(s)")
+            except Exception as exc:  # pragma: no cover
+                print(f"Hetzner action polling failed: {exc}")
+
+    async def _schedule(self) -> None:
+        while True:
+            try:
+                dispatched = await self._run_housekeeping(run_scheduler_tick)
+                if dispatched:
+                    print(f"orch-worker scheduled {dispatched} policy run(s)")
+            except Exception as exc:  # pragma: no cover
+                print(f"Scheduler tick failed: {exc}")
+            await asyncio.sleep(settings.scheduler_interval_seconds)
+
+    async def _retention(self) -> None:
+        while True:
+            try:
+                results = await self._run_housekeeping(run_retention)
+                for table, result in (results or {}).items():
+                    if result["deleted_rows"] or result["dropped_partitions"]:
+                        print(
+                            f"orch-worker retention {table}: {result['deleted_rows']} row(s), "
+                            f"{len(result['dropped_partitions'])} partition(s) dropped"
+                        )
+            except Exception as exc:  # pragma: no cover
+                print(f"Retention failed: {exc}")
+            await asyncio.sleep(settings.retention_interval_minutes * 60)
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, self.stop)
+
+        background = [
+            asyncio.create_task(self._heartbeat()),
+            asyncio.create_task(self._reclaim()),
+            asyncio.create_task(self._poll_actions()),
+            asyncio.create_task(self._retention()),
+        ]
+        if settings.scheduler_enabled:
+            background.append(asyncio.create_task(self._schedule()))
+        print(f"orch-worker started (concurrency={self._concurrency})")
+        while await self._acquire_slot():
+            if len(self._held_jobs()) >= self._concurrency:
+                # Enough jobs waiting on saturated categories; dequeue more once they start.
+                self._slots.release()
+                await asyncio.sleep(HELD_FULL_BACKOFF_SECONDS)
+                continue
+            try:
+                queued = await self._run_blocking(queue_client.dequeue_job, 1)
+                if queued is None:
+                    self._slots.release()
+                    continue
+                category = await self._run_blocking(job_category, queued.job_id)
+            except RedisError:
+                self._slots.release()
+                await asyncio.sleep(2)
+                continue
+            except Exception as exc:  # pragma: no cover
+                print(f"Worker error: {exc}")
+                self._slots.release()
+                await asyncio.sleep(2)
+                continue
+
+            if not self._category_has_room(category):
+                # Kept here instead of handed back, so it does not go round Redis again.
+                self._held.setdefault(category, deque()).append(queued)
+                self._slots.release()
+                continue
+
+            self._start(queued, category)
+
+        # Leases keep being renewed while in-flight jobs drain.
+        await self._drain()
+        for task in background:
+            task.cancel()
+
+    async def _drain(self) -> None:
+        # Held jobs never started: they go straight back to the queue.
+        for queued in self._held_jobs():
+            try:
+                await self._run_housekeeping(queue_client.release, queued)
+            except RedisError as exc:
+                print(f"Failed to re-queue job {queued.job_id}: {exc}")
+        self._held.clear()
+
+        if self._in_flight:
+            print(f"orch-worker waiting up to {self._drain_seconds}s for {len(self._in_flight)} job(s)")
+            await asyncio.wait(list(self._in_flight), timeout=self._drain_seconds)
+
+        leftover = dict(self._in_flight)
+        for task, queued in leftover.items():
+            try:
+                await self._run_housekeeping(requeue_job, queued, "worker shutdown deadline reached")
+            except Exception as exc:  # pragma: no cover
+                # Still leased: the reclaimer of another worker picks it up after the timeout.
+                print(f"Failed to re-queue job {queued.job_id}: {exc}")
+                continue
+            # Re-queued (or already owned by another delivery): its result would be discarded,
+            # so a job thread stops at the handler's next cancellation point.
+            cancel = self._cancel_events.get(task)
+            if cancel is not None:
+                cancel.set()
+
+        if self._processes is not None:
+            if leftover:
+                # Re-queued jobs must not keep running in orphaned children.
+                while not self._pid_reports.empty():
+                    self._process_pids.add(self._pid_reports.get())
+                for pid in self._process_pids:
+                    try:
+                        os.kill(pid, signal.SIGTERM)
+                    except ProcessLookupError:
+                        pass
+            self._processes.shutdown(wait=False, cancel_futures=True)
+        self._threads.shutdown(wait=False, cancel_futures=True)
+        self._housekeeping.shutdown(wait=False, cancel_futures=True)
+        if leftover:
+            print(f"orch-worker exiting with {len(leftover)} job(s) re-queued")
+        else:
+            print("orch-worker stopped")
+
+
+def main() -> None:
+    tracing.instrument_engine(engine)
+    if settings.worker_metrics_port:
+        metrics.instrument_engine(engine, "sync")
+        start_http_server(settings.worker_metrics_port)
+    pool = WorkerPool(
+        concurrency=max(settings.worker_concurrency, 1),
+        category_limits=settings.worker_category_limits_map,
+        process_categories=settings.worker_process_categories_set,
+        process_pool_size=max(settings.worker_process_pool_size, 1),
+        drain_seconds=settings.worker_drain_seconds,
+    )
+    try:
+        asyncio.run(pool.run())
+    finally:
+        tracing.shutdown()
 
 
 if __name__ == "__main__":
@@ -87,6 +87,11 @@ type HetznerLog = {
   created_by: number | null;
   created_at: string;
 };
+type JobSummary = {
+  id: number;
+  status: string;
+  output_json: Record<string, unknown> | null;
+};
 type Runbook = {
   name: string;
   version: string;
@@ -733,8 +738,24 @@ export default function DashboardPage() {
         setHetznerError(body.detail ?? "Erro ao importar servidores.");
         return;
       }
-      const rows = (await response.json()) as HetznerServer[];
-      setHetznerMessage(`Importacao concluida: ${rows.length} servidor(es).`);
+      const { job_id: jobId } = (await response.json()) as { job_id: number };
+      setHetznerMessage(`Importacao em andamento (job #${jobId})...`);
+      let job: JobSummary | null = null;
+      for (let attempt = 0; attempt < 600; attempt += 1) {
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+        const jobResponse = await apiRequest(`/v1/jobs/${jobId}`);
+        if (!jobResponse.ok) continue;
+        job = (await jobResponse.json()) as JobSummary;
+        if (["SUCCESS", "ERROR", "CANCELED"].includes(job.status)) break;
+      }
+      if (job?.status === "SUCCESS") {
+        setHetznerMessage(`Importacao concluida: ${job.output_json?.imported_count ?? 0} servidor(es).`);
+      } else if (job?.status === "ERROR") {
+        setHetznerMessage("");
+        setHetznerError(String(job.output_json?.error ?? "Erro ao importar servidores."));
+      } else {
+        setHetznerMessage(`Importacao ainda em andamento (job #${jobId}).`);
+      }
       await loadHetznerData(selectedCompanyId);
     } catch {
       setHetznerError("Falha de conexao ao importar servidores.");